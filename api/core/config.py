@@ -3,7 +3,8 @@ from pathlib import Path
 
 from dotenv import load_dotenv
 
-load_dotenv(verbose=True, override=True)
+# 環境変数を渡して起動するプロセス（ベンチマークなど）では、.env で上書きしない
+load_dotenv(verbose=True, override=not os.getenv("AIBLECODE_NO_DOTENV_OVERRIDE"))
 dotenv_path = Path(__file__).parent.parent / ".env"
 load_dotenv(dotenv_path)
 
@@ -16,9 +17,175 @@ ALGORITHM = os.getenv("ALGORITHM")
 ADMIN_USERNAME = os.getenv("ADMIN_USERNAME")
 
 DATABASE_URL = os.getenv("DATABASE_URL")
+# 読み取り専用のレプリカ（省略時は DATABASE_URL を使う）
+DATABASE_READ_URL = os.getenv("DATABASE_READ_URL") or None
+# 書き込んだクライアントの読み取りを、この秒数だけプライマリに向ける（レプリカの遅延対策）
+READ_YOUR_WRITES_SECONDS = int(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))
 
 JUDGE_API_URL = os.getenv("JUDGE_API_URL")
 
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES"))
 
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+
+# 生成AI（レビュー）のプロンプト設定
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.0-flash-exp")
+# Gemini が一度に受け付ける入力のトークン数
+GEMINI_INPUT_TOKEN_LIMIT = int(os.getenv("GEMINI_INPUT_TOKEN_LIMIT", "1048576"))
+# 長い問題文の前置きをコンテキストキャッシュに置く。キャッシュのモデルはレビューのモデルと揃える
+GEMINI_CONTEXT_CACHE = os.getenv("GEMINI_CONTEXT_CACHE", "true").lower() == "true"
+GEMINI_CONTEXT_CACHE_MODEL = os.getenv("GEMINI_CONTEXT_CACHE_MODEL") or GEMINI_MODEL
+# キャッシュを作れる最小のトークン数（モデルによる）と、キャッシュに置く問題文のトークン数
+GEMINI_CONTEXT_CACHE_MIN_TOKENS = int(
+    os.getenv("GEMINI_CONTEXT_CACHE_MIN_TOKENS", "4096")
+)
+GEMINI_CONTEXT_CACHE_STATEMENT_TOKEN_BUDGET = int(
+    os.getenv("GEMINI_CONTEXT_CACHE_STATEMENT_TOKEN_BUDGET", "100000")
+)
+GEMINI_CONTEXT_CACHE_TTL_MINUTES = int(
+    os.getenv("GEMINI_CONTEXT_CACHE_TTL_MINUTES", "60")
+)
+
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "8000"))
+PROMPT_STATEMENT_TOKEN_BUDGET = int(os.getenv("PROMPT_STATEMENT_TOKEN_BUDGET", "3000"))
+PROMPT_PREAMBLE_CACHE_SIZE = int(os.getenv("PROMPT_PREAMBLE_CACHE_SIZE", "256"))
+
+# AIレビューの一括生成（api/review_batch.py）の設定
+REVIEW_BATCH_SIZE = int(os.getenv("REVIEW_BATCH_SIZE", "50"))
+REVIEW_BATCH_CONCURRENCY = int(os.getenv("REVIEW_BATCH_CONCURRENCY", "4"))
+REVIEW_BATCH_IDLE_SECONDS = int(os.getenv("REVIEW_BATCH_IDLE_SECONDS", "60"))
+
+# 主キー・外部キーの UUID の保存形式（"char": CHAR(32) / "binary": BINARY(16)）
+UUID_STORAGE = os.getenv("UUID_STORAGE", "char").lower()
+# 新しく発行する UUID のバージョン（"7": 時刻順 / "4": ランダム）
+UUID_VERSION = os.getenv("UUID_VERSION", "7")
+
+# テストケースの入出力の保存先（"db": testcase_blobs テーブル / "fs": TESTCASE_BLOB_DIR）
+TESTCASE_BLOB_STORE = os.getenv("TESTCASE_BLOB_STORE", "db").lower()
+TESTCASE_BLOB_DIR = os.getenv(
+    "TESTCASE_BLOB_DIR", str(Path(__file__).parent.parent.parent / "testcase_blobs")
+)
+# 圧縮形式（"zstd" / "gzip" / "raw"）
+TESTCASE_BLOB_CODEC = os.getenv("TESTCASE_BLOB_CODEC", "zstd").lower()
+
+# ジャッジ時にテストケースを展開しておくローカルのキャッシュ
+TESTCASE_CACHE = os.getenv("TESTCASE_CACHE", "true").lower() == "true"
+TESTCASE_CACHE_DIR = os.getenv(
+    "TESTCASE_CACHE_DIR", str(Path(__file__).parent.parent.parent / "testcase_cache")
+)
+TESTCASE_CACHE_MAX_BYTES = int(
+    os.getenv("TESTCASE_CACHE_MAX_BYTES", str(1024 * 1024 * 1024))
+)
+
+# テストケースの一括アップロードで受け付ける展開後の合計サイズ
+TESTCASE_BULK_MAX_BYTES = int(
+    os.getenv("TESTCASE_BULK_MAX_BYTES", str(512 * 1024 * 1024))
+)
+# カテゴリーの読み込み（/category/import）で受け付ける展開後の合計サイズ
+CATEGORY_IMPORT_MAX_BYTES = int(
+    os.getenv("CATEGORY_IMPORT_MAX_BYTES", str(2 * 1024 * 1024 * 1024))
+)
+# アーカイブの1ファイルの最大サイズ（1ファイルずつメモリに読むので、その上限になる）
+ARCHIVE_MEMBER_MAX_BYTES = int(
+    os.getenv("ARCHIVE_MEMBER_MAX_BYTES", str(64 * 1024 * 1024))
+)
+
+# ジャッジ結果（SubmissionDetail）をまとめて書き込む件数と間隔（秒）
+SUBMISSION_DETAIL_FLUSH_COUNT = int(os.getenv("SUBMISSION_DETAIL_FLUSH_COUNT", "10"))
+SUBMISSION_DETAIL_FLUSH_INTERVAL = float(
+    os.getenv("SUBMISSION_DETAIL_FLUSH_INTERVAL", "1.0")
+)
+
+# データベースのコネクションプール
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "20"))  # 常に保持する接続数
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))  # 一時的に追加できる接続数
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))  # 空きを待つ秒数
+# 接続を作り直すまでの秒数（MySQL の wait_timeout より短くする。-1 で無効）
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+# 貸し出す前に接続が生きているか確認する
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+
+# /metrics と /metrics/pool を見られるクライアント。
+# Authorization: Bearer <METRICS_TOKEN> を付けたリクエストか、METRICS_ALLOW_IPS（カンマ区切りの
+# アドレスかネットワーク）からのリクエストだけに返す。どちらも未設定なら誰にも返さない（404）
+METRICS_TOKEN = os.getenv("METRICS_TOKEN") or None
+METRICS_ALLOW_IPS = [
+    item.strip()
+    for item in os.getenv("METRICS_ALLOW_IPS", "").split(",")
+    if item.strip()
+]
+
+# リクエストごとの SQL の計測
+SQL_PROFILING = os.getenv("SQL_PROFILING", "true").lower() == "true"
+# この秒数以上かかった SQL をルートとあわせてログに出す
+SQL_SLOW_QUERY_SECONDS = float(os.getenv("SQL_SLOW_QUERY_SECONDS", "0.5"))
+# 1リクエストで同じ SQL がこの回数を超えて実行されたら N+1 としてログに出す
+SQL_N_PLUS_ONE_THRESHOLD = int(os.getenv("SQL_N_PLUS_ONE_THRESHOLD", "10"))
+# SQL の件数と時間を Server-Timing ヘッダで返す
+SERVER_TIMING = os.getenv("SERVER_TIMING", "false").lower() == "true"
+
+# トレーシング（0 で無効。リクエストを受けたときに、この割合でトレースを記録する）
+TRACING_SAMPLE_RATE = float(os.getenv("TRACING_SAMPLE_RATE", "0"))
+# 出力先（"console": ログ / "memory": メモリ上 / "otlp": OTLP/HTTP で送る）
+TRACING_EXPORTER = os.getenv("TRACING_EXPORTER", "console").lower()
+TRACING_OTLP_ENDPOINT = os.getenv(
+    "TRACING_OTLP_ENDPOINT", "http://localhost:4318/v1/traces"
+)
+TRACING_SERVICE_NAME = os.getenv("TRACING_SERVICE_NAME", "aiblecode-api")
+
+# Judge0 の結果の受け取り方（"auto": Judge0 の設定で wait=true が使えれば使う / "true" / "false"）
+JUDGE_WAIT = os.getenv("JUDGE_WAIT", "auto").lower()
+# 結果をポーリングする間隔（秒）。最初の間隔から倍々に伸ばし、最大の間隔で止める
+JUDGE_POLL_INITIAL_INTERVAL = float(os.getenv("JUDGE_POLL_INITIAL_INTERVAL", "0.1"))
+JUDGE_POLL_MAX_INTERVAL = float(os.getenv("JUDGE_POLL_MAX_INTERVAL", "2.0"))
+# 結果を待つ時間の上限は「実行時間制限 × テストケース数 + この秒数」
+JUDGE_DEADLINE_MARGIN = float(os.getenv("JUDGE_DEADLINE_MARGIN", "30"))
+# Judge0 の応答を待つ秒数（期限の無い提出とポーリング。応答しない Judge0 で止まらないようにする）
+JUDGE_READ_TIMEOUT = float(os.getenv("JUDGE_READ_TIMEOUT", "30"))
+
+# Judge0 から見たこの API の URL（例: http://api:8000/api）。設定するとコールバックでジャッジ結果を受け取る
+JUDGE_CALLBACK_URL = os.getenv("JUDGE_CALLBACK_URL", "").rstrip("/")
+# コールバックを待っているテストケースの期限切れ（IE）を確かめる間隔（秒）
+JUDGE_CALLBACK_REAP_INTERVAL = float(os.getenv("JUDGE_CALLBACK_REAP_INTERVAL", "10"))
+
+# ジャッジに使う Judge0 の一覧（"URL=重み" をカンマ区切り、重みは省略可）。未設定なら JUDGE_API_URL だけを使う
+JUDGE_API_URLS = os.getenv("JUDGE_API_URLS") or JUDGE_API_URL or ""
+# Judge0 が生きているか確かめる間隔（秒、2台以上のとき）
+JUDGE_HEALTH_CHECK_INTERVAL = float(os.getenv("JUDGE_HEALTH_CHECK_INTERVAL", "10"))
+# 続けてこの回数失敗した（IE を含む）Judge0 には、JUDGE_CIRCUIT_RESET_SECONDS 秒の間振り分けない
+JUDGE_CIRCUIT_FAILURES = int(os.getenv("JUDGE_CIRCUIT_FAILURES", "5"))
+JUDGE_CIRCUIT_RESET_SECONDS = float(os.getenv("JUDGE_CIRCUIT_RESET_SECONDS", "30"))
+
+# ジャッジを実行するスレッドの数（プロセスごと）
+JUDGE_WORKERS = int(os.getenv("JUDGE_WORKERS", "16"))
+# 1人のユーザーが同時にジャッジできる提出の数
+JUDGE_USER_CONCURRENCY = int(os.getenv("JUDGE_USER_CONCURRENCY", "2"))
+# 1つの問題を同時にジャッジできる提出の数（0 なら制限しない）
+JUDGE_PROBLEM_CONCURRENCY = int(os.getenv("JUDGE_PROBLEM_CONCURRENCY", "0"))
+# テストケースがこの数以下の問題の提出は、優先して実行する
+JUDGE_PRIORITY_MAX_TESTCASES = int(os.getenv("JUDGE_PRIORITY_MAX_TESTCASES", "3"))
+
+# /run に使う Judge0（JUDGE_API_URLS と同じ形式）。提出のジャッジと分けると、混んでいても待たされない
+JUDGE_RUN_API_URLS = os.getenv("JUDGE_RUN_API_URLS") or JUDGE_API_URLS
+# /run を実行するスレッドの数（プロセスごと）と、1人のユーザーが同時に実行できる数
+JUDGE_RUN_WORKERS = int(os.getenv("JUDGE_RUN_WORKERS", "8"))
+JUDGE_RUN_USER_CONCURRENCY = int(os.getenv("JUDGE_RUN_USER_CONCURRENCY", "1"))
+# /run の実行時間制限（秒）
+JUDGE_RUN_TIME_LIMIT = float(os.getenv("JUDGE_RUN_TIME_LIMIT", "5"))
+# 非同期の /run の結果を取っておく秒数
+JUDGE_RUN_RESULT_TTL = int(os.getenv("JUDGE_RUN_RESULT_TTL", "300"))
+# 実行を待っている /run の数の上限（超えたら 429）と、POST /run が結果を待つ秒数（超えたら 504）
+JUDGE_RUN_MAX_QUEUED = int(os.getenv("JUDGE_RUN_MAX_QUEUED", "64"))
+JUDGE_RUN_WAIT_TIMEOUT = float(os.getenv("JUDGE_RUN_WAIT_TIMEOUT", "60"))
+# Judge0 ごとに使い回す HTTP の接続の数
+JUDGE_HTTP_POOL_SIZE = int(os.getenv("JUDGE_HTTP_POOL_SIZE", "32"))
+
+# /run の応答に入れる stdout / stderr の最大のバイト数（超えた分は切り詰める）
+RUN_OUTPUT_MAX_BYTES = int(os.getenv("RUN_OUTPUT_MAX_BYTES", str(64 * 1024)))
+# /run のプログラムが出力できる最大のバイト数（Judge0 の max_file_size。超えると実行を止める）
+RUN_OUTPUT_LIMIT_BYTES = int(os.getenv("RUN_OUTPUT_LIMIT_BYTES", str(4 * 1024 * 1024)))
+# 切り詰めた出力の全体を、JUDGE_RUN_RESULT_TTL 秒の間ダウンロードできるように保存するか
+RUN_OUTPUT_STORE = os.getenv("RUN_OUTPUT_STORE", "true").lower() == "true"
+RUN_OUTPUT_DIR = os.getenv(
+    "RUN_OUTPUT_DIR", str(Path(__file__).parent.parent.parent / "run_outputs")
+)
@@ -0,0 +1,310 @@
+"""
+Prometheus のテキスト形式で出力できる、軽量なメトリクス。
+
+値はプロセス（ワーカー）ごとに集計する。さらに書き込みはスレッドごとの領域に行い、
+出力するときに合計するので、記録する側ではロックを取らない。
+"""
+
+import math
+import threading
+from bisect import bisect_left
+from time import perf_counter
+
+# 秒単位の既定のバケット
+DEFAULT_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple[str, ...], values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._local = threading.local()
+        self._shards: list[dict] = []
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(labels.get(name, "") for name in self.labels)
+
+    def _shard(self) -> dict:
+        # スレッドごとの領域。初回だけロックを取って一覧に登録する
+        try:
+            return self._local.values
+        except AttributeError:
+            values = {}
+            with self._lock:
+                self._shards.append(values)
+            self._local.values = values
+            return values
+
+    def _snapshot(self) -> list[dict]:
+        with self._lock:
+            shards = list(self._shards)
+        return [dict(shard) for shard in shards]
+
+    def clear(self):
+        with self._lock:
+            for shard in self._shards:
+                shard.clear()
+
+    def samples(self) -> list[str]:
+        raise NotImplementedError
+
+    def render(self) -> list[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type}",
+            *self.samples(),
+        ]
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        shard = self._shard()
+        key = self._key(labels)
+        shard[key] = shard.get(key, 0) + amount
+
+    def values(self) -> dict[tuple, float]:
+        total = {}
+        for shard in self._snapshot():
+            for key, value in shard.items():
+                total[key] = total.get(key, 0) + value
+        return total
+
+    def samples(self) -> list[str]:
+        return [
+            f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}"
+            for key, value in sorted(self.values().items())
+        ]
+
+
+class Gauge(Counter):
+    """
+    増減させる値（inc / dec）と、外から与える値（set）を持つ。
+    set した値は、同じラベルの inc / dec の合計より優先する。
+    """
+
+    type = "gauge"
+
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = ()):
+        super().__init__(name, documentation, labels)
+        self._set_values: dict[tuple, float] = {}
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        self._set_values[self._key(labels)] = value
+
+    def values(self) -> dict[tuple, float]:
+        return {**super().values(), **self._set_values}
+
+    def clear(self):
+        super().clear()
+        self._set_values.clear()
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        shard = self._shard()
+        key = self._key(labels)
+        # [各バケットの件数..., +Inf の件数, 合計]
+        counts = shard.get(key)
+        if counts is None:
+            counts = shard[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        counts[bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+    def time(self, **labels) -> "_Timer":
+        """with ブロックの実行時間を記録する。"""
+        return _Timer(self, labels)
+
+    def values(self) -> dict[tuple, list]:
+        total = {}
+        for shard in self._snapshot():
+            for key, counts in shard.items():
+                if key not in total:
+                    total[key] = list(counts)
+                else:
+                    total[key] = [a + b for a, b in zip(total[key], counts)]
+        return total
+
+    def samples(self) -> list[str]:
+        lines = []
+        for key, counts in sorted(self.values().items()):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, math.inf), counts):
+                cumulative += count
+                labels = _format_labels(
+                    self.labels, key, f'le="{_format_value(bound)}"'
+                )
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labels, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(counts[-1])}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class _Timer:
+    def __init__(self, histogram: Histogram, labels: dict):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.histogram.observe(perf_counter() - self.start, **self.labels)
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Duplicated metric: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def clear(self):
+        for metric in self._metrics.values():
+            metric.clear()
+
+
+registry = Registry()
+
+
+def counter(name: str, documentation: str, labels: tuple[str, ...] = ()) -> Counter:
+    return registry.register(Counter(name, documentation, labels))
+
+
+def gauge(name: str, documentation: str, labels: tuple[str, ...] = ()) -> Gauge:
+    return registry.register(Gauge(name, documentation, labels))
+
+
+def histogram(
+    name: str,
+    documentation: str,
+    labels: tuple[str, ...] = (),
+    buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+) -> Histogram:
+    return registry.register(Histogram(name, documentation, labels, buckets))
+
+
+# HTTP
+http_requests_total = counter(
+    "http_requests_total", "Total HTTP requests.", ("method", "route", "status")
+)
+http_request_duration_seconds = histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency until the response starts.",
+    ("method", "route"),
+)
+http_requests_in_progress = gauge(
+    "http_requests_in_progress", "HTTP requests being processed.", ("method",)
+)
+
+# ジャッジ
+judge_queue_depth = gauge(
+    "judge_queue_depth", "Submissions waiting for the judge to start."
+)
+judge_in_progress = gauge("judge_in_progress", "Submissions being judged.")
+judge0_request_duration_seconds = histogram(
+    "judge0_request_duration_seconds",
+    "Time from submitting a testcase to Judge0 until its result is available.",
+    ("language",),
+)
+judge_verdicts_total = counter(
+    "judge_verdicts_total", "Testcase verdicts recorded.", ("status",)
+)
+judge_backend_outstanding = gauge(
+    "judge_backend_outstanding",
+    "Testcases in flight per Judge0 backend.",
+    ("backend",),
+)
+judge_backend_available = gauge(
+    "judge_backend_available",
+    "Whether the dispatcher routes to the Judge0 backend (1) or not (0).",
+    ("backend",),
+)
+
+# Gemini
+gemini_request_duration_seconds = histogram(
+    "gemini_request_duration_seconds",
+    "Gemini review latency until the whole response is received.",
+    ("mode",),
+    buckets=(0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0),
+)
+gemini_tokens_total = counter(
+    "gemini_tokens_total", "Tokens reported by Gemini.", ("kind",)
+)
+
+# データベースのコネクションプール（出力するときに api/core/pool.py から設定する）
+db_pool_connections = gauge(
+    "db_pool_connections",
+    "Database pool connections by state.",
+    ("engine", "state"),
+)
+db_pool_checkouts = gauge("db_pool_checkouts", "Database pool checkouts.", ("engine",))
+db_pool_timeouts = gauge(
+    "db_pool_timeouts", "Database pool checkout timeouts.", ("engine",)
+)
+db_pool_wait_seconds = gauge(
+    "db_pool_wait_seconds", "Database pool checkout latency.", ("engine",)
+)
@@ -0,0 +1,102 @@
+import threading
+from time import perf_counter
+
+from sqlalchemy import exc
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from api.core import metrics
+
+
+class PoolStats:
+    """プールからの接続の貸し出しにかかった時間とタイムアウトの回数を数える。"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def record(self, seconds: float, timed_out: bool = False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_seconds_total += seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+
+
+class InstrumentedQueuePool(QueuePool):
+    """
+    QueuePool に、接続の貸し出しにかかった時間の計測を加えたもの。
+    空きを待つ時間と、新しく接続を作る時間を含む。
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def _do_get(self):
+        start = perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            self.stats.record(perf_counter() - start, timed_out=True)
+            raise
+        self.stats.record(perf_counter() - start)
+        return connection
+
+    def recreate(self):
+        # engine.dispose() などで作り直しても、それまでの記録を引き継ぐ
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+
+class InstrumentedAsyncQueuePool(InstrumentedQueuePool, AsyncAdaptedQueuePool):
+    """AsyncEngine 用の InstrumentedQueuePool。"""
+
+
+_engines: dict[str, Engine] = {}
+
+
+def register(name: str, engine: Engine):
+    """status() で状態を返すエンジンとして登録する。"""
+    _engines[name] = engine
+
+
+def status() -> list[dict]:
+    result = []
+    for name, engine in _engines.items():
+        pool = engine.pool
+        if not isinstance(pool, InstrumentedQueuePool):
+            continue
+
+        result.append(
+            {
+                "name": name,
+                "size": pool.size(),
+                "checked_in": pool.checkedin(),
+                "checked_out": pool.checkedout(),
+                "overflow": max(pool.overflow(), 0),
+                "max_overflow": pool._max_overflow,
+                "checkouts": pool.stats.checkouts,
+                "timeouts": pool.stats.timeouts,
+                "wait_seconds_total": pool.stats.wait_seconds_total,
+                "wait_seconds_max": pool.stats.wait_seconds_max,
+            }
+        )
+    return result
+
+
+def update_metrics():
+    """status() の値を /metrics のゲージに反映する。"""
+    for engine in status():
+        name = engine["name"]
+        for state in ("checked_in", "checked_out", "overflow"):
+            metrics.db_pool_connections.set(engine[state], engine=name, state=state)
+        metrics.db_pool_checkouts.set(engine["checkouts"], engine=name)
+        metrics.db_pool_timeouts.set(engine["timeouts"], engine=name)
+        metrics.db_pool_wait_seconds.set(engine["wait_seconds_total"], engine=name)
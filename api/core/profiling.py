@@ -0,0 +1,146 @@
+"""
+リクエストごとの SQL の計測。
+
+SQLAlchemy のイベントで、リクエストの処理中に実行した SQL の件数と時間を数える。
+遅い SQL と、同じ SQL を何度も実行している箇所（N+1）はルートとあわせてログに出す。
+"""
+
+import logging
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+from typing import Iterator
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from api.core.config import (
+    SQL_N_PLUS_ONE_THRESHOLD,
+    SQL_PROFILING,
+    SQL_SLOW_QUERY_SECONDS,
+)
+
+logger = logging.getLogger(__name__)
+
+# ログに出す SQL の最大の長さ
+MAX_STATEMENT_LENGTH = 500
+
+
+class QueryStats:
+    """1リクエスト（または track() のブロック）で実行した SQL の記録。"""
+
+    def __init__(self, route: str = "", scope: dict | None = None):
+        self._route = route
+        self._scope = scope
+        self.count = 0
+        self.seconds = 0.0
+        self.statements: Counter[str] = Counter()
+        self.closed = False
+
+    @property
+    def route(self) -> str:
+        # ルーティングが済んでいれば、パスではなくルートのテンプレートを返す
+        route = (self._scope or {}).get("route")
+        return getattr(route, "path", self._route)
+
+    def record(self, statement: str, seconds: float):
+        if self.closed:
+            return
+
+        self.count += 1
+        self.seconds += seconds
+        self.statements[statement] += 1
+
+        if seconds >= SQL_SLOW_QUERY_SECONDS:
+            logger.warning(
+                "slow query: route=%s %.3fs %s",
+                self.route,
+                seconds,
+                _shorten(statement),
+            )
+
+    def repeated(self, threshold: int = SQL_N_PLUS_ONE_THRESHOLD) -> dict[str, int]:
+        """threshold 回を超えて実行された SQL と、その回数を返す。"""
+        return {
+            statement: count
+            for statement, count in self.statements.items()
+            if count > threshold
+        }
+
+    def close(self):
+        """記録を締め切り、N+1 の疑いがあればログに出す。"""
+        self.closed = True
+        for statement, count in self.repeated().items():
+            logger.warning(
+                "possible N+1: route=%s executed %d times: %s",
+                self.route,
+                count,
+                _shorten(statement),
+            )
+
+    def server_timing(self) -> str:
+        return f'db;desc="{self.count} queries";dur={self.seconds * 1000:.1f}'
+
+
+_current: ContextVar[QueryStats | None] = ContextVar("query_stats", default=None)
+
+
+def _shorten(statement: str) -> str:
+    statement = " ".join(statement.split())
+    if len(statement) > MAX_STATEMENT_LENGTH:
+        return statement[:MAX_STATEMENT_LENGTH] + "..."
+    return statement
+
+
+@contextmanager
+def track(route: str = "", scope: dict | None = None) -> Iterator[QueryStats]:
+    """
+    ブロックの中で実行した SQL を数える。
+    スレッドプールで動く同期版のエンドポイントにもコンテキストごと引き継がれる。
+    """
+    stats = QueryStats(route, scope)
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+        stats.close()
+
+
+def current() -> QueryStats | None:
+    return _current.get()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault("query_start", []).append(perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    if stats is None:
+        return
+
+    starts = conn.info.get("query_start")
+    if starts:
+        stats.record(statement, perf_counter() - starts.pop())
+
+
+def _handle_error(exception_context):
+    # 失敗した SQL の開始時刻を捨てる
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("query_start"):
+        conn.info["query_start"].pop()
+
+
+def install():
+    """すべてのエンジン（非同期版の内側の同期エンジンを含む）にイベントを登録する。"""
+    if not SQL_PROFILING or event.contains(
+        Engine, "before_cursor_execute", _before_cursor_execute
+    ):
+        return
+
+    event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(Engine, "handle_error", _handle_error)
@@ -0,0 +1,114 @@
+"""
+/run（コードの実行）専用の実行レーン。
+
+提出のジャッジとは別のスレッド（JUDGE_RUN_WORKERS 本）と Judge0（JUDGE_RUN_API_URLS）で実行するので、
+コンテスト中にジャッジが混んでいても /run は待たされない。
+1人のユーザーが同時に実行できるのは JUDGE_RUN_USER_CONCURRENCY 件まで、全体で実行を待てるのは
+JUDGE_RUN_MAX_QUEUED 件までで、超えた分は待たせずに断る。
+
+結果は JUDGE_RUN_RESULT_TTL 秒の間取っておき、run_id で取り出せる（プロセスごと）。
+"""
+
+import threading
+import uuid
+from concurrent.futures import Future
+from dataclasses import dataclass
+from functools import cache
+from typing import Callable, Literal
+
+from cachetools import TTLCache
+
+from api.core.config import (
+    JUDGE_RUN_MAX_QUEUED,
+    JUDGE_RUN_RESULT_TTL,
+    JUDGE_RUN_USER_CONCURRENCY,
+    JUDGE_RUN_WORKERS,
+)
+from api.core.scheduler import JudgeScheduler
+from api.database import generate_id
+
+# 取っておく結果の数の上限
+MAX_RUNS = 10000
+
+
+class RunLimitExceeded(Exception):
+    """ユーザーが同時に実行できる数か、実行を待てる数を超えた。"""
+
+
+@dataclass(eq=False)
+class Run:
+    id: uuid.UUID
+    user_id: uuid.UUID
+    future: Future
+
+    @property
+    def state(self) -> Literal["queued", "running", "finished"]:
+        if self.future.done():
+            return "finished"
+        return "running" if self.future.running() else "queued"
+
+
+class RunLane:
+    def __init__(
+        self,
+        workers: int = JUDGE_RUN_WORKERS,
+        user_concurrency: int = JUDGE_RUN_USER_CONCURRENCY,
+        ttl: int = JUDGE_RUN_RESULT_TTL,
+        max_queued: int = JUDGE_RUN_MAX_QUEUED,
+    ):
+        self.user_concurrency = user_concurrency
+        self.max_queued = max_queued
+        # 上限はここで確かめるので、スケジューラーでは待たせない
+        self.scheduler = JudgeScheduler(workers, user_concurrency=0)
+        self._lock = threading.Lock()
+        self._active: dict[uuid.UUID, int] = {}
+        self._runs: TTLCache[uuid.UUID, Run] = TTLCache(maxsize=MAX_RUNS, ttl=ttl)
+
+    def submit(
+        self,
+        user_id: uuid.UUID,
+        fn: Callable,
+        *args,
+        run_id: uuid.UUID | None = None,
+    ) -> Run:
+        """
+        fn(*args) を実行する。ユーザーか待ち行列の上限を超えていれば RunLimitExceeded。
+        run_id を省略すると新しく作る（fn にも渡したいときは、作ってから渡す）。
+        """
+        with self._lock:
+            active = self._active.get(user_id, 0)
+            if self.user_concurrency > 0 and active >= self.user_concurrency:
+                raise RunLimitExceeded(f"Too many runs in progress ({active})")
+            if self.max_queued > 0 and self.scheduler.queued() >= self.max_queued:
+                raise RunLimitExceeded("Too many runs are waiting")
+            self._active[user_id] = active + 1
+
+        def execute():
+            # 結果を返す前に枠を空ける
+            try:
+                return fn(*args)
+            finally:
+                self._release(user_id)
+
+        run_id = run_id or generate_id()
+        run = Run(
+            run_id, user_id, self.scheduler.submit(run_id, user_id, None, execute)
+        )
+        with self._lock:
+            self._runs[run_id] = run
+        return run
+
+    def _release(self, user_id: uuid.UUID):
+        with self._lock:
+            self._active[user_id] -= 1
+            if not self._active[user_id]:
+                del self._active[user_id]
+
+    def get(self, run_id: uuid.UUID) -> Run | None:
+        with self._lock:
+            return self._runs.get(run_id)
+
+
+@cache
+def get_run_lane() -> RunLane:
+    return RunLane()
@@ -0,0 +1,234 @@
+"""
+ジャッジの実行順を決めるスケジューラー。
+
+提出は FIFO ではなく、次の規則で実行する。
+
+- 優先レーン（テストケースの少ない問題）を通常のレーンより先に実行する
+- 同じレーンの中では、ユーザーごとの重み付き公平キューイング（self-clocked fair queueing）で
+  順番を決める。たくさん提出したユーザーの提出は、他のユーザーの提出の後ろに回る
+- ユーザーごと（レーンごと）・問題ごとに、同時に実行する数の上限を設ける
+
+キューはプロセスごとに持つ。
+"""
+
+import threading
+import uuid
+from collections import defaultdict, deque
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from functools import cache
+from time import monotonic
+from typing import Callable, Literal
+
+from api.core.config import (
+    JUDGE_PROBLEM_CONCURRENCY,
+    JUDGE_USER_CONCURRENCY,
+    JUDGE_WORKERS,
+)
+
+PRIORITY, NORMAL = 0, 1
+
+# 実行時間の移動平均の重み（新しい値の割合）
+DURATION_SMOOTHING = 0.2
+
+
+@dataclass(eq=False)
+class Job:
+    id: uuid.UUID
+    user_id: uuid.UUID
+    problem_id: uuid.UUID | None
+    lane: int
+    cost: float
+    fn: Callable
+    args: tuple
+    finish_tag: float = 0.0
+    enqueued_at: float = field(default_factory=monotonic)
+    started_at: float | None = None
+    future: Future = field(default_factory=Future)
+
+    @property
+    def key(self) -> tuple[int, float]:
+        return (self.lane, self.finish_tag)
+
+
+@dataclass(frozen=True)
+class JobStatus:
+    state: Literal["queued", "running"]
+    position: int  # 先に実行される提出の数（実行中なら 0）
+    estimated_wait: float  # 実行が始まるまでの見込みの秒数
+
+
+class JudgeScheduler:
+    def __init__(
+        self,
+        workers: int = JUDGE_WORKERS,
+        user_concurrency: int = JUDGE_USER_CONCURRENCY,
+        problem_concurrency: int = JUDGE_PROBLEM_CONCURRENCY,
+    ):
+        self.workers = workers
+        self.user_concurrency = user_concurrency
+        self.problem_concurrency = problem_concurrency
+
+        self._condition = threading.Condition()
+        # (レーン, ユーザー) ごとの待ち行列
+        self._queues: dict[tuple[int, uuid.UUID], deque[Job]] = defaultdict(deque)
+        self._jobs: dict[uuid.UUID, Job] = {}
+        # レーンごとの仮想時刻と、(レーン, ユーザー) ごとの最後の終了タグ
+        self._virtual_time = [0.0, 0.0]
+        self._last_finish: dict[tuple[int, uuid.UUID], float] = {}
+        self._running_by_user: dict[tuple[int, uuid.UUID], int] = defaultdict(int)
+        self._running_by_problem: dict[uuid.UUID, int] = defaultdict(int)
+        # 1件あたりの実行時間（秒）の移動平均
+        self.average_duration = 1.0
+        self._threads: list[threading.Thread] = []
+
+    def submit(
+        self,
+        job_id: uuid.UUID,
+        user_id: uuid.UUID,
+        problem_id: uuid.UUID | None,
+        fn: Callable,
+        *args,
+        cost: float = 1.0,
+        priority: bool = False,
+    ) -> Future:
+        """
+        fn(*args) をキューに入れ、結果の Future を返す。
+        cost は重さの見積もり（テストケースの数など）で、大きいほど公平キューイングで後ろに回る。
+        """
+        lane = PRIORITY if priority else NORMAL
+        job = Job(job_id, user_id, problem_id, lane, max(cost, 1.0), fn, args)
+        flow = (lane, user_id)
+
+        with self._condition:
+            start = max(self._virtual_time[lane], self._last_finish.get(flow, 0.0))
+            job.finish_tag = start + job.cost
+            self._last_finish[flow] = job.finish_tag
+            self._queues[flow].append(job)
+            self._jobs[job_id] = job
+            self._start_workers()
+            self._condition.notify()
+        return job.future
+
+    def status(self, job_id: uuid.UUID) -> JobStatus | None:
+        """キューに入っているか実行中の提出の状態。どちらでもなければ None。"""
+        with self._condition:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            if job.started_at is not None:
+                return JobStatus("running", 0, 0.0)
+
+            queued = [
+                other
+                for queue in self._queues.values()
+                for other in queue
+                if other.key < job.key
+            ]
+            position = len(queued)
+            # 全体で workers 件ずつ、同じユーザーの提出は user_concurrency 件ずつ進む
+            own = sum(
+                1
+                for other in self._queues.get((job.lane, job.user_id), ())
+                if other.key < job.key
+            )
+            rounds = max(
+                position // max(self.workers, 1),
+                own // max(self.user_concurrency, 1),
+            )
+            return JobStatus("queued", position, rounds * self.average_duration)
+
+    def queued(self) -> int:
+        with self._condition:
+            return sum(len(queue) for queue in self._queues.values())
+
+    def _eligible(self, job: Job) -> bool:
+        if (
+            self.user_concurrency > 0
+            and self._running_by_user.get((job.lane, job.user_id), 0)
+            >= self.user_concurrency
+        ):
+            return False
+        if (
+            self.problem_concurrency > 0
+            and job.problem_id is not None
+            and self._running_by_problem.get(job.problem_id, 0)
+            >= self.problem_concurrency
+        ):
+            return False
+        return True
+
+    def _next_job(self) -> Job | None:
+        """次に実行する提出を取り出す。上限のため実行できるものが無ければ None。"""
+        best = None
+        for queue in self._queues.values():
+            if queue and self._eligible(queue[0]):
+                if best is None or queue[0].key < best.key:
+                    best = queue[0]
+        if best is None:
+            return None
+
+        flow = (best.lane, best.user_id)
+        self._queues[flow].popleft()
+        if not self._queues[flow]:
+            del self._queues[flow]
+        self._virtual_time[best.lane] = best.finish_tag
+
+        best.started_at = monotonic()
+        self._running_by_user[flow] += 1
+        if best.problem_id is not None:
+            self._running_by_problem[best.problem_id] += 1
+        return best
+
+    def _finish(self, job: Job):
+        flow = (job.lane, job.user_id)
+        with self._condition:
+            del self._jobs[job.id]
+            self._running_by_user[flow] -= 1
+            if not self._running_by_user[flow]:
+                del self._running_by_user[flow]
+            if job.problem_id is not None:
+                self._running_by_problem[job.problem_id] -= 1
+                if not self._running_by_problem[job.problem_id]:
+                    del self._running_by_problem[job.problem_id]
+            # 待ち行列も実行中の提出も無いユーザーの終了タグは、仮想時刻に追い越されたら要らない
+            if (
+                flow not in self._queues
+                and flow not in self._running_by_user
+                and self._last_finish.get(flow, 0.0) <= self._virtual_time[job.lane]
+            ):
+                self._last_finish.pop(flow, None)
+
+            duration = monotonic() - job.started_at
+            self.average_duration += DURATION_SMOOTHING * (
+                duration - self.average_duration
+            )
+            # 上限で止まっていた提出が実行できるようになったかもしれない
+            self._condition.notify_all()
+
+    def _start_workers(self):
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(target=self._work, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _work(self):
+        while True:
+            with self._condition:
+                job = self._next_job()
+                while job is None:
+                    self._condition.wait()
+                    job = self._next_job()
+
+            # 例外は Future に入れる（記録するかは呼び出し側が決める）
+            if job.future.set_running_or_notify_cancel():
+                try:
+                    job.future.set_result(job.fn(*job.args))
+                except Exception as e:
+                    job.future.set_exception(e)
+            self._finish(job)
+
+
+@cache
+def get_scheduler() -> JudgeScheduler:
+    return JudgeScheduler()
@@ -6,9 +6,10 @@ from fastapi import Depends, HTTPException, Request, status
 from fastapi.openapi.models import OAuthFlows as OAuthFlowsModel
 from fastapi.security import OAuth2
 from fastapi.security.utils import get_authorization_scheme_param
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
 
-import api.crud.user as user_crud
+import api.crud.aio.user as user_crud
 import api.models.user as user_model
 from api import database
 from api.core.config import ALGORITHM, SECRET_KEY
@@ -17,15 +18,16 @@ from api.utils.hash import verify_password
 SESSION_ID_LENGTH = 64
 
 
-def authenticate_user(db: Session, username: str, password: str):
-    user = user_crud.get_user_by_username(db, username)
+async def authenticate_user(db: AsyncSession, username: str, password: str):
+    user = await user_crud.get_user_by_username(db, username)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    if not verify_password(password, user.password):
+    # bcrypt は重いので、イベントループを止めないようにスレッドで計算する
+    if not await run_in_threadpool(verify_password, password, user.password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -42,35 +44,35 @@ def create_access_token(data: dict, expires_delta: timedelta = 15):
     return encoded_jwt
 
 
-def get_token_from_session(db: Session, request: Request) -> str | None:
+async def get_token_from_session(db: AsyncSession, request: Request) -> str | None:
     session_id = request.cookies.get("session")
     if not session_id:
         return None
 
-    session = user_crud.get_session(db, session_id)
+    session = await user_crud.get_session(db, session_id)
     if not session:
         return None
 
     return session.token
 
 
-def create_session(db: Session, token: str) -> str:
+async def create_session(db: AsyncSession, token: str) -> str:
     while True:
         session_id = token_hex(SESSION_ID_LENGTH)
-        if not user_crud.get_session(db, session_id):
+        if not await user_crud.get_session(db, session_id):
             break
 
     session = user_model.Session(id=session_id, token=f"Bearer {token}")
     db.add(session)
-    db.commit()
+    await db.commit()
     return session_id
 
 
-def delete_session(db: Session, session_id: str):
-    session = user_crud.get_session(db, session_id)
+async def delete_session(db: AsyncSession, session_id: str):
+    session = await user_crud.get_session(db, session_id)
     if session:
-        db.delete(session)
-        db.commit()
+        await db.delete(session)
+        await db.commit()
 
 
 # HeaderまたはCookieからjwtトークンを認証
@@ -87,10 +89,10 @@ class OAuth2PasswordBearerWithCookie(OAuth2):
         flows = OAuthFlowsModel(password={"tokenUrl": tokenUrl, "scopes": scopes})
         super().__init__(flows=flows, scheme_name=scheme_name, auto_error=auto_error)
 
-    def __call__(
-        self, request: Request, db: Session = Depends(database.get_db)
+    async def __call__(
+        self, request: Request, db: AsyncSession = Depends(database.get_async_db)
     ) -> str | None:
-        authorization: str = get_token_from_session(db, request)
+        authorization: str = await get_token_from_session(db, request)
 
         scheme, param = get_authorization_scheme_param(authorization)
         if not authorization or scheme.lower() != "bearer":
@@ -126,11 +128,11 @@ def get_current_user(token: str = Depends(oauth2_scheme)) -> str:
     return username
 
 
-def get_current_active_user(
+async def get_current_active_user(
     current_username: str = Depends(get_current_user),
-    db: Session = Depends(database.get_db),
+    db: AsyncSession = Depends(database.get_async_db),
 ) -> user_model.User:
-    user = user_crud.get_user_by_username(db, current_username)
+    user = await user_crud.get_user_by_username(db, current_username)
     if not user or not user.is_active:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
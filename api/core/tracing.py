@@ -0,0 +1,387 @@
+"""
+分散トレーシング。
+
+OpenTelemetry と同じ形（トレース ID・スパン ID・W3C の traceparent）でスパンを作り、
+ログ・メモリ上・OTLP/HTTP（JSON）のいずれかに出力する。
+
+トレースを記録するかは、親の無いスパン（リクエストの受け付けなど）を作るときに
+TRACING_SAMPLE_RATE の割合で決め、子のスパンは親（traceparent ヘッダを含む）に従う。
+記録しないときは何もしないスパンを返す。TRACING_SAMPLE_RATE が 0 ならトレーシングは
+無効で、ほとんど負荷はかからない。
+"""
+
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator
+
+import httpx
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from api.core.config import (
+    TRACING_EXPORTER,
+    TRACING_OTLP_ENDPOINT,
+    TRACING_SAMPLE_RATE,
+    TRACING_SERVICE_NAME,
+)
+
+logger = logging.getLogger(__name__)
+
+# 属性に入れる SQL の最大の長さ
+MAX_STATEMENT_LENGTH = 1000
+
+# OTLP の SpanKind
+KINDS = {"internal": 1, "server": 2, "client": 3}
+
+
+class Span:
+    recording = True
+
+    def __init__(
+        self,
+        name: str,
+        trace_id: str,
+        parent_id: str | None,
+        kind: str = "internal",
+        attributes: dict | None = None,
+    ):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.kind = kind
+        self.attributes = dict(attributes or {})
+        self.status: tuple[str, str] = ("unset", "")
+        self.start_ns = time.time_ns()
+        self.end_ns: int | None = None
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+
+    def update_name(self, name: str):
+        self.name = name
+
+    def set_error(self, message: str = ""):
+        self.status = ("error", message)
+
+    def record_exception(self, exception: BaseException):
+        self.set_attribute("exception.type", type(exception).__name__)
+        self.set_attribute("exception.message", str(exception))
+        self.set_error(str(exception))
+
+    def end(self):
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+            exporter.export(self)
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "kind": self.kind,
+            "start_ns": self.start_ns,
+            "duration_ms": ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6,
+            "attributes": self.attributes,
+            "status": self.status[0],
+        }
+
+
+class _NoopSpan:
+    """記録しないトレースのスパン。"""
+
+    recording = False
+    traceparent = None
+
+    def set_attribute(self, key: str, value):
+        pass
+
+    def update_name(self, name: str):
+        pass
+
+    def set_error(self, message: str = ""):
+        pass
+
+    def record_exception(self, exception: BaseException):
+        pass
+
+    def end(self):
+        pass
+
+
+NOOP = _NoopSpan()
+
+_current: ContextVar[Span | _NoopSpan | None] = ContextVar("span", default=None)
+
+
+def current() -> Span | _NoopSpan | None:
+    """
+    今のスパンを返す。バックグラウンドのタスクに渡して、span() の parent にする。
+    """
+    return _current.get()
+
+
+def _parse_traceparent(traceparent: str) -> tuple[str, str, bool] | None:
+    parts = traceparent.strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        int(parts[1], 16), int(parts[2], 16)
+        sampled = int(parts[3], 16) & 1 == 1
+    except ValueError:
+        return None
+    if parts[1] == "0" * 32 or parts[2] == "0" * 16:
+        return None
+    return parts[1], parts[2], sampled
+
+
+def start_span(
+    name: str,
+    parent: "str | Span | _NoopSpan | None" = None,
+    kind: str = "internal",
+    attributes: dict | None = None,
+) -> Span | _NoopSpan:
+    """
+    スパンを始める（今のスパンにはしない）。終わったら end() を呼ぶ。
+    parent は traceparent の文字列かスパン。省略時は今のスパンの子にする。
+    """
+    if TRACING_SAMPLE_RATE <= 0:
+        return NOOP
+    if parent is None:
+        parent = _current.get()
+
+    if isinstance(parent, str):
+        parsed = _parse_traceparent(parent)
+        if parsed is not None:
+            trace_id, parent_id, sampled = parsed
+            if not sampled:
+                return NOOP
+            return Span(name, trace_id, parent_id, kind, attributes)
+        parent = None
+
+    if parent is None:
+        if random.random() >= TRACING_SAMPLE_RATE:
+            return NOOP
+        return Span(name, os.urandom(16).hex(), None, kind, attributes)
+
+    if not parent.recording:
+        return NOOP
+    return Span(name, parent.trace_id, parent.span_id, kind, attributes)
+
+
+@contextmanager
+def span(
+    name: str,
+    parent: "str | Span | _NoopSpan | None" = None,
+    kind: str = "internal",
+    **attributes,
+) -> Iterator[Span | _NoopSpan]:
+    """ブロックの間、スパンを今のスパンにする。例外はスパンに記録してから投げ直す。"""
+    if TRACING_SAMPLE_RATE <= 0:
+        # トレーシングが無効なら、コンテキストも触らない
+        yield NOOP
+        return
+
+    current_span = start_span(name, parent, kind, attributes)
+    token = _current.set(current_span)
+    try:
+        yield current_span
+    except BaseException as e:
+        current_span.record_exception(e)
+        raise
+    finally:
+        _current.reset(token)
+        current_span.end()
+
+
+class ConsoleExporter:
+    """スパンを1行の JSON としてログに出す。"""
+
+    def export(self, span: Span):
+        logger.info("span %s", json.dumps(span.to_dict(), default=str))
+
+
+class MemoryExporter:
+    """スパンをメモリ上に溜める（テストやその場での調査用）。"""
+
+    def __init__(self, max_spans: int = 10000):
+        self.spans: list[Span] = []
+        self.max_spans = max_spans
+        self._lock = threading.Lock()
+
+    def export(self, span: Span):
+        with self._lock:
+            self.spans.append(span)
+            del self.spans[: -self.max_spans]
+
+    def clear(self):
+        with self._lock:
+            self.spans.clear()
+
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: dict) -> list[dict]:
+    return [
+        {"key": key, "value": _otlp_value(value)} for key, value in attributes.items()
+    ]
+
+
+class OtlpExporter:
+    """
+    OTLP/HTTP（JSON）でコレクターに送る。
+    スパンはキューに入れ、別のスレッドがまとめて送る。キューが溢れたら捨てる。
+    """
+
+    def __init__(
+        self,
+        endpoint: str,
+        service_name: str,
+        batch_size: int = 512,
+        interval: float = 1.0,
+    ):
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self.batch_size = batch_size
+        self.interval = interval
+        self._queue: queue.Queue[Span] = queue.Queue(maxsize=batch_size * 4)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def export(self, span: Span):
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            pass
+
+    def payload(self, spans: list[Span]) -> dict:
+        return {
+            "resourceSpans": [
+                {
+                    "resource": {
+                        "attributes": _otlp_attributes(
+                            {"service.name": self.service_name}
+                        )
+                    },
+                    "scopeSpans": [
+                        {
+                            "scope": {"name": __name__},
+                            "spans": [
+                                {
+                                    "traceId": span.trace_id,
+                                    "spanId": span.span_id,
+                                    "parentSpanId": span.parent_id or "",
+                                    "name": span.name,
+                                    "kind": KINDS.get(span.kind, 1),
+                                    "startTimeUnixNano": str(span.start_ns),
+                                    "endTimeUnixNano": str(span.end_ns),
+                                    "attributes": _otlp_attributes(span.attributes),
+                                    "status": (
+                                        {"code": 2, "message": span.status[1]}
+                                        if span.status[0] == "error"
+                                        else {}
+                                    ),
+                                }
+                                for span in spans
+                            ],
+                        }
+                    ],
+                }
+            ]
+        }
+
+    def _run(self):
+        with httpx.Client(timeout=10) as client:
+            while True:
+                spans = [self._queue.get()]
+                deadline = time.monotonic() + self.interval
+                while len(spans) < self.batch_size:
+                    timeout = deadline - time.monotonic()
+                    if timeout <= 0:
+                        break
+                    try:
+                        spans.append(self._queue.get(timeout=timeout))
+                    except queue.Empty:
+                        break
+
+                try:
+                    client.post(self.endpoint, json=self.payload(spans))
+                except httpx.HTTPError as e:
+                    logger.warning("Failed to export %d spans: %s", len(spans), e)
+
+
+def _create_exporter():
+    if TRACING_EXPORTER == "otlp" and TRACING_SAMPLE_RATE > 0:
+        return OtlpExporter(TRACING_OTLP_ENDPOINT, TRACING_SERVICE_NAME)
+    if TRACING_EXPORTER == "memory":
+        return MemoryExporter()
+    return ConsoleExporter()
+
+
+exporter = _create_exporter()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    parent = _current.get()
+    if parent is None or not parent.recording:
+        return
+
+    operation = statement.lstrip().split(None, 1)[0].upper() if statement else "SQL"
+    conn.info.setdefault("trace_span", []).append(
+        start_span(
+            operation,
+            parent,
+            "client",
+            {
+                "db.system": conn.dialect.name,
+                "db.statement": statement[:MAX_STATEMENT_LENGTH],
+            },
+        )
+    )
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    spans = conn.info.get("trace_span")
+    if spans:
+        spans.pop().end()
+
+
+def _handle_error(exception_context):
+    conn = exception_context.connection
+    spans = conn.info.get("trace_span") if conn is not None else None
+    if spans:
+        sql_span = spans.pop()
+        sql_span.record_exception(exception_context.original_exception)
+        sql_span.end()
+
+
+def install():
+    """すべてのエンジンに SQL のスパンを作るイベントを登録する。"""
+    if TRACING_SAMPLE_RATE <= 0 or event.contains(
+        Engine, "before_cursor_execute", _before_cursor_execute
+    ):
+        return
+
+    event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(Engine, "handle_error", _handle_error)
@@ -0,0 +1,116 @@
+"""
+api.crud.problem の非同期版（ルーター用）。
+"""
+
+import uuid
+
+from fastapi import HTTPException, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api.crud.problem import ac_user_count_statement
+from api.models import problem as problem_model
+
+
+async def get_category_by_path_id(
+    db: AsyncSession, path_id: str
+) -> problem_model.Category:
+    return await db.scalar(
+        select(problem_model.Category).where(problem_model.Category.path_id == path_id)
+    )
+
+
+async def get_category_list(db: AsyncSession) -> list[problem_model.Category]:
+    return (
+        await db.scalars(
+            select(problem_model.Category).order_by(problem_model.Category.path_id)
+        )
+    ).all()
+
+
+async def get_problem(db: AsyncSession, problem_id: uuid.UUID) -> problem_model.Problem:
+    return await db.scalar(
+        select(problem_model.Problem).where(problem_model.Problem.id == problem_id)
+    )
+
+
+async def get_problem_by_path_id(
+    db: AsyncSession, category_path_id: str, path_id: str
+) -> problem_model.Problem:
+    category = await get_category_by_path_id(db, category_path_id)
+
+    if not category:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Category not found",
+        )
+
+    return await db.scalar(
+        select(problem_model.Problem).where(
+            problem_model.Problem.category_id == category.id,
+            problem_model.Problem.path_id == path_id,
+        )
+    )
+
+
+async def get_problem_list_with_ac_submissions(
+    db: AsyncSession, category_path_id: str
+) -> list[tuple[problem_model.Problem, int]]:
+    category = await get_category_by_path_id(db, category_path_id)
+
+    if not category:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Category not found",
+        )
+
+    result = await db.execute(
+        ac_user_count_statement()
+        .where(problem_model.Problem.category_id == category.id)
+        .order_by(problem_model.Problem.path_id)
+    )
+    return result.all()
+
+
+async def get_problem_with_submission_count(
+    db: AsyncSession, category_path_id: str, problem_path_id: str
+) -> tuple[problem_model.Problem, int]:
+    problem = await get_problem_by_path_id(db, category_path_id, problem_path_id)
+
+    if not problem:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Problem not found",
+        )
+
+    result = await db.execute(
+        ac_user_count_statement().where(problem_model.Problem.id == problem.id)
+    )
+    return result.first()
+
+
+async def get_testcase_id_list(
+    db: AsyncSession, problem_id: uuid.UUID
+) -> list[uuid.UUID]:
+    return (
+        await db.scalars(
+            select(problem_model.Testcase.id).where(
+                problem_model.Testcase.problem_id == problem_id
+            )
+        )
+    ).all()
+
+
+async def get_testcase_names(
+    db: AsyncSession, testcase_ids: list[uuid.UUID]
+) -> dict[uuid.UUID, str]:
+    """テストケースの名前を1回のクエリでまとめて取得する。"""
+    if not testcase_ids:
+        return {}
+
+    result = await db.execute(
+        select(problem_model.Testcase.id, problem_model.Testcase.name).where(
+            problem_model.Testcase.id.in_(testcase_ids)
+        )
+    )
+    return dict(result.all())
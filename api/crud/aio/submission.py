@@ -0,0 +1,133 @@
+"""
+api.crud.submission の非同期版（ルーター用）。
+ジャッジ自体は同期版の judge_submission_by_id をバックグラウンドで動かす。
+"""
+
+import uuid
+from collections import defaultdict
+from typing import Literal
+
+from fastapi import HTTPException, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api.crud.aio import problem as problem_crud
+from api.crud.submission import Status, language_dict, tally_status
+from api.models import submission as submission_model
+from api.models import user as user_model
+from api.schemas import submission as submission_schema
+
+
+async def create_submission(
+    db: AsyncSession,
+    submission: submission_schema.SubmissionCreate,
+    category_path_id: str,
+    problem_path_id: str,
+    user: user_model.User,
+) -> submission_model.Submission:
+    problem = await problem_crud.get_problem_by_path_id(
+        db, category_path_id, problem_path_id
+    )
+
+    if not problem:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Problem not found",
+        )
+
+    if submission.language not in language_dict:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid language",
+        )
+
+    db_submission = submission_model.Submission(
+        problem_id=problem.id,
+        user_id=user.id,
+        language=submission.language,
+        code=submission.code,
+    )
+
+    db.add(db_submission)
+    await db.commit()
+    await db.refresh(db_submission)
+    return db_submission
+
+
+async def get_submission(
+    db: AsyncSession, submission_id: uuid.UUID
+) -> submission_model.Submission:
+    return await db.scalar(
+        select(submission_model.Submission).where(
+            submission_model.Submission.id == submission_id
+        )
+    )
+
+
+async def get_submission_detail_list(
+    db: AsyncSession, submission: submission_model.Submission
+) -> list[submission_model.SubmissionDetail]:
+    return (
+        await db.scalars(
+            select(submission_model.SubmissionDetail).where(
+                submission_model.SubmissionDetail.submission_id == submission.id
+            )
+        )
+    ).all()
+
+
+async def summarize_status(
+    db: AsyncSession, submission: submission_model.Submission
+) -> dict[Status | Literal["WJ"], int]:
+    details = await get_submission_detail_list(db, submission)
+    testcase_ids = await problem_crud.get_testcase_id_list(db, submission.problem_id)
+
+    return tally_status(testcase_ids, details)
+
+
+async def get_submission_summary_list(
+    db: AsyncSession,
+    category_path_id: str,
+    problem_path_id: str,
+    user: user_model.User,
+) -> list[list[submission_model.Submission, dict[Status | Literal["WJ"], int]]]:
+    problem = await problem_crud.get_problem_by_path_id(
+        db, category_path_id, problem_path_id
+    )
+
+    if not problem:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Problem not found",
+        )
+
+    submissions = (
+        await db.scalars(
+            select(submission_model.Submission)
+            .where(
+                submission_model.Submission.user_id == user.id,
+                submission_model.Submission.problem_id == problem.id,
+            )
+            .order_by(submission_model.Submission.created_at.desc())
+        )
+    ).all()
+
+    # テストケースは問題ごとに同じなので、1回だけ取得する
+    testcase_ids = await problem_crud.get_testcase_id_list(db, problem.id)
+
+    # 全ての提出の結果を1回のクエリで取得し、提出ごとに分ける
+    details = defaultdict(list)
+    for detail in await db.scalars(
+        select(submission_model.SubmissionDetail)
+        .join(submission_model.Submission)
+        .where(
+            submission_model.Submission.user_id == user.id,
+            submission_model.Submission.problem_id == problem.id,
+        )
+    ):
+        details[detail.submission_id].append(detail)
+
+    return [
+        [submission, tally_status(testcase_ids, details[submission.id])]
+        for submission in submissions
+    ]
@@ -0,0 +1,52 @@
+"""
+api.crud.user の非同期版（ルーター用）。
+"""
+
+import uuid
+
+from fastapi import HTTPException, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+from api.models import user as user_model
+from api.schemas import user as user_schema
+from api.utils.hash import hash_password
+
+
+async def get_user(db: AsyncSession, user_id: uuid.UUID) -> user_model.User:
+    return await db.scalar(select(user_model.User).where(user_model.User.id == user_id))
+
+
+async def get_user_by_username(db: AsyncSession, username: str) -> user_model.User:
+    return await db.scalar(
+        select(user_model.User).where(user_model.User.username == username)
+    )
+
+
+async def get_user_list(db: AsyncSession) -> list[user_model.User]:
+    return (await db.scalars(select(user_model.User))).all()
+
+
+async def create_user(
+    db: AsyncSession, user: user_schema.UserCreate
+) -> user_model.User:
+    if await get_user_by_username(db, user.username):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="User already exists"
+        )
+
+    # bcrypt は重いので、イベントループを止めないようにスレッドで計算する
+    hashed_password = await run_in_threadpool(hash_password, user.password)
+
+    db_user = user_model.User(username=user.username, password=hashed_password)
+    db.add(db_user)
+    await db.commit()
+    await db.refresh(db_user)
+    return db_user
+
+
+async def get_session(db: AsyncSession, id: str) -> user_model.Session:
+    return await db.scalar(
+        select(user_model.Session).where(user_model.Session.id == id)
+    )
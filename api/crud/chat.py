@@ -3,16 +3,19 @@ import uuid
 from typing import Generator, Literal
 
 import google.generativeai as genai
+from sqlalchemy import and_, exists, func
 from sqlalchemy.orm import Session
 
-from api.core.config import GEMINI_API_KEY
+from api.core import metrics, tracing
+from api.core.config import GEMINI_API_KEY, GEMINI_MODEL
 from api.models import chat as chat_model
 from api.models import problem as problem_model
 from api.models import submission as submission_model
 from api.schemas import chat as chat_schema
+from api.utils import prompt
 
 genai.configure(api_key=GEMINI_API_KEY)
-model = genai.GenerativeModel("gemini-2.0-flash-exp")
+model = genai.GenerativeModel(GEMINI_MODEL)
 
 Status = Literal["AC", "WA", "TLE", "MLE", "RE", "CE", "IE"]
 
@@ -36,40 +39,6 @@ def map_status(status: dict[Status | Literal["WJ"], int]) -> str:
         return "内部エラー"
 
 
-def first_statement(problem: problem_model.Problem) -> str:
-    text = rf"""
-これから流れるチャットは、以下の問題に対する解答として作成されたコードです。あなたの役割は、これらのコードを講師としてレビューすることです。
-ただし、以下の留意事項を守ってください。
-
-- 異常系の処理については言及不要です。
-- 正解ではない場合、ヒントを与えるのみに留めてください。
-- 正解の場合、良い点と改善点、アドバイスを行ってください。
-
-問題:
-\`\`\`
-# {problem.title}
-{problem.statement}
-\`\`\`
-"""
-    return text
-
-
-def review_statement(
-    submission: submission_model.Submission, status: dict[Status | Literal["WJ"], int]
-) -> str:
-    text = rf"""
-次のコードをレビューしてください。
-
-言語: {submission.language}
-ステータス: {map_status(status)}
-コード:
-\`\`\`
-{submission.code}
-\`\`\`
-"""
-    return text
-
-
 def chat(
     db: Session,
     problem: problem_model.Problem,
@@ -87,15 +56,16 @@ def chat(
             message=curr_chat.message,
         )
 
-    chat = model.start_chat(
-        history=[
-            {"role": "user", "parts": first_statement(problem)},
-        ]
-    )
+    review_prompt = prompt.build_review_prompt(problem, submission, map_status(status))
+    chat = prompt.start_chat(model, review_prompt)
 
     chat_id = create_chat(db, "ai", "", submission).id
 
-    chunk = chat.send_message(review_statement(submission, status))
+    with metrics.gemini_request_duration_seconds.time(mode="review"), tracing.span(
+        "gemini.send_message", kind="client", model=GEMINI_MODEL, stream=False
+    ):
+        chunk = chat.send_message(review_prompt.text)
+    prompt.log_usage(submission, review_prompt, chunk)
 
     create_chat(db, "ai", chunk.text, submission, chat_id)
 
@@ -123,6 +93,11 @@ def create_chat(
     )
 
     db.add(db_chat)
+
+    if db_chat.is_ai and message:
+        db.flush()
+        submission.latest_review_id = db_chat.id
+
     db.commit()
     db.refresh(db_chat)
 
@@ -132,6 +107,15 @@ def create_chat(
 def get_ai_chat(
     db: Session, submission: submission_model.Submission
 ) -> chat_model.Chat:
+    if submission.latest_review_id:
+        db_chat = (
+            db.query(chat_model.Chat)
+            .filter(chat_model.Chat.id == submission.latest_review_id)
+            .first()
+        )
+        if db_chat:
+            return db_chat
+
     return (
         db.query(chat_model.Chat)
         .filter_by(submission_id=submission.id, is_ai=True)
@@ -140,9 +124,58 @@ def get_ai_chat(
     )
 
 
+def get_unreviewed_submission_list(
+    db: Session, limit: int
+) -> list[submission_model.Submission]:
+    """
+    ジャッジが完了しているのに、AIのレビューがまだ無い提出を新しい順に取得する。
+    """
+    testcase_count_subquery = (
+        db.query(func.count(problem_model.Testcase.id))
+        .filter(
+            problem_model.Testcase.problem_id == submission_model.Submission.problem_id
+        )
+        .correlate(submission_model.Submission)
+        .scalar_subquery()
+    )
+
+    detail_count_subquery = (
+        db.query(func.count(submission_model.SubmissionDetail.id))
+        .filter(
+            submission_model.SubmissionDetail.submission_id
+            == submission_model.Submission.id
+        )
+        .correlate(submission_model.Submission)
+        .scalar_subquery()
+    )
+
+    reviewed = exists().where(
+        and_(
+            chat_model.Chat.submission_id == submission_model.Submission.id,
+            chat_model.Chat.is_ai.is_(True),
+            chat_model.Chat.message != "",
+        )
+    )
+
+    return (
+        db.query(submission_model.Submission)
+        .filter(
+            testcase_count_subquery > 0,
+            detail_count_subquery >= testcase_count_subquery,
+            ~reviewed,
+        )
+        .order_by(submission_model.Submission.created_at.desc())
+        .limit(limit)
+        .all()
+    )
+
+
 # XXX: コードとして汚いので、リファクタリングが必要
 def chat_stream(
-    db: Session, problem: problem_model.Problem, submission: submission_model.Submission
+    db: Session,
+    problem: problem_model.Problem,
+    submission: submission_model.Submission,
+    status: dict[Status | Literal["WJ"], int],
 ) -> Generator[str, None, None]:
     if chat := get_ai_chat(db, submission):
         yield json.dumps(
@@ -155,35 +188,36 @@ def chat_stream(
         )
         return
 
-    chat = model.start_chat(
-        history=[
-            {"role": "user", "parts": first_statement(problem)},
-        ]
-    )
+    review_prompt = prompt.build_review_prompt(problem, submission, map_status(status))
+    chat = prompt.start_chat(model, review_prompt)
 
-    create_chat(db, "user", review_statement(submission), submission)
+    create_chat(db, "user", review_prompt.text, submission)
 
     yield json.dumps(
         {
             "order": 0,
             "author": "user",
-            "message": review_statement(submission),
+            "message": review_prompt.text,
         },
         ensure_ascii=False,
     )
 
     text = ""
 
-    for order, chunk in enumerate(
-        chat.send_message(review_statement(submission), stream=True), start=1
+    # クライアントへ送る時間も含めて、ストリームを読み終えるまでを記録する
+    with metrics.gemini_request_duration_seconds.time(mode="stream"), tracing.span(
+        "gemini.send_message", kind="client", model=GEMINI_MODEL, stream=True
     ):
-        text += chunk.text
-        yield json.dumps(
-            {
-                "order": order,
-                "author": "ai",
-                "message": chunk.text,
-            },
-            ensure_ascii=False,
-        )
+        response = chat.send_message(review_prompt.text, stream=True)
+        for order, chunk in enumerate(response, start=1):
+            text += chunk.text
+            yield json.dumps(
+                {
+                    "order": order,
+                    "author": "ai",
+                    "message": chunk.text,
+                },
+                ensure_ascii=False,
+            )
+    prompt.log_usage(submission, review_prompt, response)
     create_chat(db, "ai", text, submission)
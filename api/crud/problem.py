@@ -1,12 +1,17 @@
 import uuid
+from collections.abc import Iterable
+from contextlib import contextmanager
 
 from fastapi import HTTPException, status
-from sqlalchemy import and_, distinct, func
+from sqlalchemy import Select, and_, distinct, func, insert, select, update
 from sqlalchemy.orm import Session
 
+from api.core.config import TESTCASE_CACHE
+from api.database import generate_id
 from api.models import problem as problem_model
 from api.models import submission as submission_model
 from api.schemas import problem as problem_schema
+from api.utils import blob, testcase_cache
 
 
 # Category #########################################################################################
@@ -66,27 +71,21 @@ def get_problem_list(db: Session, category_path_id: str) -> list[problem_model.P
     )
 
 
-def get_problem_list_with_ac_submissions(
-    db: Session, category_path_id: str
-) -> list[tuple[problem_model.Problem, int]]:
-    category = get_category_by_path_id(db, category_path_id)
-
-    if not category:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Category not found",
-        )
-
+def ac_user_count_statement() -> Select:
+    """
+    問題ごとに、全てのテストケースで AC した提出をしたユーザーの数を数えるクエリ。
+    同期版・非同期版の crud の両方から使う。
+    """
     testcase_count_subquery = (
-        db.query(func.count(problem_model.Testcase.id))
-        .filter(problem_model.Testcase.problem_id == problem_model.Problem.id)
+        select(func.count(problem_model.Testcase.id))
+        .where(problem_model.Testcase.problem_id == problem_model.Problem.id)
         .correlate(problem_model.Problem)
         .scalar_subquery()
     )
 
     ac_submission_count_subquery = (
-        db.query(func.count(submission_model.SubmissionDetail.id))
-        .filter(
+        select(func.count(submission_model.SubmissionDetail.id))
+        .where(
             submission_model.SubmissionDetail.submission_id
             == submission_model.Submission.id,
             submission_model.SubmissionDetail.status == "AC",
@@ -95,10 +94,12 @@ def get_problem_list_with_ac_submissions(
         .scalar_subquery()
     )
 
-    result = (
-        db.query(
+    return (
+        select(
             problem_model.Problem,
-            func.count(distinct(submission_model.Submission.user_id)),
+            func.count(distinct(submission_model.Submission.user_id)).label(
+                "submission_count"
+            ),
         )
         .outerjoin(
             submission_model.Submission,
@@ -107,15 +108,26 @@ def get_problem_list_with_ac_submissions(
                 testcase_count_subquery == ac_submission_count_subquery,
             ),
         )
-        .filter(problem_model.Problem.category_id == category.id)
         .group_by(problem_model.Problem.id)
-        .order_by(problem_model.Problem.path_id)
-        .all()
     )
 
-    print(result)
 
-    return result
+def get_problem_list_with_ac_submissions(
+    db: Session, category_path_id: str
+) -> list[tuple[problem_model.Problem, int]]:
+    category = get_category_by_path_id(db, category_path_id)
+
+    if not category:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Category not found",
+        )
+
+    return db.execute(
+        ac_user_count_statement()
+        .where(problem_model.Problem.category_id == category.id)
+        .order_by(problem_model.Problem.path_id)
+    ).all()
 
 
 def get_problem_with_submission_count(
@@ -129,44 +141,9 @@ def get_problem_with_submission_count(
             detail="Problem not found",
         )
 
-    testcase_count_subquery = (
-        db.query(func.count(problem_model.Testcase.id))
-        .filter(problem_model.Testcase.problem_id == problem_model.Problem.id)
-        .correlate(problem_model.Problem)
-        .scalar_subquery()
-    )
-
-    ac_submission_count_subquery = (
-        db.query(func.count(submission_model.SubmissionDetail.id))
-        .filter(
-            submission_model.SubmissionDetail.submission_id
-            == submission_model.Submission.id,
-            submission_model.SubmissionDetail.status == "AC",
-        )
-        .correlate(submission_model.Submission)
-        .scalar_subquery()
-    )
-
-    result = (
-        db.query(
-            problem_model.Problem,
-            func.count(distinct(submission_model.Submission.user_id)).label(
-                "submission_count"
-            ),
-        )
-        .outerjoin(
-            submission_model.Submission,
-            and_(
-                problem_model.Problem.id == submission_model.Submission.problem_id,
-                testcase_count_subquery == ac_submission_count_subquery,
-            ),
-        )
-        .filter(problem_model.Problem.id == problem.id)
-        .group_by(problem_model.Problem.id)
-        .first()
-    )
-
-    return result
+    return db.execute(
+        ac_user_count_statement().where(problem_model.Problem.id == problem.id)
+    ).first()
 
 
 def get_problem(db: Session, problem_id: str) -> problem_model.Problem:
@@ -229,6 +206,15 @@ def create_problem(
 
 
 # Testcase #########################################################################################
+def get_testcase_id_list(db: Session, problem_id: uuid.UUID) -> list[uuid.UUID]:
+    return [
+        testcase_id
+        for (testcase_id,) in db.query(problem_model.Testcase.id)
+        .filter(problem_model.Testcase.problem_id == problem_id)
+        .all()
+    ]
+
+
 def get_testcase_list(
     db: Session, problem_id: uuid.UUID
 ) -> list[problem_model.Testcase]:
@@ -295,10 +281,142 @@ def create_testcase(
     if not db_testcase:
         db_testcase = problem_model.Testcase(problem_id=problem.id, name=testcase.name)
 
-    db_testcase.input = testcase.input
-    db_testcase.output = testcase.output
+    set_testcase_payload(
+        db, db_testcase, testcase.input.encode(), testcase.output.encode()
+    )
 
     db.add(db_testcase)
     db.commit()
     db.refresh(db_testcase)
+
+    invalidate_testcase_cache([db_testcase.id])
+
     return db_testcase
+
+
+def create_testcase_bulk(
+    db: Session,
+    problem: problem_model.Problem,
+    files: Iterable[tuple[str, str, bytes]],
+) -> tuple[list[dict], list[dict]]:
+    """
+    (テストケース名, "input" / "output", 内容) の列からテストケースをまとめて登録する。
+    同じ名前のテストケースがあれば上書きする。作成したものと更新したものをそれぞれ返す。
+    """
+    testcases: dict[tuple[uuid.UUID, str], dict] = {}
+    for name, kind, data in files:
+        add_testcase_file(db, testcases, problem.id, name, kind, data)
+
+    created, updated = upsert_testcases(db, testcases)
+    db.commit()
+    invalidate_testcase_cache(testcase["id"] for testcase in updated)
+
+    return created, updated
+
+
+def add_testcase_file(
+    db: Session,
+    testcases: dict[tuple[uuid.UUID, str], dict],
+    problem_id: uuid.UUID,
+    name: str,
+    kind: str,
+    data: bytes,
+):
+    """
+    テストケースの入力または出力をブロブとして保存し、ハッシュとサイズだけを testcases に記録する。
+    アーカイブを読みながら呼ぶことで、内容を手元に溜めずに済む。
+    """
+    entry = testcases.setdefault((problem_id, name), {})
+    entry[f"{kind}_hash"] = blob.get_store().put(db, data)
+    entry[f"{kind}_size"] = len(data)
+
+
+def upsert_testcases(
+    db: Session,
+    testcases: dict[tuple[uuid.UUID, str], dict],
+    batch_size: int = 500,
+) -> tuple[list[dict], list[dict]]:
+    """
+    add_testcase_file で集めたテストケースを、batch_size 件ずつまとめて INSERT / UPDATE する。
+    (問題, 名前) が同じテストケースがあれば上書きする。コミットは呼び出し側で行う。
+    """
+    incomplete = sorted(
+        name for (_, name), entry in testcases.items() if len(entry) != 4
+    )
+    if incomplete:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Missing input or output: {', '.join(incomplete)}",
+        )
+
+    problem_ids = {problem_id for problem_id, _ in testcases}
+    existing = {
+        (problem_id, name): testcase_id
+        for testcase_id, problem_id, name in db.query(
+            problem_model.Testcase.id,
+            problem_model.Testcase.problem_id,
+            problem_model.Testcase.name,
+        )
+        .filter(problem_model.Testcase.problem_id.in_(problem_ids))
+        .all()
+    }
+
+    created, updated = [], []
+    for key in sorted(testcases):
+        problem_id, name = key
+        row = {"problem_id": problem_id, "name": name, **testcases[key]}
+        if key in existing:
+            updated.append({"id": existing[key], **row})
+        else:
+            created.append({"id": generate_id(), **row})
+
+    for i in range(0, len(created), batch_size):
+        db.execute(insert(problem_model.Testcase), created[i : i + batch_size])
+    for i in range(0, len(updated), batch_size):
+        db.execute(update(problem_model.Testcase), updated[i : i + batch_size])
+
+    return created, updated
+
+
+def invalidate_testcase_cache(testcase_ids: Iterable[uuid.UUID]):
+    if TESTCASE_CACHE:
+        cache = testcase_cache.get_cache()
+        for testcase_id in testcase_ids:
+            cache.invalidate(testcase_id)
+
+
+def set_testcase_payload(
+    db: Session, testcase: problem_model.Testcase, input_data: bytes, output_data: bytes
+):
+    store = blob.get_store()
+
+    testcase.input_hash = store.put(db, input_data)
+    testcase.input_size = len(input_data)
+    testcase.output_hash = store.put(db, output_data)
+    testcase.output_size = len(output_data)
+
+
+def get_testcase_payload(
+    db: Session, testcase: problem_model.Testcase
+) -> tuple[bytes, bytes]:
+    """
+    テストケースの入出力の本体を取得する。
+    一覧などではメタデータだけを読み、本体はジャッジに送るときにだけ取得する。
+    """
+    store = blob.get_store()
+    return (store.get(db, testcase.input_hash), store.get(db, testcase.output_hash))
+
+
+@contextmanager
+def open_testcase_payload(db: Session, testcase: problem_model.Testcase):
+    """
+    ジャッジに渡すためにテストケースの入出力を開く。
+    TESTCASE_CACHE が有効なら、ローカルのキャッシュをメモリマップしたものを返す。
+    """
+    if not TESTCASE_CACHE:
+        yield get_testcase_payload(db, testcase)
+        return
+
+    with testcase_cache.get_cache().open(db, testcase) as payload:
+        yield payload
@@ -0,0 +1,260 @@
+import io
+import json
+import tarfile
+import uuid
+from collections.abc import Callable
+from pathlib import PurePosixPath
+from typing import BinaryIO, TypeVar
+
+from fastapi import HTTPException, status
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import insert, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from api.core.config import ARCHIVE_MEMBER_MAX_BYTES, CATEGORY_IMPORT_MAX_BYTES
+from api.crud import problem as problem_crud
+from api.database import generate_id
+from api.models import problem as problem_model
+from api.schemas import problem as problem_schema
+from api.utils import archive
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+# アーカイブの形式のバージョン（category.json の "format"）
+FORMAT_VERSION = 1
+
+PROBLEM_FIELDS = ("title", "statement", "level", "time_limit", "memory_limit")
+
+
+def _add_file(tar: tarfile.TarFile, name: str, data: bytes):
+    info = tarfile.TarInfo(name)
+    info.size = len(data)
+    tar.addfile(info, io.BytesIO(data))
+
+
+def _dump(data: dict) -> bytes:
+    return json.dumps(data, ensure_ascii=False, indent=2).encode()
+
+
+def export_category(
+    db: Session,
+    category_path_id: str,
+    fileobj: BinaryIO,
+    log: Callable[[str], None] = lambda _: None,
+):
+    """
+    カテゴリーとその問題・テストケースを tar.gz の形式で fileobj に書き出す。
+
+        category.json
+        problems/<問題の path_id>/problem.json
+        problems/<問題の path_id>/testcases/<テストケース名>.in / .out
+
+    先頭から順に書くだけなので、シークできない出力先にも書ける。
+    """
+    category = problem_crud.get_category_by_path_id(db, category_path_id)
+    if not category:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Category not found"
+        )
+
+    problems = (
+        db.query(problem_model.Problem)
+        .filter(problem_model.Problem.category_id == category.id)
+        .order_by(problem_model.Problem.path_id)
+        .all()
+    )
+
+    with tarfile.open(fileobj=fileobj, mode="w|gz") as tar:
+        _add_file(
+            tar,
+            "category.json",
+            _dump(
+                {
+                    "format": FORMAT_VERSION,
+                    "path_id": category.path_id,
+                    "title": category.title,
+                    "description": category.description,
+                }
+            ),
+        )
+
+        for i, problem in enumerate(problems, 1):
+            prefix = f"problems/{problem.path_id}"
+            _add_file(
+                tar,
+                f"{prefix}/problem.json",
+                _dump(
+                    {
+                        "path_id": problem.path_id,
+                        **{field: getattr(problem, field) for field in PROBLEM_FIELDS},
+                    }
+                ),
+            )
+
+            testcases = problem_crud.get_testcase_list(db, problem.id)
+            for testcase in testcases:
+                input_data, output_data = problem_crud.get_testcase_payload(
+                    db, testcase
+                )
+                _add_file(tar, f"{prefix}/testcases/{testcase.name}.in", input_data)
+                _add_file(tar, f"{prefix}/testcases/{testcase.name}.out", output_data)
+
+            log(f"[{i}/{len(problems)}] {problem.path_id}: {len(testcases)} testcases")
+
+
+def import_category(
+    db: Session,
+    fileobj: BinaryIO,
+    log: Callable[[str], None] = lambda _: None,
+    max_bytes: int = CATEGORY_IMPORT_MAX_BYTES,
+    max_member_bytes: int = ARCHIVE_MEMBER_MAX_BYTES,
+) -> dict:
+    """
+    export_category で書き出したアーカイブを読み込み、1つのトランザクションで登録する。
+    create_category / create_problem / create_testcase と同じく、
+    path_id や名前が同じものは上書きし、アーカイブに無いものは消さない。
+
+    アーカイブは先頭から順に読み、テストケースの内容は読んだそばからブロブとして保存する。
+    問題とテストケースの行は最後にまとめて INSERT / UPDATE する。
+    展開後の合計が max_bytes を、1ファイルが max_member_bytes を超えるアーカイブは受け付けない。
+    アーカイブが不正なら、ロールバックしてから ArchiveError を送出する。
+    """
+    try:
+        return _import_category(
+            db, fileobj, log, archive.SizeLimit(max_bytes, max_member_bytes)
+        )
+    except archive.ArchiveError:
+        db.rollback()
+        raise
+    except tarfile.TarError as e:
+        db.rollback()
+        raise archive.ArchiveError(f"Invalid archive: {e}") from e
+    except IntegrityError as e:
+        db.rollback()
+        raise archive.ArchiveError(f"Conflicting data: {e.orig}") from e
+    except Exception:
+        db.rollback()
+        raise
+
+
+def _parse(schema: type[ModelT], data: bytes, name: str) -> ModelT:
+    try:
+        return schema.model_validate_json(data)
+    except ValidationError as e:
+        raise archive.ArchiveError(f"Invalid {name}: {e}") from e
+
+
+def _import_category(
+    db: Session,
+    fileobj: BinaryIO,
+    log: Callable[[str], None],
+    limit: archive.SizeLimit,
+) -> dict:
+    category = None
+    existing_problems: dict[str, uuid.UUID] = {}
+    problems: dict[str, dict] = {}
+    testcases: dict[tuple[uuid.UUID, str], dict] = {}
+
+    with tarfile.open(fileobj=fileobj, mode="r|*") as tar:
+        for member in tar:
+            if not member.isfile():
+                continue
+            path = PurePosixPath(member.name)
+            # 大きすぎるファイルは読む前に断る
+            limit.check(member.name, member.size)
+            data = tar.extractfile(member).read()
+
+            if path.name == "category.json" and len(path.parts) == 1:
+                category = _upsert_category(
+                    db, _parse(problem_schema.CategoryArchive, data, member.name)
+                )
+                existing_problems = dict(
+                    db.query(problem_model.Problem.path_id, problem_model.Problem.id)
+                    .filter(problem_model.Problem.category_id == category.id)
+                    .all()
+                )
+                continue
+
+            if category is None:
+                raise archive.ArchiveError("category.json must come first")
+
+            if len(path.parts) == 3 and path.parts[0] == "problems":
+                if path.name == "problem.json":
+                    problem = _parse(problem_schema.ProblemArchive, data, member.name)
+                    if problem.path_id != path.parts[1]:
+                        raise archive.ArchiveError(
+                            f"path_id does not match the directory: {member.name}"
+                        )
+                    problems[problem.path_id] = {
+                        "id": existing_problems.get(problem.path_id) or generate_id(),
+                        "category_id": category.id,
+                        "path_id": problem.path_id,
+                        **problem.model_dump(include=set(PROBLEM_FIELDS)),
+                    }
+                    log(f"{problem.path_id}: problem")
+                continue
+
+            if len(path.parts) == 4 and path.parts[2] == "testcases":
+                problem = problems.get(path.parts[1])
+                found = archive.classify(path.name)
+                if problem is None or found is None:
+                    raise archive.ArchiveError(f"Unexpected file: {member.name}")
+
+                name, kind = found
+                problem_crud.add_testcase_file(
+                    db, testcases, problem["id"], name, kind, data
+                )
+
+    if category is None:
+        raise archive.ArchiveError("category.json not found")
+
+    created_problems = [
+        row for row in problems.values() if row["path_id"] not in existing_problems
+    ]
+    updated_problems = [
+        row for row in problems.values() if row["path_id"] in existing_problems
+    ]
+    if created_problems:
+        db.execute(insert(problem_model.Problem), created_problems)
+    if updated_problems:
+        db.execute(update(problem_model.Problem), updated_problems)
+
+    created_testcases, updated_testcases = problem_crud.upsert_testcases(db, testcases)
+    db.commit()
+    problem_crud.invalidate_testcase_cache(t["id"] for t in updated_testcases)
+
+    log(
+        f"Imported {category.path_id}: "
+        f"{len(created_problems)} problems created, "
+        f"{len(updated_problems)} updated, "
+        f"{len(created_testcases)} testcases created, "
+        f"{len(updated_testcases)} updated"
+    )
+
+    db.refresh(category)
+    return {
+        "category": category,
+        "problems_created": len(created_problems),
+        "problems_updated": len(updated_problems),
+        "testcases_created": len(created_testcases),
+        "testcases_updated": len(updated_testcases),
+    }
+
+
+def _upsert_category(
+    db: Session, data: problem_schema.CategoryArchive
+) -> problem_model.Category:
+    if data.format != FORMAT_VERSION:
+        raise archive.ArchiveError(f"Unsupported format: {data.format}")
+
+    db_category = problem_crud.get_category_by_path_id(db, data.path_id)
+    if not db_category:
+        db_category = problem_model.Category(path_id=data.path_id)
+
+    db_category.title = data.title
+    db_category.description = data.description
+
+    db.add(db_category)
+    db.flush()
+    return db_category
@@ -1,16 +1,45 @@
+import dataclasses
+import hashlib
+import hmac
+import logging
+import threading
+import uuid
 from collections import defaultdict
-from typing import Literal
+from datetime import datetime, timedelta, timezone
+from time import monotonic
+from typing import Callable, Literal
 
 import judge0api as judge
 from fastapi import HTTPException, status
-from sqlalchemy.orm import Session
-
-from api.core.config import JUDGE_API_URL
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, sessionmaker
+
+from api.core import metrics, tracing
+from api.core.config import (
+    JUDGE_API_URLS,
+    JUDGE_CALLBACK_REAP_INTERVAL,
+    JUDGE_CALLBACK_URL,
+    JUDGE_DEADLINE_MARGIN,
+    JUDGE_RUN_API_URLS,
+    JUDGE_RUN_TIME_LIMIT,
+    RUN_OUTPUT_LIMIT_BYTES,
+    RUN_OUTPUT_MAX_BYTES,
+    RUN_OUTPUT_STORE,
+    SECRET_KEY,
+    SUBMISSION_DETAIL_FLUSH_COUNT,
+    SUBMISSION_DETAIL_FLUSH_INTERVAL,
+)
 from api.crud import problem as problem_crud
+from api.database import generate_id
 from api.models import problem as problem_model
 from api.models import submission as submission_model
 from api.models import user as user_model
 from api.schemas import submission as submission_schema
+from api.utils import judge0, run_output
+from api.utils.judge_dispatcher import JudgeDispatcher, NoJudgeBackend, get_dispatcher
+
+logger = logging.getLogger(__name__)
 
 language_dict = {
     "Python": 71,
@@ -18,6 +47,9 @@ language_dict = {
     "C++": 105,
 }
 
+# 出力が大きすぎて止められた（Runtime Error (SIGXFSZ)）
+SIGXFSZ_STATUS = 8
+
 Status = Literal["AC", "WA", "TLE", "MLE", "RE", "CE", "IE"]
 
 
@@ -55,7 +87,7 @@ def create_submission(
     problem = problem_crud.get_problem_by_path_id(db, category_path_id, problem_path_id)
 
     if not problem:
-        return HTTPException(
+        raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Problem not found",
         )
@@ -94,17 +126,25 @@ def summarize_status(
     db: Session, submission: submission_model.Submission
 ) -> dict[Status | Literal["WJ"], int]:
     details = get_submission_detail_list(db, submission)
-    results = {detail.testcase_id: detail.status for detail in details}
+    testcase_ids = problem_crud.get_testcase_id_list(db, submission.problem_id)
+
+    return tally_status(testcase_ids, details)
 
-    testcases = problem_crud.get_testcase_list(db, submission.problem_id)
+
+def tally_status(
+    testcase_ids: list[uuid.UUID],
+    details: list[submission_model.SubmissionDetail],
+) -> dict[Status | Literal["WJ"], int]:
+    """テストケースごとの結果を数える。結果の無いテストケースは WJ とする。"""
+    results = {detail.testcase_id: detail.status for detail in details}
 
     summary = defaultdict(int)
 
-    for testcase in testcases:
-        if testcase.id not in results:
+    for testcase_id in testcase_ids:
+        if testcase_id not in results:
             summary["WJ"] += 1
         else:
-            summary[results[testcase.id]] += 1
+            summary[results[testcase_id]] += 1
 
     return summary
 
@@ -146,63 +186,349 @@ def get_submission_detail_list(
 
 
 def submit(
-    client: judge.Client,
+    dispatcher: JudgeDispatcher,
     language: str,
     source_code: str,
     input_data: str,
     expected_output: str = "",
     time_limit: float = 2.0,
     memory_limit: int = 256,
+    max_file_size: int | None = None,
 ) -> judge.submission.Submission:
-    submission = judge.submission.Submission()
-    submission.language_id = language_dict[language]
-    submission.source_code = source_code.encode()
-    submission.stdin = input_data.encode()
-    submission.expected_output = expected_output.encode()
-    submission.cpu_time_limit = time_limit
-    submission.memory_limit = memory_limit * 1024
+    request = judge0.build_request(
+        language_dict[language],
+        source_code.encode(),
+        input_data.encode(),
+        expected_output.encode(),
+        cpu_time_limit=time_limit,
+        memory_limit=memory_limit * 1024,
+        max_file_size=max_file_size,
+    )
 
-    submission.submit(client)
-    submission.load(client)
+    with metrics.judge0_request_duration_seconds.time(language=language):
+        with tracing.span("judge0.run", kind="client", language=language) as span:
+            result = dispatcher.run(request, judge0.deadline_for(time_limit))
+            span.set_attribute("status", result["status"]["description"])
 
+    submission = judge.submission.Submission()
+    submission.set_properties(result)
     if map_result_status(submission.status["description"]) == "CE":
         submission.stderr = submission.compile_output
 
     return submission
 
 
+def _testcase_requests(
+    db: Session,
+    testcases: list[problem_model.Testcase],
+    language: str,
+    source_code: bytes,
+    time_limit: float,
+    memory_limit: int,
+    callback: Callable[[problem_model.Testcase], str] | None = None,
+) -> list[dict]:
+    requests = []
+    for testcase in testcases:
+        with problem_crud.open_testcase_payload(db, testcase) as payload:
+            stdin, expected_output = payload
+            requests.append(
+                judge0.build_request(
+                    language_dict[language],
+                    source_code,
+                    stdin,
+                    expected_output,
+                    cpu_time_limit=time_limit,
+                    memory_limit=memory_limit * 1000,
+                    max_file_size=65536,
+                    callback_url=callback(testcase) if callback else None,
+                )
+            )
+    return requests
+
+
 def multiple_submit(
     db: Session,
-    id: int,
-    client: judge.Client,
+    writer: "SubmissionDetailWriter",
+    dispatcher: JudgeDispatcher,
     language: str,
     source_code: str,
     testcases: list[problem_model.Testcase],
     time_limit: float = 2.0,
     memory_limit: int = 256,
 ):
-    submission = judge.submission.Submission()
-    submission.language_id = language_dict[language]
-    submission.source_code = source_code.encode()
-    submission.cpu_time_limit = time_limit
-    submission.memory_limit = memory_limit * 1000
-    submission.max_file_size = 65536
+    """
+    テストケースをまとめて Judge0 に提出し、結果をまとめてポーリングする。
+    提出できなかったテストケースや、期限までに結果が出なかったテストケースは
+    記録せずに残し、SubmissionDetailWriter が抜けるときに IE にする。
+    JUDGE_CALLBACK_URL が設定されていれば、ポーリングせずにコールバックで結果を受け取る。
+    """
+    if JUDGE_CALLBACK_URL:
+        return submit_with_callback(
+            db,
+            writer,
+            dispatcher,
+            language,
+            source_code,
+            testcases,
+            time_limit,
+            memory_limit,
+        )
 
-    for testcase in testcases:
+    source = source_code.encode()
+    testcase_by_token: dict[str, problem_model.Testcase] = {}
+    submitted_at: dict[str, float] = {}
+    # 提出先の Judge0 ごとのトークン
+    tokens_by_backend = defaultdict(list)
+
+    for chunk in judge0.chunks(testcases, dispatcher.batch_size):
+        requests = _testcase_requests(
+            db, chunk, language, source, time_limit, memory_limit
+        )
         try:
-            submission.stdin = testcase.input.encode()
-            submission.expected_output = testcase.output.encode()
-            submission.submit(client)
-            submission.load(client)
+            with tracing.span(
+                "judge0.submit_batch",
+                kind="client",
+                language=language,
+                testcases=len(chunk),
+            ):
+                backend, tokens = dispatcher.submit_batch(requests)
+        except Exception:
+            # このチャンクのテストケースは、結果が無いまま IE になる
+            logger.exception("Failed to submit testcases for %s", writer.submission_id)
+            continue
+
+        now = monotonic()
+        for testcase, token in zip(chunk, tokens):
+            if token:
+                testcase_by_token[token] = testcase
+                submitted_at[token] = now
+                tokens_by_backend[backend].append(token)
+
+    def on_result(token: str, result: dict):
+        metrics.judge0_request_duration_seconds.observe(
+            monotonic() - submitted_at[token], language=language
+        )
+        writer.add(
+            testcase_by_token[token].id,
+            map_result_status(result["status"]["description"]),
+            float(result.get("time") or 0),
+            result.get("memory") or 0,
+        )
 
-            status = map_result_status(submission.status["description"])
+    deadline = judge0.deadline_for(time_limit, len(testcases))
+    for backend, tokens in tokens_by_backend.items():
+        # 次の結果が出るのを待つ間も、溜めた結果を flush_interval ごとに書き込む
+        dispatcher.poll(backend, tokens, deadline, on_result, writer.flush_if_due)
 
-            save_submission_detail(
-                db, id, testcase.id, status, submission.time, submission.memory
-            )
-        except Exception as e:
-            save_submission_detail(db, id, testcase.id, "IE", 0, 0)
-            print(e)
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def callback_signature(submission_id: uuid.UUID, testcase_id: uuid.UUID) -> str:
+    return hmac.new(
+        SECRET_KEY.encode(),
+        f"{submission_id.hex}:{testcase_id.hex}".encode(),
+        hashlib.sha256,
+    ).hexdigest()
+
+
+def callback_url(submission_id: uuid.UUID, testcase_id: uuid.UUID) -> str:
+    """Judge0 が結果を送る URL。偽の結果を送られないよう、署名を付ける。"""
+    return (
+        f"{JUDGE_CALLBACK_URL}/judge0/callback/{submission_id.hex}/{testcase_id.hex}"
+        f"?signature={callback_signature(submission_id, testcase_id)}"
+    )
+
+
+def submit_with_callback(
+    db: Session,
+    writer: "SubmissionDetailWriter",
+    dispatcher: JudgeDispatcher,
+    language: str,
+    source_code: str,
+    testcases: list[problem_model.Testcase],
+    time_limit: float = 2.0,
+    memory_limit: int = 256,
+):
+    """
+    テストケースをコールバック付きで提出し、結果を待たずに戻る。
+    結果は receive_judgement で記録し、期限までに届かなければ reap_expired_judgements が IE にする。
+    """
+    submission_id = writer.submission_id
+    now = _utcnow()
+    deadline = now + timedelta(
+        seconds=time_limit * len(testcases) + JUDGE_DEADLINE_MARGIN
+    )
+    # コールバックが提出の直後に届いてもよいように、先に記録しておく
+    db.execute(
+        insert(submission_model.PendingJudgement),
+        [
+            {
+                "id": generate_id(),
+                "submission_id": submission_id,
+                "testcase_id": testcase.id,
+                "language": language,
+                "submitted_at": now,
+                "deadline": deadline,
+            }
+            for testcase in testcases
+        ],
+    )
+    db.commit()
+
+    source = source_code.encode()
+    failed = []
+    for chunk in judge0.chunks(testcases, dispatcher.batch_size):
+        requests = _testcase_requests(
+            db,
+            chunk,
+            language,
+            source,
+            time_limit,
+            memory_limit,
+            lambda testcase: callback_url(submission_id, testcase.id),
+        )
+        try:
+            with tracing.span(
+                "judge0.submit_batch",
+                kind="client",
+                language=language,
+                testcases=len(chunk),
+            ):
+                backend, tokens = dispatcher.submit_batch(requests)
+            # 結果はコールバックで届くので、実行中の数にはすぐに戻す
+            dispatcher.release(backend, sum(1 for token in tokens if token))
+        except Exception:
+            logger.exception("Failed to submit testcases for %s", submission_id)
+            tokens = [None] * len(chunk)
+
+        for testcase, token in zip(chunk, tokens):
+            if token:
+                writer.defer(testcase.id)
+            else:
+                failed.append(testcase.id)
+
+    # 提出できなかったテストケースは待たない（writer が抜けるときに IE にする）
+    if failed:
+        _delete_pending(db, submission_id, failed)
+        db.commit()
+
+
+def _delete_pending(
+    db: Session, submission_id: uuid.UUID, testcase_ids: list[uuid.UUID]
+) -> int:
+    return (
+        db.query(submission_model.PendingJudgement)
+        .filter(
+            submission_model.PendingJudgement.submission_id == submission_id,
+            submission_model.PendingJudgement.testcase_id.in_(testcase_ids),
+        )
+        .delete(synchronize_session=False)
+    )
+
+
+def receive_judgement(
+    db: Session, submission_id: uuid.UUID, testcase_id: uuid.UUID, result: dict
+) -> bool:
+    """
+    Judge0 のコールバックで届いた結果を記録する。
+    待っていないテストケース（期限切れで IE にしたものなど）の結果なら False を返す。
+    """
+    pending = (
+        db.query(submission_model.PendingJudgement)
+        .filter(
+            submission_model.PendingJudgement.submission_id == submission_id,
+            submission_model.PendingJudgement.testcase_id == testcase_id,
+        )
+        .one_or_none()
+    )
+    if pending is None:
+        return False
+    if not judge0.is_finished(result):
+        return True
+
+    metrics.judge0_request_duration_seconds.observe(
+        (_utcnow() - pending.submitted_at).total_seconds(), language=pending.language
+    )
+    # 期限切れの処理と競合しても、結果は一意制約で1行だけになる
+    _delete_pending(db, submission_id, [testcase_id])
+    with SubmissionDetailWriter(db, submission_id, []) as writer:
+        writer.add(
+            testcase_id,
+            map_result_status(result["status"]["description"]),
+            float(result.get("time") or 0),
+            result.get("memory") or 0,
+        )
+    return True
+
+
+def reap_expired_judgements(db: Session, limit: int = 1000) -> int:
+    """期限までに結果が届かなかったテストケースを IE にする。IE にした件数を返す。"""
+    expired = (
+        db.query(submission_model.PendingJudgement)
+        .filter(submission_model.PendingJudgement.deadline < _utcnow())
+        .limit(limit)
+        .all()
+    )
+    if not expired:
+        return 0
+
+    testcase_ids = defaultdict(list)
+    for pending in expired:
+        testcase_ids[pending.submission_id].append(pending.testcase_id)
+    db.query(submission_model.PendingJudgement).filter(
+        submission_model.PendingJudgement.id.in_([pending.id for pending in expired])
+    ).delete(synchronize_session=False)
+
+    for submission_id, ids in testcase_ids.items():
+        SubmissionDetailWriter(db, submission_id, ids).close()
+    db.commit()
+
+    logger.warning("Judge0 callbacks timed out for %d testcases", len(expired))
+    return len(expired)
+
+
+_reaper: tuple[threading.Thread, threading.Event] | None = None
+_reaper_lock = threading.Lock()
+
+
+def start_reaper(session_factory: sessionmaker):
+    """
+    reap_expired_judgements を定期的に実行するスレッドを（まだ無ければ）始める。
+    再起動の前に提出したテストケースも期限切れにできるよう、アプリの起動時に呼ぶ。
+    """
+    global _reaper
+    with _reaper_lock:
+        if _reaper is not None:
+            return
+        stop = threading.Event()
+        thread = threading.Thread(
+            target=_reap_forever, args=(session_factory, stop), daemon=True
+        )
+        thread.start()
+        _reaper = (thread, stop)
+
+
+def stop_reaper():
+    """start_reaper で始めたスレッドを止める（アプリの終了時）。"""
+    global _reaper
+    with _reaper_lock:
+        reaper, _reaper = _reaper, None
+    if reaper is not None:
+        thread, stop = reaper
+        stop.set()
+        thread.join()
+
+
+def _reap_forever(session_factory: sessionmaker, stop: threading.Event):
+    while not stop.wait(JUDGE_CALLBACK_REAP_INTERVAL):
+        try:
+            with session_factory() as db:
+                while reap_expired_judgements(db):
+                    pass
+        except Exception:
+            logger.exception("Failed to reap expired judgements")
 
 
 def judge_submission(db: Session, submission: submission_model.Submission):
@@ -215,22 +541,50 @@ def judge_submission(db: Session, submission: submission_model.Submission):
     if not testcases:
         raise ValueError(f"No test cases found for problem_id: {submission.problem_id}")
 
-    client = judge.Client(JUDGE_API_URL)
+    # 途中で失敗しても、抜けるときに結果の無いテストケースを IE として記録する
+    with SubmissionDetailWriter(
+        db, submission.id, [testcase.id for testcase in testcases]
+    ) as writer:
+        if submission.code:
+            multiple_submit(
+                db,
+                writer,
+                get_dispatcher(JUDGE_API_URLS),
+                submission.language,
+                submission.code,
+                testcases,
+                problem.time_limit,
+                problem.memory_limit,
+            )
+        else:
+            for testcase in testcases:
+                writer.add(testcase.id, "WA", 0, 0)
 
-    if submission.code:
-        multiple_submit(
-            db,
-            submission.id,
-            client,
-            submission.language,
-            submission.code,
-            testcases,
-            problem.time_limit,
-            problem.memory_limit,
-        )
-    else:
-        for testcase in testcases:
-            save_submission_detail(db, submission.id, testcase.id, "WA", 0, 0)
+
+def judge_submission_by_id(
+    session_factory: sessionmaker,
+    submission_id: uuid.UUID,
+    parent_span: "tracing.Span | None" = None,
+):
+    """
+    バックグラウンドで提出をジャッジする。リクエストのセッションとは別のセッションを使う。
+    parent_span には提出を受け付けたリクエストのスパンを渡す。
+    """
+    metrics.judge_queue_depth.dec()
+    metrics.judge_in_progress.inc()
+    if JUDGE_CALLBACK_URL:
+        start_reaper(session_factory)
+    try:
+        with tracing.span(
+            "judge.submission", parent_span, submission_id=str(submission_id)
+        ), session_factory() as db:
+            submission = get_submission(db, submission_id)
+            if submission:
+                judge_submission(db, submission)
+    except Exception:
+        logger.exception("Failed to judge submission %s", submission_id)
+    finally:
+        metrics.judge_in_progress.dec()
 
 
 def map_result_status(result_status: str) -> str:
@@ -250,60 +604,201 @@ def map_result_status(result_status: str) -> str:
         return "IE"
 
 
-def save_submission_detail(
-    db: Session,
-    submission_id: int,
-    testcase_id: int,
-    status: str,
-    time: float,
-    memory: int,
-):
-    db_submission_detail = submission_model.SubmissionDetail(
-        submission_id=submission_id,
-        testcase_id=testcase_id,
-        status=status,
-        time=time,
-        memory=memory,
-    )
+class SubmissionDetailWriter:
+    """
+    ジャッジ結果（SubmissionDetail）を溜めておき、まとめて INSERT する。
+
+    flush_count 件溜まったとき、または最初に溜めてから flush_interval 秒経ったときに書き込むので、
+    提出の進み具合は少し遅れて読み手に見える。時間で書き込むのは add か flush_if_due を
+    呼んだときなので、結果を待つ間は flush_if_due を定期的に呼ぶ（ポーリングの合間など）。
+    close（with を抜けたとき）では、結果が記録されていないテストケースを全て IE として書き込む。
+    """
+
+    def __init__(
+        self,
+        db: Session,
+        submission_id: uuid.UUID,
+        testcase_ids: list[uuid.UUID],
+        flush_count: int = SUBMISSION_DETAIL_FLUSH_COUNT,
+        flush_interval: float = SUBMISSION_DETAIL_FLUSH_INTERVAL,
+    ):
+        self.db = db
+        self.submission_id = submission_id
+        self.testcase_ids = testcase_ids
+        self.flush_count = flush_count
+        self.flush_interval = flush_interval
+
+        self._rows: list[dict] = []
+        self._recorded: set[uuid.UUID] = set()
+        self._buffered_at = None
+
+    def __enter__(self) -> "SubmissionDetailWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def add(self, testcase_id: uuid.UUID, status: str, time: float, memory: int):
+        if testcase_id in self._recorded:
+            return
+
+        self._recorded.add(testcase_id)
+        metrics.judge_verdicts_total.inc(status=status)
+        self._rows.append(
+            {
+                "submission_id": self.submission_id,
+                "testcase_id": testcase_id,
+                "status": status,
+                "time": time,
+                "memory": memory,
+            }
+        )
 
-    db.add(db_submission_detail)
-    db.commit()
-    db.refresh(db_submission_detail)
+        if self._buffered_at is None:
+            self._buffered_at = monotonic()
 
+        if len(self._rows) >= self.flush_count:
+            self.flush()
+        else:
+            self.flush_if_due()
+
+    def flush_if_due(self):
+        """最初に溜めてから flush_interval 秒経っていれば書き込む。"""
+        if (
+            self._buffered_at is not None
+            and monotonic() - self._buffered_at >= self.flush_interval
+        ):
+            self.flush()
+
+    def defer(self, testcase_id: uuid.UUID):
+        """結果を別の経路（Judge0 のコールバック）で記録するテストケース。close で IE にしない。"""
+        self._recorded.add(testcase_id)
+
+    def flush(self):
+        if not self._rows:
+            return
+
+        rows, self._rows, self._buffered_at = self._rows, [], None
+
+        with tracing.span("submission_detail.flush", rows=len(rows)):
+            # 同じセッションで済ませた変更（PendingJudgement の削除など）を巻き戻さないよう、
+            # INSERT はセーブポイントの中で行う
+            try:
+                with self.db.begin_nested():
+                    self.db.execute(insert(submission_model.SubmissionDetail), rows)
+            except IntegrityError:
+                # 同じテストケースの結果が既に記録されている。記録されていないものだけ入れ直す
+                recorded = {
+                    testcase_id
+                    for (testcase_id,) in self.db.query(
+                        submission_model.SubmissionDetail.testcase_id
+                    )
+                    .filter(
+                        submission_model.SubmissionDetail.submission_id
+                        == self.submission_id
+                    )
+                    .all()
+                }
+                rows = [row for row in rows if row["testcase_id"] not in recorded]
+                if rows:
+                    self.db.execute(insert(submission_model.SubmissionDetail), rows)
+            self.db.commit()
+
+    def close(self):
+        for testcase_id in self.testcase_ids:
+            if testcase_id not in self._recorded:
+                self._recorded.add(testcase_id)
+                metrics.judge_verdicts_total.inc(status="IE")
+                self._rows.append(
+                    {
+                        "submission_id": self.submission_id,
+                        "testcase_id": testcase_id,
+                        "status": "IE",
+                        "time": 0,
+                        "memory": 0,
+                    }
+                )
+
+        self.flush()
+
+
+def _run_output(
+    run_id: uuid.UUID | None, stream: run_output.Stream, data: bytes | None
+) -> run_output.Output:
+    """応答に入れる分だけ切り詰める。切り詰めたときは、全体をダウンロード用に保存する。"""
+    output = run_output.truncate(data, RUN_OUTPUT_MAX_BYTES)
+    if output.truncated and RUN_OUTPUT_STORE and run_id is not None:
+        try:
+            run_output.get_store().save(run_id, stream, data)
+        except OSError:
+            # ダウンロードはおまけなので、保存できなくても切り詰めた出力は返す
+            logger.exception("Failed to store the %s of run %s", stream, run_id)
+    return output
+
+
+def _with_message(message: str, output: run_output.Output) -> run_output.Output:
+    return dataclasses.replace(output, text=message + output.text)
 
-def run_submission(runcode: submission_schema.RunCode) -> tuple[str, str]:
+
+def run_submission(
+    runcode: submission_schema.RunCode, run_id: uuid.UUID | None = None
+) -> tuple[run_output.Output, run_output.Output]:
+    """
+    コードを実行し、stdout と stderr を返す。
+    応答が大きくならないよう、それぞれ RUN_OUTPUT_MAX_BYTES バイトまでに切り詰める。
+    """
     if runcode.language not in language_dict:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Invalid language",
         )
 
+    empty = run_output.truncate(b"", RUN_OUTPUT_MAX_BYTES)
     if runcode.code == "":
-        return ("", "")
-
-    client = judge.Client(JUDGE_API_URL)
-    result = submit(
-        client,
-        runcode.language,
-        runcode.code,
-        runcode.input,
-        time_limit=5.0,
-        memory_limit=256,
-    )
+        return (empty, empty)
+
+    try:
+        result = submit(
+            get_dispatcher(JUDGE_RUN_API_URLS),
+            runcode.language,
+            runcode.code,
+            runcode.input,
+            time_limit=JUDGE_RUN_TIME_LIMIT,
+            memory_limit=256,
+            # プログラムがどれだけ出力しても、Judge0 から受け取る量はこれで抑えられる
+            max_file_size=-(-RUN_OUTPUT_LIMIT_BYTES // 1024),
+        )
+    except (judge0.Judge0Timeout, NoJudgeBackend):
+        return (empty, _with_message("[Error] Internal Error", empty))
 
     status_val = map_result_status(result.status["description"])
 
-    stdout = result.stdout.decode() if result.stdout else ""
-    stderr = result.stderr.decode() if result.stderr else ""
+    stdout = _run_output(run_id, "stdout", result.stdout)
+    stderr = _run_output(run_id, "stderr", result.stderr)
 
     if status_val == "IE":
-        return (stdout, "[Error] Internal Error")
+        return (stdout, _with_message("[Error] Internal Error", empty))
     elif status_val == "TLE":
-        return (stdout, "[Error] Time Limit Exceeded (over 5 sec)\n" + stderr)
+        return (
+            stdout,
+            _with_message(
+                f"[Error] Time Limit Exceeded (over {JUDGE_RUN_TIME_LIMIT:g} sec)\n",
+                stderr,
+            ),
+        )
     elif status_val == "MLE":
         return (
             stdout,
-            "[Error] Memory Limit Exceeded (over 256 MB)\n" + stderr,
+            _with_message("[Error] Memory Limit Exceeded (over 256 MB)\n", stderr),
+        )
+    elif result.status["id"] == SIGXFSZ_STATUS:
+        return (
+            stdout,
+            _with_message(
+                "[Error] Output Limit Exceeded "
+                f"(over {RUN_OUTPUT_LIMIT_BYTES / 1024 / 1024:g} MB)\n",
+                stderr,
+            ),
         )
     else:
         return (stdout, stderr)
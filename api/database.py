@@ -1,18 +1,186 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import declarative_base, sessionmaker
+import time
+import uuid
 
-from api.core.config import DATABASE_URL
+from fastapi import Request, Response
+from sqlalchemy import create_engine, make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy_utils import UUIDType
 
-engine = create_engine(
+from api.core import pool
+from api.core.config import (
+    DATABASE_READ_URL,
     DATABASE_URL,
-    pool_size=20,  # プールの最大接続数
-    max_overflow=10,  # プールを超えた場合の追加接続数
-    pool_timeout=30,  # 接続待機時間
+    DB_MAX_OVERFLOW,
+    DB_POOL_PRE_PING,
+    DB_POOL_RECYCLE,
+    DB_POOL_SIZE,
+    DB_POOL_TIMEOUT,
+    READ_YOUR_WRITES_SECONDS,
+    UUID_STORAGE,
+    UUID_VERSION,
 )
+from api.utils.uuid7 import uuid7
+
+# 非同期版のドライバ（同期版のドライバ名 → 非同期版のドライバ名）
+ASYNC_DRIVERS = {
+    "mysql": "mysql+aiomysql",
+    "mysql+pymysql": "mysql+aiomysql",
+    "mysql+mysqldb": "mysql+aiomysql",
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+}
+
+
+def to_async_url(url: str) -> str:
+    """同期版の接続 URL を、非同期版のドライバを使う URL に書き換える。"""
+    parsed = make_url(url)
+    driver = ASYNC_DRIVERS.get(parsed.drivername, parsed.drivername)
+    return parsed.set(drivername=driver).render_as_string(hide_password=False)
+
+
+def pool_options(is_async: bool = False) -> dict:
+    """core/config.py の設定からコネクションプールの引数を作る。"""
+    return {
+        "poolclass": (
+            pool.InstrumentedAsyncQueuePool if is_async else pool.InstrumentedQueuePool
+        ),
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
+
+def create_db_engine(name: str, url: str):
+    engine = create_engine(url, **pool_options())
+    pool.register(name, engine)
+    return engine
+
+
+def create_async_db_engine(name: str, url: str):
+    url = to_async_url(url)
+    if url.startswith("sqlite"):
+        # aiosqlite はコネクションプールを使わない
+        return create_async_engine(url)
+
+    engine = create_async_engine(url, **pool_options(is_async=True))
+    pool.register(name, engine.sync_engine)
+    return engine
+
+
+engine = create_db_engine("primary", DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# 読み取り用。レプリカが無ければプライマリと同じエンジンを使う
+read_engine = (
+    create_db_engine("replica", DATABASE_READ_URL) if DATABASE_READ_URL else engine
+)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+
+# ルーター用の非同期エンジン。同期版（engine / SessionLocal）はスクリプトやバックグラウンド処理で使う
+async_engine = create_async_db_engine("async_primary", DATABASE_URL)
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine, autoflush=False, expire_on_commit=False
+)
+
+async_read_engine = (
+    create_async_db_engine("async_replica", DATABASE_READ_URL)
+    if DATABASE_READ_URL
+    else async_engine
+)
+AsyncReadSessionLocal = async_sessionmaker(
+    bind=async_read_engine, autoflush=False, expire_on_commit=False
+)
+
 Base = declarative_base()
 
+# 書き込んだクライアントに付ける Cookie（値はプライマリを使う期限の UNIX 時刻）
+PRIMARY_COOKIE = "db_primary_until"
+
+
+def KeyType() -> UUIDType:
+    """
+    主キー・外部キーに使う UUID 型。
+    UUID_STORAGE=binary なら BINARY(16)、それ以外は CHAR(32) で保存する。
+    """
+    return UUIDType(binary=UUID_STORAGE == "binary")
+
+
+def generate_id() -> uuid.UUID:
+    return uuid7() if UUID_VERSION == "7" else uuid.uuid4()
+
 
 def get_db():
     with SessionLocal() as session:
         yield session
+
+
+def get_sessionmaker() -> sessionmaker:
+    """バックグラウンド処理用に、同期版のセッションを作るファクトリを返す。"""
+    return SessionLocal
+
+
+def has_replica() -> bool:
+    return read_engine is not engine
+
+
+def pin_to_primary(response: Response):
+    """
+    書き込み直後のクライアントの読み取りを、しばらくプライマリに向ける。
+    レプリカの遅延で、自分の提出などが見えなくなるのを防ぐ。
+    """
+    response.set_cookie(
+        key=PRIMARY_COOKIE,
+        value=str(int(time.time()) + READ_YOUR_WRITES_SECONDS),
+        max_age=READ_YOUR_WRITES_SECONDS,
+        httponly=True,
+        secure=True,
+        samesite="none",
+    )
+
+
+def is_pinned_to_primary(request: Request) -> bool:
+    try:
+        until = int(request.cookies.get(PRIMARY_COOKIE, "0"))
+    except ValueError:
+        return False
+
+    now = time.time()
+    # 期限を先の時刻に書き換えられても、READ_YOUR_WRITES_SECONDS より長くは効かせない
+    return now < until <= now + READ_YOUR_WRITES_SECONDS
+
+
+def get_read_db(request: Request):
+    """
+    GET のエンドポイント用のセッション。
+    レプリカ（DATABASE_READ_URL）に繋ぐが、直近に書き込んだクライアントはプライマリを使う。
+    """
+    if has_replica() and is_pinned_to_primary(request):
+        session_factory = SessionLocal
+    else:
+        session_factory = ReadSessionLocal
+
+    with session_factory() as session:
+        yield session
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as session:
+        yield session
+
+
+async def get_async_read_db(request: Request):
+    """
+    get_read_db の非同期版。
+    """
+    if has_replica() and is_pinned_to_primary(request):
+        session_factory = AsyncSessionLocal
+    else:
+        session_factory = AsyncReadSessionLocal
+
+    async with session_factory() as session:
+        yield session
@@ -1,11 +1,23 @@
 import logging
 import os
+from contextlib import asynccontextmanager
+from time import perf_counter
 
 import uvicorn
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 
-from api.core.config import HOST, PORT
+from api import database
+from api.core import metrics, profiling, tracing
+from api.core.config import (
+    HOST,
+    JUDGE_CALLBACK_URL,
+    PORT,
+    SERVER_TIMING,
+    SQL_PROFILING,
+)
+from api.crud import submission as submission_crud
 from api.routers.chat import router as chat_router
+from api.routers.metrics import router as metrics_router
 from api.routers.problem import router as problem_router
 from api.routers.submission import router as submission_router
 from api.routers.user import router as user_router
@@ -20,17 +32,116 @@ if DEBUG:
     logger.info("Running in DEBUG mode.")
     logging.getLogger("sqlalchemy.engine").setLevel(logging.DEBUG)
 
+profiling.install()
+tracing.install()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 再起動の前に提出したテストケースも、結果が届かなければ期限切れで IE にする
+    if JUDGE_CALLBACK_URL:
+        submission_crud.start_reaper(database.get_sessionmaker())
+    yield
+    submission_crud.stop_reaper()
+
+
 # アプリケーション初期化
 app = FastAPI(
     title="AIbleCode API",
     root_path="/api",
+    lifespan=lifespan,
 )
 
+
+@app.middleware("http")
+async def record_metrics(request: Request, call_next):
+    """
+    ルートごとのリクエスト数と応答時間を記録する。
+    パスではなくルートのテンプレート（/problem/{category_path_id} など）で集計する。
+    """
+    method = request.method
+    metrics.http_requests_in_progress.inc(method=method)
+    start = perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        elapsed = perf_counter() - start
+        route = request.scope.get("route")
+        path = getattr(route, "path", "<unmatched>")
+        metrics.http_requests_in_progress.dec(method=method)
+        metrics.http_request_duration_seconds.observe(
+            elapsed, method=method, route=path
+        )
+        metrics.http_requests_total.inc(method=method, route=path, status=status_code)
+
+
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    """
+    リクエストごとにスパンを作る。traceparent ヘッダがあれば、そのトレースを引き継ぐ。
+    """
+    with tracing.span(
+        f"{request.method} {request.url.path}",
+        request.headers.get("traceparent"),
+        kind="server",
+        **{"http.method": request.method, "http.target": request.url.path},
+    ) as span:
+        response = await call_next(request)
+
+        route = getattr(request.scope.get("route"), "path", None)
+        if route:
+            span.update_name(f"{request.method} {route}")
+            span.set_attribute("http.route", route)
+        span.set_attribute("http.status_code", response.status_code)
+        if response.status_code >= 500:
+            span.set_error()
+    return response
+
+
+@app.middleware("http")
+async def profile_queries(request: Request, call_next):
+    """
+    リクエストごとに SQL の件数と時間を数え、遅い SQL と N+1 の疑いをログに出す。
+    SERVER_TIMING が有効なら、件数と時間を Server-Timing ヘッダで返す。
+    """
+    if not SQL_PROFILING:
+        return await call_next(request)
+
+    # レスポンスを返した後のバックグラウンドのタスク（ジャッジなど）は数えない
+    with profiling.track(request.url.path, request.scope) as stats:
+        response = await call_next(request)
+
+    if SERVER_TIMING:
+        response.headers.append("Server-Timing", stats.server_timing())
+    return response
+
+
+@app.middleware("http")
+async def read_your_writes(request: Request, call_next):
+    """
+    書き込みに成功したクライアントには Cookie を付け、直後の読み取りをプライマリに向ける。
+    """
+    response = await call_next(request)
+
+    if (
+        database.has_replica()
+        and request.method not in ("GET", "HEAD", "OPTIONS")
+        and response.status_code < 400
+    ):
+        database.pin_to_primary(response)
+
+    return response
+
+
 # ルーターの登録
 app.include_router(user_router)
 app.include_router(problem_router)
 app.include_router(submission_router)
 app.include_router(chat_router)
+app.include_router(metrics_router)
 
 
 @app.get("/")
@@ -1,19 +1,18 @@
+import argparse
 import os
 import pathlib
-import uuid
 
 from dotenv import load_dotenv
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 
-from api.models.chat import Base as chat_base
-from api.models.problem import Base as problem_base
-from api.models.submission import Base as submission_base
-from api.models.user import Base as user_base
+from api import migrations
+from api.database import Base, generate_id
+from api.models import chat, problem, submission  # noqa: F401（テーブル定義の登録）
 from api.models.user import User
 from api.utils import hash
 
-load_dotenv(verbose=True, override=True)
+load_dotenv(verbose=True, override=not os.getenv("AIBLECODE_NO_DOTENV_OVERRIDE"))
 dotenv_path = pathlib.Path(__file__).parent.parent / ".env"
 load_dotenv(dotenv_path)
 
@@ -23,22 +22,23 @@ ADMIN_PASSWORD = os.getenv("ADMIN_PASSWORD")
 
 engine = create_engine(DATABASE_URL, echo=True)
 
-bases = [user_base, problem_base, submission_base, chat_base]
-
 
 def reset_database():
     """
     データベースを初期化する。
+    全てのモデルは同じ Base を使っているので、1回の drop_all / create_all で良い。
+    作成後は最新のリビジョンまで適用済みとして記録する。
     """
-    for base in bases:
-        base.metadata.drop_all(engine)
-        base.metadata.create_all(engine)
+    Base.metadata.drop_all(engine)
+    migrations.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    migrations.stamp(engine)
 
     Session = sessionmaker(bind=engine)
     session = Session()
 
     admin_user = User(
-        id=uuid.uuid4(),
+        id=generate_id(),
         username="admin",
         password=hash.hash_password(ADMIN_PASSWORD),
         is_active=True,
@@ -49,5 +49,17 @@ def reset_database():
 
 
 if __name__ == "__main__":
-    reset_database()
-    print("Database initialized")
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--upgrade",
+        action="store_true",
+        help="データを残したまま、未適用のマイグレーションを適用する",
+    )
+    args = parser.parse_args()
+
+    if args.upgrade:
+        migrations.upgrade(engine)
+        print("Database upgraded")
+    else:
+        reset_database()
+        print("Database initialized")
@@ -0,0 +1,182 @@
+"""
+バージョン付きのスキーマ移行。
+
+api/migrations/versions/ 以下の各モジュールが1つのリビジョンで、次の属性を持つ。
+
+- revision: "0001" のような、辞書順で並ぶ文字列
+- description: 説明
+- transactional: False にするとトランザクション外（自動コミット）で実行する。
+  オンラインでのインデックス作成や、バッチごとに確定させたいデータ移行に使う。
+- upgrade(ctx) / downgrade(ctx): MigrationContext を受け取る関数
+
+適用済みのリビジョンは schema_migrations テーブルに記録する。
+"""
+
+import importlib
+import pkgutil
+from dataclasses import dataclass
+from datetime import datetime
+from types import ModuleType
+
+from sqlalchemy import Column, DateTime, MetaData, String, Table, delete, insert, select
+from sqlalchemy.engine import Engine
+
+from api.migrations import uuid_storage, versions
+from api.migrations.context import MigrationContext
+
+metadata = MetaData()
+
+schema_migrations = Table(
+    "schema_migrations",
+    metadata,
+    Column("version", String(32), primary_key=True),
+    Column("description", String(200)),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+
+@dataclass(frozen=True)
+class Migration:
+    revision: str
+    description: str
+    transactional: bool
+    module: ModuleType
+
+
+def load_migrations() -> list[Migration]:
+    migrations = []
+
+    for info in pkgutil.iter_modules(versions.__path__):
+        module = importlib.import_module(f"{versions.__name__}.{info.name}")
+        migrations.append(
+            Migration(
+                revision=module.revision,
+                description=module.description,
+                transactional=getattr(module, "transactional", True),
+                module=module,
+            )
+        )
+
+    migrations.sort(key=lambda migration: migration.revision)
+    return migrations
+
+
+def head() -> str | None:
+    migrations = load_migrations()
+    return migrations[-1].revision if migrations else None
+
+
+def get_applied(engine: Engine) -> set[str]:
+    metadata.create_all(engine)
+    with engine.connect() as conn:
+        return set(conn.execute(select(schema_migrations.c.version)).scalars())
+
+
+def current(engine: Engine) -> str | None:
+    applied = get_applied(engine)
+    return max(applied) if applied else None
+
+
+def _run(engine: Engine, migration: Migration, direction: str):
+    if migration.transactional:
+        with engine.begin() as conn:
+            getattr(migration.module, direction)(MigrationContext(conn, True))
+            _record(conn, migration, direction)
+    else:
+        with engine.connect() as conn:
+            conn = conn.execution_options(isolation_level="AUTOCOMMIT")
+            getattr(migration.module, direction)(MigrationContext(conn, False))
+            _record(conn, migration, direction)
+
+
+def _record(conn, migration: Migration, direction: str):
+    if direction == "upgrade":
+        conn.execute(
+            insert(schema_migrations).values(
+                version=migration.revision,
+                description=migration.description,
+                applied_at=datetime.now(),
+            )
+        )
+    else:
+        conn.execute(
+            delete(schema_migrations).where(
+                schema_migrations.c.version == migration.revision
+            )
+        )
+
+
+def upgrade(engine: Engine, target: str | None = None, log=print) -> list[str]:
+    """
+    target（省略時は最新）までの未適用のリビジョンを古い順に適用する。
+    """
+    applied = get_applied(engine)
+    done = []
+
+    for migration in load_migrations():
+        if target is not None and migration.revision > target:
+            break
+        if migration.revision in applied:
+            continue
+
+        log(f"Upgrading {migration.revision}: {migration.description}")
+        _run(engine, migration, "upgrade")
+        done.append(migration.revision)
+
+    return done
+
+
+def downgrade(engine: Engine, target: str, log=print) -> list[str]:
+    """
+    target より新しい適用済みのリビジョンを新しい順に戻す。
+    target に "base" を指定すると全て戻す。
+    """
+    applied = get_applied(engine)
+    done = []
+
+    for migration in reversed(load_migrations()):
+        if target != "base" and migration.revision <= target:
+            break
+        if migration.revision not in applied:
+            continue
+        if not hasattr(migration.module, "downgrade"):
+            raise RuntimeError(f"Revision {migration.revision} cannot be downgraded")
+
+        log(f"Downgrading {migration.revision}: {migration.description}")
+        _run(engine, migration, "downgrade")
+        done.append(migration.revision)
+
+    return done
+
+
+def stamp(engine: Engine, target: str | None = None):
+    """
+    マイグレーションを実行せずに、target（省略時は最新）まで適用済みとして記録する。
+    create_all で作ったデータベースや、このしくみを入れる前からあるデータベースで使う。
+    """
+    with engine.begin() as conn:
+        metadata.create_all(conn)
+        conn.execute(delete(schema_migrations))
+        for migration in load_migrations():
+            if target is not None and migration.revision > target:
+                break
+            conn.execute(
+                insert(schema_migrations).values(
+                    version=migration.revision,
+                    description=migration.description,
+                    applied_at=datetime.now(),
+                )
+            )
+
+
+def convert_uuid_storage(engine: Engine, storage: str):
+    """
+    UUID のカラムを storage（"char" または "binary"）の形式に書き換える。
+    UUID_STORAGE を変えたときに、最新まで適用したデータベースで実行する。
+    """
+    if current(engine) != head():
+        raise RuntimeError("Upgrade the database to the latest revision first")
+
+    with engine.connect() as conn:
+        conn = conn.execution_options(isolation_level="AUTOCOMMIT")
+        uuid_storage.convert(MigrationContext(conn, False), storage)
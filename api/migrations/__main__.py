@@ -0,0 +1,58 @@
+import argparse
+
+from api import migrations
+from api.core.config import UUID_STORAGE
+from api.database import engine
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="python -m api.migrations",
+        description="データベースのスキーマを移行する。",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    upgrade = subparsers.add_parser("upgrade", help="最新（または指定）まで適用する")
+    upgrade.add_argument("revision", nargs="?")
+
+    downgrade = subparsers.add_parser("downgrade", help="指定したリビジョンまで戻す")
+    downgrade.add_argument("revision", help='戻り先のリビジョン（全て戻すなら "base"）')
+
+    stamp = subparsers.add_parser("stamp", help="実行せずに適用済みとして記録する")
+    stamp.add_argument("revision", nargs="?")
+
+    uuid_storage = subparsers.add_parser(
+        "uuid-storage", help="UUID のカラムを指定した形式に書き換える"
+    )
+    uuid_storage.add_argument("storage", choices=["char", "binary"])
+
+    subparsers.add_parser("current", help="適用済みの最新リビジョンを表示する")
+    subparsers.add_parser("history", help="リビジョンの一覧を表示する")
+
+    args = parser.parse_args()
+
+    if args.command == "upgrade":
+        done = migrations.upgrade(engine, args.revision)
+        print(f"Applied {len(done)} revision(s)")
+    elif args.command == "downgrade":
+        done = migrations.downgrade(engine, args.revision)
+        print(f"Reverted {len(done)} revision(s)")
+    elif args.command == "stamp":
+        migrations.stamp(engine, args.revision)
+        print(f"Stamped {args.revision or migrations.head()}")
+    elif args.command == "uuid-storage":
+        migrations.convert_uuid_storage(engine, args.storage)
+        print(f"Converted UUID keys to {args.storage}")
+        if args.storage != UUID_STORAGE:
+            print(f"Set UUID_STORAGE={args.storage} before starting the API")
+    elif args.command == "current":
+        print(migrations.current(engine) or "base")
+    elif args.command == "history":
+        applied = migrations.get_applied(engine)
+        for migration in migrations.load_migrations():
+            mark = "*" if migration.revision in applied else " "
+            print(f"{mark} {migration.revision} {migration.description}")
+
+
+if __name__ == "__main__":
+    main()
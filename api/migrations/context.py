@@ -0,0 +1,132 @@
+from sqlalchemy import Column, Table, inspect, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.schema import CreateColumn
+
+
+class MigrationContext:
+    """
+    マイグレーションから使う操作をまとめたもの。
+    どの操作も「既にあれば何もしない」ので、途中で失敗しても再実行できる。
+    """
+
+    def __init__(self, conn: Connection, transactional: bool):
+        self.conn = conn
+        self.transactional = transactional
+
+    @property
+    def dialect(self) -> str:
+        return self.conn.dialect.name
+
+    def execute(self, sql: str, params: dict | None = None):
+        return self.conn.execute(text(sql), params or {})
+
+    # 状態の確認 ###################################################################################
+    def has_table(self, table: str) -> bool:
+        return inspect(self.conn).has_table(table)
+
+    def has_column(self, table: str, column: str) -> bool:
+        return column in {c["name"] for c in inspect(self.conn).get_columns(table)}
+
+    def has_index(self, table: str, name: str) -> bool:
+        inspector = inspect(self.conn)
+        names = {index["name"] for index in inspector.get_indexes(table)}
+        names |= {c["name"] for c in inspector.get_unique_constraints(table)}
+        return name in names
+
+    # スキーマの変更 ###############################################################################
+    def create_table(self, table: Table):
+        table.create(self.conn, checkfirst=True)
+
+    def drop_table(self, table: str):
+        if self.has_table(table):
+            self.execute(f"DROP TABLE {table}")
+
+    def add_column(self, table: str, column: Column):
+        if self.has_column(table, column.name):
+            return
+
+        ddl = CreateColumn(column).compile(dialect=self.conn.dialect)
+        self.execute(f"ALTER TABLE {table} ADD COLUMN {ddl}")
+
+    def drop_column(self, table: str, column: str):
+        if self.has_column(table, column):
+            self.execute(f"ALTER TABLE {table} DROP COLUMN {column}")
+
+    def create_index(
+        self,
+        table: str,
+        name: str,
+        columns: list[str],
+        unique: bool = False,
+        online: bool = True,
+    ):
+        """
+        インデックスを作成する。
+        online=True のとき、テーブルをロックしない方法があればそれを使う。
+        - MySQL: ALGORITHM=INPLACE, LOCK=NONE
+        - PostgreSQL: CONCURRENTLY（トランザクション外のマイグレーションのみ）
+        """
+        if self.has_index(table, name):
+            return
+
+        kind = "UNIQUE INDEX" if unique else "INDEX"
+        sql = f"CREATE {kind} {name} ON {table} ({', '.join(columns)})"
+
+        if online and self.dialect == "mysql":
+            sql += " ALGORITHM=INPLACE LOCK=NONE"
+        elif online and self.dialect == "postgresql" and not self.transactional:
+            sql = sql.replace(f"{kind} ", f"{kind} CONCURRENTLY ", 1)
+
+        self.execute(sql)
+
+    def drop_index(self, table: str, name: str):
+        if not self.has_index(table, name):
+            return
+
+        if self.dialect == "mysql":
+            self.execute(f"DROP INDEX {name} ON {table}")
+        else:
+            self.execute(f"DROP INDEX {name}")
+
+    # データの移行 #################################################################################
+    def backfill(
+        self,
+        table: str,
+        set_clause: str,
+        where: str = "1 = 1",
+        key: str = "id",
+        batch_size: int = 1000,
+        params: dict | None = None,
+    ) -> int:
+        """
+        UPDATE を主キー順に batch_size 件ずつ実行する。
+        トランザクション外のマイグレーションでは1バッチごとに確定するので、
+        大きなテーブルでも長時間ロックを握り続けない。
+        更新対象になった行数を返す。
+        """
+        last = None
+        updated = 0
+
+        while True:
+            query = f"SELECT {key} FROM {table}"
+            query_params = dict(params or {})
+            if last is not None:
+                query += f" WHERE {key} > :_last"
+                query_params["_last"] = last
+            query += f" ORDER BY {key} LIMIT {int(batch_size)}"
+
+            keys = [row[0] for row in self.execute(query, query_params)]
+            if not keys:
+                return updated
+
+            placeholders = ", ".join(f":_k{i}" for i in range(len(keys)))
+            update_params = dict(params or {})
+            update_params.update({f"_k{i}": k for i, k in enumerate(keys)})
+
+            result = self.execute(
+                f"UPDATE {table} SET {set_clause} "
+                f"WHERE {key} IN ({placeholders}) AND ({where})",
+                update_params,
+            )
+            updated += result.rowcount
+            last = keys[-1]
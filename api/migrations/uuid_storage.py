@@ -0,0 +1,164 @@
+"""
+UUID のカラムの保存形式（CHAR(32) / BINARY(16)）を書き換える。
+
+形式は設定（UUID_STORAGE）で選ぶものなので、リビジョンとは別に
+`python -m api.migrations uuid-storage` から実行する。
+"""
+
+import uuid
+
+from sqlalchemy import inspect, text
+
+from api.migrations.context import MigrationContext
+
+# UUID を持つカラム（テーブルごと）
+KEY_COLUMNS = {
+    "users": ["id"],
+    "categories": ["id"],
+    "problems": ["id", "category_id"],
+    "testcases": ["id", "problem_id"],
+    "submissions": ["id", "problem_id", "user_id", "latest_review_id"],
+    "submissions_details": ["id", "submission_id", "testcase_id"],
+    "chats": ["id", "submission_id"],
+    "pending_judgements": ["id", "submission_id", "testcase_id"],
+}
+
+BATCH_SIZE = 1000
+
+
+def convert(ctx: MigrationContext, storage: str):
+    """
+    UUID のカラムを storage（"char" または "binary"）の形式に書き換える。
+    既にその形式になっているカラムはそのままにする。
+    PostgreSQL は UUIDType がネイティブの UUID 型を使うので何もしない。
+    """
+    if ctx.dialect == "postgresql":
+        return
+
+    tables = {
+        table: [c for c in columns if ctx.has_column(table, c)]
+        for table, columns in KEY_COLUMNS.items()
+        if ctx.has_table(table)
+    }
+
+    if ctx.dialect == "mysql":
+        _convert_mysql(ctx, tables, storage)
+    else:
+        _convert_rows(ctx, tables, storage)
+
+
+def _convert_mysql(ctx: MigrationContext, tables: dict[str, list[str]], storage: str):
+    inspector = inspect(ctx.conn)
+    binary = storage == "binary"
+
+    targets = {}
+    for table, columns in tables.items():
+        column_types = {c["name"]: c for c in inspector.get_columns(table)}
+        pending = [
+            column
+            for column in columns
+            if str(column_types[column]["type"]).upper().startswith("BINARY") != binary
+        ]
+        if pending:
+            targets[table] = [(column, column_types[column]) for column in pending]
+
+    if not targets:
+        return
+
+    # 型を変えるカラムを参照している外部キーを外しておき、最後に張り直す
+    foreign_keys = [
+        (table, fk) for table in tables for fk in inspector.get_foreign_keys(table)
+    ]
+    for table, fk in foreign_keys:
+        ctx.execute(f"ALTER TABLE {table} DROP FOREIGN KEY {fk['name']}")
+
+    final_type = "BINARY(16)" if binary else "CHAR(32)"
+    for table, columns in targets.items():
+        ctx.execute(
+            f"ALTER TABLE {table} "
+            + ", ".join(
+                f"MODIFY {column} VARBINARY(32)"
+                + ("" if info["nullable"] else " NOT NULL")
+                for column, info in columns
+            )
+        )
+        ctx.execute(
+            f"UPDATE {table} SET "
+            + ", ".join(
+                f"{column} = "
+                + (f"UNHEX({column})" if binary else f"LOWER(HEX({column}))")
+                for column, _ in columns
+            )
+        )
+        ctx.execute(
+            f"ALTER TABLE {table} "
+            + ", ".join(
+                f"MODIFY {column} {final_type}"
+                + ("" if info["nullable"] else " NOT NULL")
+                for column, info in columns
+            )
+        )
+
+    for table, fk in foreign_keys:
+        options = fk.get("options", {})
+        sql = (
+            f"ALTER TABLE {table} ADD CONSTRAINT {fk['name']} "
+            f"FOREIGN KEY ({', '.join(fk['constrained_columns'])}) "
+            f"REFERENCES {fk['referred_table']} ({', '.join(fk['referred_columns'])})"
+        )
+        if options.get("ondelete"):
+            sql += f" ON DELETE {options['ondelete']}"
+        if options.get("onupdate"):
+            sql += f" ON UPDATE {options['onupdate']}"
+        ctx.execute(sql)
+
+
+def _convert_rows(ctx: MigrationContext, tables: dict[str, list[str]], storage: str):
+    """
+    SQLite などの型に厳しくないデータベースでは、値だけを書き換える。
+    rowid の順に BATCH_SIZE 件ずつ処理する。
+    """
+    binary = storage == "binary"
+
+    def convert_value(value):
+        if value is None:
+            return None
+        if binary and isinstance(value, str):
+            return uuid.UUID(hex=value).bytes
+        if not binary and isinstance(value, bytes):
+            return uuid.UUID(bytes=value).hex
+        return value
+
+    for table, columns in tables.items():
+        last = 0
+        while True:
+            rows = ctx.execute(
+                f"SELECT rowid, {', '.join(columns)} FROM {table} "
+                f"WHERE rowid > :last ORDER BY rowid LIMIT {BATCH_SIZE}",
+                {"last": last},
+            ).fetchall()
+            if not rows:
+                break
+
+            updates = []
+            for row in rows:
+                values = {
+                    column: convert_value(row[i + 1])
+                    for i, column in enumerate(columns)
+                }
+                if any(
+                    values[column] != row[i + 1] for i, column in enumerate(columns)
+                ):
+                    values["_rowid"] = row[0]
+                    updates.append(values)
+
+            if updates:
+                ctx.conn.execute(
+                    text(
+                        f"UPDATE {table} SET "
+                        + ", ".join(f"{column} = :{column}" for column in columns)
+                        + " WHERE rowid = :_rowid"
+                    ),
+                    updates,
+                )
+            last = rows[-1][0]
@@ -0,0 +1,140 @@
+from sqlalchemy import (
+    Boolean,
+    Column,
+    DateTime,
+    Float,
+    ForeignKey,
+    Integer,
+    LargeBinary,
+    MetaData,
+    String,
+    Table,
+    Text,
+    UniqueConstraint,
+)
+from sqlalchemy.dialects.mysql import LONGTEXT
+from sqlalchemy_utils import UUIDType
+
+from api.migrations.context import MigrationContext
+
+revision = "0001"
+description = "Initial schema"
+
+# この時点のスキーマを固定して持つ（モデルが変わってもこのリビジョンは変わらない）
+metadata = MetaData()
+LongText = Text().with_variant(LONGTEXT, "mysql")
+
+tables = [
+    Table(
+        "users",
+        metadata,
+        Column("id", UUIDType(binary=False), primary_key=True),
+        Column("username", String(30), unique=True, index=True, nullable=False),
+        Column("password", LargeBinary, nullable=False),
+        Column("is_active", Boolean, nullable=False),
+    ),
+    Table(
+        "sessions",
+        metadata,
+        Column("id", String(128), primary_key=True),
+        Column("token", Text, nullable=False),
+    ),
+    Table(
+        "categories",
+        metadata,
+        Column("id", UUIDType(binary=False), primary_key=True),
+        Column("path_id", String(30), unique=True, index=True, nullable=False),
+        Column("title", String(50), nullable=False),
+        Column("description", Text),
+    ),
+    Table(
+        "problems",
+        metadata,
+        Column("id", UUIDType(binary=False), primary_key=True),
+        Column("path_id", String(30), index=True, nullable=False),
+        Column(
+            "category_id",
+            UUIDType(binary=False),
+            ForeignKey("categories.id", ondelete="CASCADE", onupdate="CASCADE"),
+            nullable=False,
+        ),
+        Column("title", String(50), nullable=False),
+        Column("statement", LongText, nullable=False),
+        Column("level", Integer, nullable=False),
+        Column("time_limit", Float),
+        Column("memory_limit", Integer),
+        UniqueConstraint("path_id", "category_id", name="uq_path_category"),
+    ),
+    Table(
+        "testcases",
+        metadata,
+        Column("id", UUIDType(binary=False), primary_key=True),
+        Column(
+            "problem_id",
+            UUIDType(binary=False),
+            ForeignKey("problems.id", ondelete="CASCADE", onupdate="CASCADE"),
+        ),
+        Column("name", String(50)),
+        Column("input", LongText),
+        Column("output", LongText),
+    ),
+    Table(
+        "submissions",
+        metadata,
+        Column("id", UUIDType(binary=False), primary_key=True),
+        Column(
+            "problem_id",
+            UUIDType(binary=False),
+            ForeignKey("problems.id", ondelete="CASCADE", onupdate="CASCADE"),
+            nullable=False,
+        ),
+        Column(
+            "user_id",
+            UUIDType(binary=False),
+            ForeignKey("users.id", ondelete="CASCADE", onupdate="CASCADE"),
+            nullable=False,
+        ),
+        Column("language", String(30), nullable=False),
+        Column("code", LongText, nullable=False),
+        Column("created_at", DateTime, nullable=False),
+    ),
+    Table(
+        "submissions_details",
+        metadata,
+        Column("id", UUIDType(binary=False), primary_key=True),
+        Column(
+            "submission_id",
+            UUIDType(binary=False),
+            ForeignKey("submissions.id", ondelete="CASCADE", onupdate="CASCADE"),
+            nullable=False,
+        ),
+        Column(
+            "testcase_id",
+            UUIDType(binary=False),
+            ForeignKey("testcases.id", ondelete="CASCADE", onupdate="CASCADE"),
+            nullable=False,
+        ),
+        Column("status", String(10)),
+        Column("time", Float),
+        Column("memory", Integer),
+    ),
+    Table(
+        "chats",
+        metadata,
+        Column("id", UUIDType(binary=False), primary_key=True),
+        Column("submission_id", UUIDType(binary=False), ForeignKey("submissions.id")),
+        Column("is_ai", Boolean, nullable=False),
+        Column("message", Text),
+        Column("created_at", DateTime, nullable=False),
+    ),
+]
+
+
+def upgrade(ctx: MigrationContext):
+    for table in tables:
+        ctx.create_table(table)
+
+
+def downgrade(ctx: MigrationContext):
+    for table in reversed(tables):
+        ctx.drop_table(table.name)
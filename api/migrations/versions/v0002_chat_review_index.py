@@ -0,0 +1,43 @@
+from sqlalchemy import Column
+from sqlalchemy_utils import UUIDType
+
+from api.migrations.context import MigrationContext
+
+revision = "0002"
+description = "Index chats for review lookups and add submissions.latest_review_id"
+
+# インデックスの作成とバックフィルをロックせずに進めるため、トランザクション外で実行する
+transactional = False
+
+
+def upgrade(ctx: MigrationContext):
+    ctx.create_index(
+        "chats",
+        "ix_chats_submission_is_ai_created_at",
+        ["submission_id", "is_ai", "created_at"],
+    )
+    ctx.add_column(
+        "submissions", Column("latest_review_id", UUIDType(binary=False), nullable=True)
+    )
+
+    # 既存のレビューから latest_review_id を埋める
+    ctx.backfill(
+        "submissions",
+        """
+        latest_review_id = (
+            SELECT chats.id FROM chats
+            WHERE chats.submission_id = submissions.id
+                AND chats.is_ai = :is_ai
+                AND chats.message != ''
+            ORDER BY chats.created_at DESC
+            LIMIT 1
+        )
+        """,
+        where="latest_review_id IS NULL",
+        params={"is_ai": True},
+    )
+
+
+def downgrade(ctx: MigrationContext):
+    ctx.drop_column("submissions", "latest_review_id")
+    ctx.drop_index("chats", "ix_chats_submission_is_ai_created_at")
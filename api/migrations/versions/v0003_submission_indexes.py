@@ -0,0 +1,59 @@
+from api.migrations.context import MigrationContext
+
+revision = "0003"
+description = "Composite indexes for submissions and submissions_details"
+
+transactional = False
+
+
+def upgrade(ctx: MigrationContext):
+    ctx.create_index(
+        "submissions",
+        "ix_submissions_user_problem_created_at",
+        ["user_id", "problem_id", "created_at"],
+    )
+    ctx.create_index(
+        "submissions_details",
+        "ix_submissions_details_submission_status",
+        ["submission_id", "status"],
+    )
+
+    # 一意制約を張る前に、同じテストケースの重複した結果を1行にまとめる
+    if not ctx.has_index(
+        "submissions_details", "uq_submissions_details_submission_testcase"
+    ):
+        if ctx.dialect == "mysql":
+            ctx.execute(
+                """
+                DELETE d1 FROM submissions_details d1
+                JOIN submissions_details d2
+                    ON d1.submission_id = d2.submission_id
+                    AND d1.testcase_id = d2.testcase_id
+                    AND d1.id > d2.id
+                """
+            )
+        else:
+            ctx.execute(
+                """
+                DELETE FROM submissions_details
+                WHERE EXISTS (
+                    SELECT 1 FROM submissions_details d2
+                    WHERE d2.submission_id = submissions_details.submission_id
+                        AND d2.testcase_id = submissions_details.testcase_id
+                        AND d2.id < submissions_details.id
+                )
+                """
+            )
+
+    ctx.create_index(
+        "submissions_details",
+        "uq_submissions_details_submission_testcase",
+        ["submission_id", "testcase_id"],
+        unique=True,
+    )
+
+
+def downgrade(ctx: MigrationContext):
+    ctx.drop_index("submissions_details", "uq_submissions_details_submission_testcase")
+    ctx.drop_index("submissions_details", "ix_submissions_details_submission_status")
+    ctx.drop_index("submissions", "ix_submissions_user_problem_created_at")
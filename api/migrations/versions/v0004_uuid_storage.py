@@ -0,0 +1,19 @@
+from api.migrations import uuid_storage
+from api.migrations.context import MigrationContext
+
+revision = "0004"
+description = "Store UUID keys as CHAR(32)"
+
+transactional = False
+
+# このリビジョンで揃える形式。実行時の UUID_STORAGE によらず、どの環境でも同じ結果にする。
+# BINARY(16) にするときは、最新まで適用してから `python -m api.migrations uuid-storage binary`
+STORAGE = "char"
+
+
+def upgrade(ctx: MigrationContext):
+    uuid_storage.convert(ctx, STORAGE)
+
+
+def downgrade(ctx: MigrationContext):
+    uuid_storage.convert(ctx, "char")
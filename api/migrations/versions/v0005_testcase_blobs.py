@@ -0,0 +1,108 @@
+from sqlalchemy import (
+    Column,
+    Integer,
+    LargeBinary,
+    MetaData,
+    String,
+    Table,
+    Text,
+    text,
+)
+from sqlalchemy.dialects.mysql import LONGBLOB, LONGTEXT
+from sqlalchemy.orm import Session
+
+from api.migrations.context import MigrationContext
+from api.utils import blob
+
+revision = "0005"
+description = "Move testcase input/output into compressed, content-addressed blobs"
+
+transactional = False
+
+BATCH_SIZE = 100
+
+testcase_blobs = Table(
+    "testcase_blobs",
+    MetaData(),
+    Column("hash", String(64), primary_key=True),
+    Column("codec", String(10), nullable=False),
+    Column("size", Integer, nullable=False),
+    Column("data", LargeBinary().with_variant(LONGBLOB, "mysql"), nullable=False),
+)
+
+
+def upgrade(ctx: MigrationContext):
+    ctx.create_table(testcase_blobs)
+    ctx.add_column("testcases", Column("input_hash", String(64)))
+    ctx.add_column("testcases", Column("input_size", Integer))
+    ctx.add_column("testcases", Column("output_hash", String(64)))
+    ctx.add_column("testcases", Column("output_size", Integer))
+    ctx.create_index("testcases", "ix_testcases_problem_id", ["problem_id"])
+
+    if ctx.has_column("testcases", "input"):
+        _move_to_blobs(ctx)
+        ctx.drop_column("testcases", "input")
+        ctx.drop_column("testcases", "output")
+
+
+def _move_to_blobs(ctx: MigrationContext):
+    store = blob.get_store()
+    db = Session(bind=ctx.conn)
+    last = None
+
+    while True:
+        query = "SELECT id, input, output FROM testcases WHERE input_hash IS NULL"
+        params = {}
+        if last is not None:
+            query += " AND id > :last"
+            params["last"] = last
+        rows = ctx.execute(f"{query} ORDER BY id LIMIT {BATCH_SIZE}", params).fetchall()
+        if not rows:
+            break
+
+        for testcase_id, input_text, output_text in rows:
+            input_data = (input_text or "").encode()
+            output_data = (output_text or "").encode()
+            db.execute(
+                text(
+                    "UPDATE testcases SET input_hash = :input_hash, "
+                    "input_size = :input_size, output_hash = :output_hash, "
+                    "output_size = :output_size WHERE id = :id"
+                ),
+                {
+                    "id": testcase_id,
+                    "input_hash": store.put(db, input_data),
+                    "input_size": len(input_data),
+                    "output_hash": store.put(db, output_data),
+                    "output_size": len(output_data),
+                },
+            )
+        db.commit()
+        last = rows[-1][0]
+
+
+def downgrade(ctx: MigrationContext):
+    long_text = Text().with_variant(LONGTEXT, "mysql")
+    ctx.add_column("testcases", Column("input", long_text))
+    ctx.add_column("testcases", Column("output", long_text))
+
+    if ctx.has_column("testcases", "input_hash"):
+        store = blob.get_store()
+        db = Session(bind=ctx.conn)
+        rows = ctx.execute(
+            "SELECT id, input_hash, output_hash FROM testcases"
+        ).fetchall()
+        for testcase_id, input_hash, output_hash in rows:
+            ctx.execute(
+                "UPDATE testcases SET input = :input, output = :output WHERE id = :id",
+                {
+                    "id": testcase_id,
+                    "input": store.get(db, input_hash).decode(),
+                    "output": store.get(db, output_hash).decode(),
+                },
+            )
+
+    ctx.drop_index("testcases", "ix_testcases_problem_id")
+    for column in ("input_hash", "input_size", "output_hash", "output_size"):
+        ctx.drop_column("testcases", column)
+    ctx.drop_table("testcase_blobs")
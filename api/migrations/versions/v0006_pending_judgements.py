@@ -0,0 +1,57 @@
+from sqlalchemy import (
+    Column,
+    DateTime,
+    ForeignKey,
+    Index,
+    MetaData,
+    String,
+    Table,
+    UniqueConstraint,
+)
+
+from api.migrations.context import MigrationContext
+
+revision = "0006"
+description = "Add pending_judgements for callback-driven judging"
+
+
+def pending_judgements(metadata: MetaData) -> Table:
+    # UUID のカラムは、実行時の UUID_STORAGE ではなく参照先のカラムと同じ型にする
+    key_type = metadata.tables["submissions"].c.id.type
+    return Table(
+        "pending_judgements",
+        metadata,
+        Column("id", key_type, primary_key=True),
+        Column(
+            "submission_id",
+            key_type,
+            ForeignKey("submissions.id", ondelete="CASCADE", onupdate="CASCADE"),
+            nullable=False,
+        ),
+        Column(
+            "testcase_id",
+            key_type,
+            ForeignKey("testcases.id", ondelete="CASCADE", onupdate="CASCADE"),
+            nullable=False,
+        ),
+        Column("language", String(30), nullable=False),
+        Column("submitted_at", DateTime, nullable=False),
+        Column("deadline", DateTime, nullable=False),
+        UniqueConstraint(
+            "submission_id",
+            "testcase_id",
+            name="uq_pending_judgements_submission_testcase",
+        ),
+        Index("ix_pending_judgements_deadline", "deadline"),
+    )
+
+
+def upgrade(ctx: MigrationContext):
+    # 外部キーの参照先は、今のスキーマから読み込む
+    metadata = MetaData()
+    metadata.reflect(ctx.conn, only=["submissions", "testcases"])
+    ctx.create_table(pending_judgements(metadata))
+
+
+def downgrade(ctx: MigrationContext):
+    ctx.drop_table("pending_judgements")
@@ -1,12 +1,10 @@
-import uuid
 from datetime import datetime
 
 from pytz import timezone
-from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Text
+from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Index, Text
 from sqlalchemy.orm import relationship
-from sqlalchemy_utils import UUIDType
 
-from api.database import Base
+from api.database import Base, KeyType, generate_id
 
 
 def get_current_time():
@@ -16,10 +14,20 @@ def get_current_time():
 class Chat(Base):
     __tablename__ = "chats"
 
-    id = Column(UUIDType(binary=False), primary_key=True, default=uuid.uuid4)
-    submission_id = Column(UUIDType(binary=False), ForeignKey("submissions.id"))
+    id = Column(KeyType(), primary_key=True, default=generate_id)
+    submission_id = Column(KeyType(), ForeignKey("submissions.id"))
     is_ai = Column(Boolean, nullable=False)
     message = Column(Text)
     created_at = Column(DateTime, default=get_current_time, nullable=False)
 
     submission = relationship("Submission", backref="chat")
+
+    # get_ai_chat の絞り込みと並び替えをインデックスだけで済ませる
+    __table_args__ = (
+        Index(
+            "ix_chats_submission_is_ai_created_at",
+            "submission_id",
+            "is_ai",
+            "created_at",
+        ),
+    )
@@ -1,25 +1,23 @@
-import uuid
-
 from sqlalchemy import (
     Column,
     Float,
     ForeignKey,
     Integer,
+    LargeBinary,
     String,
     Text,
     UniqueConstraint,
 )
-from sqlalchemy.dialects.mysql import LONGTEXT
+from sqlalchemy.dialects.mysql import LONGBLOB, LONGTEXT
 from sqlalchemy.orm import relationship
-from sqlalchemy_utils import UUIDType
 
-from api.database import Base
+from api.database import Base, KeyType, generate_id
 
 
 class Category(Base):
     __tablename__ = "categories"
 
-    id = Column(UUIDType(binary=False), primary_key=True, default=uuid.uuid4)
+    id = Column(KeyType(), primary_key=True, default=generate_id)
     path_id = Column(String(30), unique=True, index=True, nullable=False)
     title = Column(String(50), nullable=False)
     description = Column(Text)
@@ -30,15 +28,15 @@ class Category(Base):
 class Problem(Base):
     __tablename__ = "problems"
 
-    id = Column(UUIDType(binary=False), primary_key=True, default=uuid.uuid4)
+    id = Column(KeyType(), primary_key=True, default=generate_id)
     path_id = Column(String(30), index=True, nullable=False)
     category_id = Column(
-        UUIDType(binary=False),
+        KeyType(),
         ForeignKey("categories.id", ondelete="CASCADE", onupdate="CASCADE"),
         nullable=False,
     )
     title = Column(String(50), nullable=False)
-    statement = Column(LONGTEXT, nullable=False)
+    statement = Column(Text().with_variant(LONGTEXT, "mysql"), nullable=False)
     level = Column(Integer, default=1, nullable=False)
     time_limit = Column(Float, default=2.0)
     memory_limit = Column(Integer, default=256)  # MB単位であることに注意
@@ -54,11 +52,24 @@ class Problem(Base):
 class Testcase(Base):
     __tablename__ = "testcases"
 
-    id = Column(UUIDType(binary=False), primary_key=True, default=uuid.uuid4)
+    id = Column(KeyType(), primary_key=True, default=generate_id)
     problem_id = Column(
-        UUIDType(binary=False),
+        KeyType(),
         ForeignKey("problems.id", ondelete="CASCADE", onupdate="CASCADE"),
+        index=True,
     )
     name = Column(String(50))
-    input = Column(LONGTEXT)
-    output = Column(LONGTEXT)
+    # 入出力の本体は testcase_blobs（または TESTCASE_BLOB_DIR）に内容のハッシュで保存する
+    input_hash = Column(String(64), nullable=False)
+    input_size = Column(Integer, nullable=False)
+    output_hash = Column(String(64), nullable=False)
+    output_size = Column(Integer, nullable=False)
+
+
+class TestcaseBlob(Base):
+    __tablename__ = "testcase_blobs"
+
+    hash = Column(String(64), primary_key=True)  # 圧縮前の内容の SHA-256
+    codec = Column(String(10), nullable=False)
+    size = Column(Integer, nullable=False)  # 圧縮前のバイト数
+    data = Column(LargeBinary().with_variant(LONGBLOB, "mysql"), nullable=False)
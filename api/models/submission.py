@@ -1,13 +1,21 @@
-import uuid
 from datetime import datetime
 
 from pytz import timezone
-from sqlalchemy import Column, DateTime, Float, ForeignKey, Integer, String, Text
+from sqlalchemy import (
+    Column,
+    DateTime,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    Text,
+    UniqueConstraint,
+)
 from sqlalchemy.dialects.mysql import LONGTEXT
 from sqlalchemy.orm import relationship
-from sqlalchemy_utils import UUIDType
 
-from api.database import Base
+from api.database import Base, KeyType, generate_id
 
 
 def get_current_time():
@@ -17,36 +25,48 @@ def get_current_time():
 class Submission(Base):
     __tablename__ = "submissions"
 
-    id = Column(UUIDType(binary=False), primary_key=True, default=uuid.uuid4)
+    id = Column(KeyType(), primary_key=True, default=generate_id)
     problem_id = Column(
-        UUIDType(binary=False),
+        KeyType(),
         ForeignKey("problems.id", ondelete="CASCADE", onupdate="CASCADE"),
         nullable=False,
     )
     user_id = Column(
-        UUIDType(binary=False),
+        KeyType(),
         ForeignKey("users.id", ondelete="CASCADE", onupdate="CASCADE"),
         nullable=False,
     )
     language = Column(String(30), nullable=False)
-    code = Column(LONGTEXT, nullable=False)
+    code = Column(Text().with_variant(LONGTEXT, "mysql"), nullable=False)
     created_at = Column(DateTime, default=get_current_time, nullable=False)
+    # 最新のAIレビュー（chats.id）。レビューを取得するときにchatsを検索せずに済む
+    latest_review_id = Column(KeyType(), nullable=True)
 
     problem = relationship("Problem", backref="submission")
     user = relationship("User", backref="submission")
 
+    # 提出一覧（ユーザー × 問題、新しい順）と最新の提出の取得用
+    __table_args__ = (
+        Index(
+            "ix_submissions_user_problem_created_at",
+            "user_id",
+            "problem_id",
+            "created_at",
+        ),
+    )
+
 
 class SubmissionDetail(Base):
     __tablename__ = "submissions_details"
 
-    id = Column(UUIDType(binary=False), primary_key=True, default=uuid.uuid4)
+    id = Column(KeyType(), primary_key=True, default=generate_id)
     submission_id = Column(
-        UUIDType(binary=False),
+        KeyType(),
         ForeignKey("submissions.id", ondelete="CASCADE", onupdate="CASCADE"),
         nullable=False,
     )
     testcase_id = Column(
-        UUIDType(binary=False),
+        KeyType(),
         ForeignKey("testcases.id", ondelete="CASCADE", onupdate="CASCADE"),
         nullable=False,
     )
@@ -56,3 +76,48 @@ class SubmissionDetail(Base):
 
     submission = relationship("Submission", backref="submission_detail")
     testcase = relationship("Testcase", backref="submission_detail")
+
+    __table_args__ = (
+        # 1つの提出につき、テストケースごとの結果は1行だけ
+        UniqueConstraint(
+            "submission_id",
+            "testcase_id",
+            name="uq_submissions_details_submission_testcase",
+        ),
+        # summarize_status と AC 数の集計用
+        Index("ix_submissions_details_submission_status", "submission_id", "status"),
+    )
+
+
+class PendingJudgement(Base):
+    """
+    Judge0 のコールバックを待っているテストケース。
+    結果が届くか、deadline を過ぎて IE にされたときに消す。
+    """
+
+    __tablename__ = "pending_judgements"
+
+    id = Column(KeyType(), primary_key=True, default=generate_id)
+    submission_id = Column(
+        KeyType(),
+        ForeignKey("submissions.id", ondelete="CASCADE", onupdate="CASCADE"),
+        nullable=False,
+    )
+    testcase_id = Column(
+        KeyType(),
+        ForeignKey("testcases.id", ondelete="CASCADE", onupdate="CASCADE"),
+        nullable=False,
+    )
+    language = Column(String(30), nullable=False)
+    submitted_at = Column(DateTime, nullable=False)
+    deadline = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint(
+            "submission_id",
+            "testcase_id",
+            name="uq_pending_judgements_submission_testcase",
+        ),
+        # 期限切れのものを探す用
+        Index("ix_pending_judgements_deadline", "deadline"),
+    )
@@ -1,15 +1,12 @@
-import uuid
-
 from sqlalchemy import Boolean, Column, LargeBinary, String, Text
-from sqlalchemy_utils import UUIDType
 
-from api.database import Base
+from api.database import Base, KeyType, generate_id
 
 
 class User(Base):
     __tablename__ = "users"
 
-    id = Column(UUIDType(binary=False), primary_key=True, default=uuid.uuid4)
+    id = Column(KeyType(), primary_key=True, default=generate_id)
     username = Column(String(30), unique=True, index=True, nullable=False)
     password = Column(LargeBinary, nullable=False)
     is_active = Column(Boolean, default=True, nullable=False)
@@ -0,0 +1,41 @@
+import argparse
+import sys
+
+from api.crud import problem_set as problem_set_crud
+from api.database import SessionLocal
+from api.models import chat, problem, submission, user  # noqa: F401
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="カテゴリー単位で問題とテストケースを書き出す・読み込む。"
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subparsers.add_parser("export", help="カテゴリーを書き出す")
+    export_parser.add_argument("category_path_id")
+    export_parser.add_argument(
+        "-o", "--output", help="書き出し先（省略時は <category_path_id>.tar.gz）"
+    )
+
+    import_parser = subparsers.add_parser("import", help="アーカイブを読み込む")
+    import_parser.add_argument("archive", nargs="+")
+
+    args = parser.parse_args()
+
+    with SessionLocal() as db:
+        if args.command == "export":
+            output = args.output or f"{args.category_path_id}.tar.gz"
+            with open(output, "wb") as f:
+                problem_set_crud.export_category(
+                    db, args.category_path_id, f, log=print
+                )
+            print(f"Exported to {output}")
+        else:
+            for path in args.archive:
+                with open(path, "rb") as f:
+                    problem_set_crud.import_category(db, f, log=print)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
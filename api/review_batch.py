@@ -0,0 +1,142 @@
+import argparse
+import logging
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import timedelta
+
+from sqlalchemy import func
+
+from api.core.config import (
+    REVIEW_BATCH_CONCURRENCY,
+    REVIEW_BATCH_IDLE_SECONDS,
+    REVIEW_BATCH_SIZE,
+)
+from api.crud import chat as chat_crud
+from api.crud import problem as problem_crud
+from api.crud import submission as submission_crud
+from api.database import SessionLocal
+from api.models import submission as submission_model
+
+logger = logging.getLogger(__name__)
+
+
+def is_idle(idle_seconds: int) -> bool:
+    """
+    直近 idle_seconds 秒の間に新しい提出が無ければ、アイドル状態とみなす。
+    """
+    with SessionLocal() as db:
+        latest = db.query(func.max(submission_model.Submission.created_at)).scalar()
+
+    if latest is None:
+        return True
+
+    now = submission_model.get_current_time().replace(tzinfo=None)
+    return now - latest.replace(tzinfo=None) >= timedelta(seconds=idle_seconds)
+
+
+def review_submission(submission_id: uuid.UUID) -> bool:
+    """
+    1件の提出をレビューし、create_chat を通して保存する。
+    ワーカーごとに別のセッションを使う。
+    """
+    with SessionLocal() as db:
+        submission = submission_crud.get_submission(db, submission_id)
+        if not submission:
+            return False
+
+        problem = problem_crud.get_problem(db, submission.problem_id)
+        statuses = submission_crud.summarize_status(db, submission)
+
+        if not problem or statuses["WJ"] > 0:
+            return False
+
+        chat_crud.chat(db, problem, submission, statuses)
+        return True
+
+
+def run_batch(limit: int, concurrency: int) -> tuple[int, int]:
+    """
+    レビューの無い提出を最大 limit 件、同時に concurrency 件ずつレビューする。
+    (成功件数, 失敗件数) を返す。
+    """
+    with SessionLocal() as db:
+        submission_ids = [
+            submission.id
+            for submission in chat_crud.get_unreviewed_submission_list(db, limit)
+        ]
+
+    if not submission_ids:
+        return (0, 0)
+
+    reviewed, failed = 0, 0
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = {
+            executor.submit(review_submission, submission_id): submission_id
+            for submission_id in submission_ids
+        }
+        for future in as_completed(futures):
+            try:
+                if future.result():
+                    reviewed += 1
+            except Exception as e:
+                failed += 1
+                logger.warning("Failed to review %s: %s", futures[future], e)
+
+    logger.info("Reviewed %d submissions (%d failed)", reviewed, failed)
+    return (reviewed, failed)
+
+
+def run_loop(
+    limit: int,
+    concurrency: int,
+    interval: float,
+    idle_seconds: int,
+    stop: threading.Event,
+):
+    """
+    stop がセットされるまで、アイドル状態のときに run_batch を繰り返す。
+    limit 件を全てレビューできたときは、残りがあるとみなして待たずに続ける。
+    """
+    while not stop.is_set():
+        if is_idle(idle_seconds):
+            reviewed, failed = run_batch(limit, concurrency)
+            # 取りきれなかった分があれば、待たずに続ける
+            if failed == 0 and reviewed >= limit:
+                continue
+        stop.wait(interval)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="ジャッジ済みの提出に対するAIレビューを一括で生成する。"
+    )
+    parser.add_argument("--limit", type=int, default=REVIEW_BATCH_SIZE)
+    parser.add_argument("--concurrency", type=int, default=REVIEW_BATCH_CONCURRENCY)
+    parser.add_argument(
+        "--loop",
+        action="store_true",
+        help="アイドル状態のときに繰り返し実行する",
+    )
+    parser.add_argument("--interval", type=int, default=30)
+    parser.add_argument("--idle-seconds", type=int, default=REVIEW_BATCH_IDLE_SECONDS)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    if not args.loop:
+        run_batch(args.limit, args.concurrency)
+        return
+
+    run_loop(
+        args.limit,
+        args.concurrency,
+        args.interval,
+        args.idle_seconds,
+        threading.Event(),
+    )
+
+
+if __name__ == "__main__":
+    main()
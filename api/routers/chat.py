@@ -71,9 +71,17 @@ def review_stream(
     """
 
     submission = submission_crud.get_submission(db, submission_id)
+
+    if not submission:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Submission not found",
+        )
+
     problem = problem_crud.get_problem(db, submission.problem_id)
+    statuses = submission_crud.summarize_status(db, submission)
 
     return StreamingResponse(
-        chat_crud.chat_stream(db, problem, submission),
+        chat_crud.chat_stream(db, problem, submission, statuses),
         media_type="application/json",
     )
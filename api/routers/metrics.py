@@ -0,0 +1,84 @@
+import hmac
+import ipaddress
+import logging
+
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import PlainTextResponse
+
+from api.core import metrics, pool
+from api.core.config import METRICS_ALLOW_IPS, METRICS_TOKEN
+from api.schemas import metrics as metrics_schema
+
+logger = logging.getLogger(__name__)
+
+Network = ipaddress.IPv4Network | ipaddress.IPv6Network
+
+
+def parse_networks(items: list[str]) -> list[Network]:
+    """アドレスかネットワークの一覧を読む。読めないものはログに残して無視する。"""
+    networks = []
+    for item in items:
+        try:
+            networks.append(ipaddress.ip_network(item, strict=False))
+        except ValueError:
+            logger.warning("Ignoring invalid METRICS_ALLOW_IPS entry: %r", item)
+    return networks
+
+
+# リクエストごとに読まないよう、起動時に1回だけ読む
+ALLOWED_NETWORKS = parse_networks(METRICS_ALLOW_IPS)
+
+
+def _allowed_address(host: str | None) -> bool:
+    try:
+        address = ipaddress.ip_address(host or "")
+    except ValueError:
+        return False
+    return any(address in network for network in ALLOWED_NETWORKS)
+
+
+def require_metrics_access(request: Request):
+    """
+    メトリクスにはルートや内部の Judge0 の URL が含まれるので、METRICS_TOKEN か
+    METRICS_ALLOW_IPS で許可したクライアントにだけ返す。それ以外には存在を知らせない。
+    """
+    authorization = request.headers.get("Authorization", "")
+    scheme, _, token = authorization.partition(" ")
+    if (
+        METRICS_TOKEN
+        and scheme.lower() == "bearer"
+        and hmac.compare_digest(token.encode(), METRICS_TOKEN.encode())
+    ):
+        return
+    if _allowed_address(request.client.host if request.client else None):
+        return
+    raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+
+
+router = APIRouter(dependencies=[Depends(require_metrics_access)])
+
+# Prometheus のテキスト形式
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+@router.get("/metrics", tags=["metrics"], response_class=PlainTextResponse)
+def metrics_text() -> PlainTextResponse:
+    """
+    Prometheus のテキスト形式でメトリクスを返す。
+    値はこのリクエストを受けたワーカーのプロセスのもの。
+    """
+    pool.update_metrics()
+    return PlainTextResponse(metrics.registry.render(), media_type=CONTENT_TYPE)
+
+
+@router.get(
+    "/metrics/pool",
+    tags=["metrics"],
+    response_model=list[metrics_schema.PoolStatus],
+)
+def pool_status() -> list[metrics_schema.PoolStatus]:
+    """
+    データベースのコネクションプールの状態を返す。
+    使用中の接続数が size + max_overflow に近づいていたり、timeouts が増えていたりすれば、プールが足りていない。
+    """
+    return [metrics_schema.PoolStatus(**status) for status in pool.status()]
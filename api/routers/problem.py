@@ -1,11 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+import tempfile
+
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, status
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 
 from api import database
-from api.core.config import ADMIN_USERNAME
+from api.core.config import (
+    ADMIN_USERNAME,
+    ARCHIVE_MEMBER_MAX_BYTES,
+    TESTCASE_BULK_MAX_BYTES,
+)
 from api.core.security import get_current_active_user
 from api.crud import problem as problem_crud
-from api.crud import user as user_crud
+from api.crud import problem_set as problem_set_crud
+from api.crud.aio import problem as async_problem_crud
 from api.schemas import problem as problem_schema
+from api.utils import archive
 
 router = APIRouter()
 
@@ -15,11 +25,13 @@ router = APIRouter()
     tags=["category"],
     response_model=list[problem_schema.Category],
 )
-def category_list(db=Depends(database.get_db)) -> list[problem_schema.Category]:
+async def category_list(
+    db=Depends(database.get_async_read_db),
+) -> list[problem_schema.Category]:
     """
     カテゴリーの一覧を取得する。
     """
-    return problem_crud.get_category_list(db)
+    return await async_problem_crud.get_category_list(db)
 
 
 @router.post(
@@ -41,7 +53,7 @@ def create_category(
     カテゴリーを作成する。
     🚨**管理者ログインが必須**
     """
-    if user != user_crud.get_user_by_username(db, ADMIN_USERNAME):
+    if user.username != ADMIN_USERNAME:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN, detail="Permission denied"
         )
@@ -60,18 +72,102 @@ def create_category(
     )
 
 
+@router.get(
+    "/category/{category_path_id}/export",
+    tags=["category"],
+    response_class=StreamingResponse,
+    responses={
+        status.HTTP_200_OK: {"content": {"application/gzip": {}}},
+        status.HTTP_401_UNAUTHORIZED: {"description": "Unauthorized"},
+        status.HTTP_403_FORBIDDEN: {"description": "Permission denied"},
+        status.HTTP_404_NOT_FOUND: {"description": "Category not found"},
+    },
+)
+def export_category(
+    category_path_id: str,
+    user=Depends(get_current_active_user),
+    db=Depends(database.get_db),
+) -> StreamingResponse:
+    """
+    カテゴリーとその問題・テストケースを tar.gz で書き出す。
+    🚨**管理者ログインが必須**
+    """
+    if user.username != ADMIN_USERNAME:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, detail="Permission denied"
+        )
+
+    # 大きくなったらディスクに書き出す一時ファイルに作ってから、少しずつ送る
+    buffer = tempfile.SpooledTemporaryFile(max_size=16 * 1024 * 1024)
+    problem_set_crud.export_category(db, category_path_id, buffer)
+    buffer.seek(0)
+
+    return StreamingResponse(
+        iter(lambda: buffer.read(64 * 1024), b""),
+        media_type="application/gzip",
+        headers={
+            "Content-Disposition": f'attachment; filename="{category_path_id}.tar.gz"'
+        },
+        background=BackgroundTask(buffer.close),
+    )
+
+
+@router.post(
+    "/category/import",
+    tags=["category"],
+    response_model=problem_schema.CategoryImportResponse,
+    responses={
+        status.HTTP_400_BAD_REQUEST: {"description": "Invalid archive"},
+        status.HTTP_401_UNAUTHORIZED: {"description": "Unauthorized"},
+        status.HTTP_403_FORBIDDEN: {"description": "Permission denied"},
+    },
+)
+def import_category(
+    file: UploadFile,
+    user=Depends(get_current_active_user),
+    db=Depends(database.get_db),
+) -> problem_schema.CategoryImportResponse:
+    """
+    /category/{category_path_id}/export で書き出したアーカイブを読み込む。
+    path_id や名前が同じものは上書きする。
+    🚨**管理者ログインが必須**
+    """
+    if user.username != ADMIN_USERNAME:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, detail="Permission denied"
+        )
+
+    try:
+        result = problem_set_crud.import_category(db, file.file)
+    except archive.ArchiveError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    category = result.pop("category")
+    return problem_schema.CategoryImportResponse(
+        status="success",
+        message="Category imported successfully",
+        category=problem_schema.Category(
+            id=category.id,
+            path_id=category.path_id,
+            title=category.title,
+            description=category.description,
+        ),
+        **result,
+    )
+
+
 @router.get(
     "/problem_list",
     tags=["problem"],
     response_model=list[problem_schema.CategoryDetail],
 )
-def all_problem_list(
-    db=Depends(database.get_db),
+async def all_problem_list(
+    db=Depends(database.get_async_read_db),
 ) -> list[problem_schema.CategoryDetail]:
     """
     問題の一覧を取得する。
     """
-    categories = problem_crud.get_category_list(db)
+    categories = await async_problem_crud.get_category_list(db)
 
     return [
         problem_schema.CategoryDetail(
@@ -90,7 +186,7 @@ def all_problem_list(
                 for (
                     problem,
                     ac_count,
-                ) in problem_crud.get_problem_list_with_ac_submissions(
+                ) in await async_problem_crud.get_problem_list_with_ac_submissions(
                     db, category.path_id
                 )
             ],
@@ -105,13 +201,15 @@ def all_problem_list(
     response_model=list[problem_schema.ProblemSummary],
     responses={status.HTTP_404_NOT_FOUND: {"description": "Category not found"}},
 )
-def problem_list(
-    category_path_id: str, db=Depends(database.get_db)
+async def problem_list(
+    category_path_id: str, db=Depends(database.get_async_read_db)
 ) -> list[problem_schema.ProblemSummary]:
     """
     カテゴリ内の問題の一覧を取得する。
     """
-    problems = problem_crud.get_problem_list_with_ac_submissions(db, category_path_id)
+    problems = await async_problem_crud.get_problem_list_with_ac_submissions(
+        db, category_path_id
+    )
 
     return [
         problem_schema.ProblemSummary(
@@ -143,7 +241,7 @@ def create_problem(
     問題を作成する。
     🚨**管理者ログインが必須**
     """
-    if user != user_crud.get_user_by_username(db, ADMIN_USERNAME):
+    if user.username != ADMIN_USERNAME:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN, detail="Permission denied"
         )
@@ -171,13 +269,15 @@ def create_problem(
     tags=["problem"],
     response_model=problem_schema.Problem,
 )
-def problem(
-    category_path_id: str, problem_path_id: str, db=Depends(database.get_db)
+async def problem(
+    category_path_id: str,
+    problem_path_id: str,
+    db=Depends(database.get_async_read_db),
 ) -> problem_schema.Problem:
     """
     問題の詳細を取得する。
     """
-    problem, ac_count = problem_crud.get_problem_with_submission_count(
+    problem, ac_count = await async_problem_crud.get_problem_with_submission_count(
         db, category_path_id, problem_path_id
     )
 
@@ -217,7 +317,7 @@ def testcase_list(
     問題のテストケース一覧を取得する。
     🚨**管理者ログインが必須**
     """
-    if user != user_crud.get_user_by_username(db, ADMIN_USERNAME):
+    if user.username != ADMIN_USERNAME:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN, detail="Permission denied"
         )
@@ -226,16 +326,20 @@ def testcase_list(
         db, category_path_id, problem_path_id
     )
 
-    return [
-        problem_schema.Testcase(
-            id=testcase.id,
-            problem_id=testcase.problem_id,
-            name=testcase.name,
-            input=testcase.input,
-            output=testcase.output,
+    result = []
+    for testcase in testcases:
+        input_data, output_data = problem_crud.get_testcase_payload(db, testcase)
+        result.append(
+            problem_schema.Testcase(
+                id=testcase.id,
+                problem_id=testcase.problem_id,
+                name=testcase.name,
+                input=input_data.decode(),
+                output=output_data.decode(),
+            )
         )
-        for testcase in testcases
-    ]
+
+    return result
 
 
 @router.post(
@@ -256,7 +360,7 @@ def create_testcase(
     テストケースを作成する。
     🚨**管理者ログインが必須**
     """
-    if user != user_crud.get_user_by_username(db, ADMIN_USERNAME):
+    if user.username != ADMIN_USERNAME:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN, detail="Permission denied"
         )
@@ -270,7 +374,62 @@ def create_testcase(
             id=created.id,
             problem_id=created.problem_id,
             name=created.name,
-            input=created.input,
-            output=created.output,
+            input=testcase.input,
+            output=testcase.output,
         ),
     )
+
+
+@router.post(
+    "/problem/{category_path_id}/{problem_path_id}/testcases/bulk",
+    tags=["testcase"],
+    response_model=problem_schema.TestcaseBulkCreateResponse,
+    responses={
+        status.HTTP_400_BAD_REQUEST: {"description": "Invalid archive"},
+        status.HTTP_401_UNAUTHORIZED: {"description": "Unauthorized"},
+        status.HTTP_403_FORBIDDEN: {"description": "Permission denied"},
+        status.HTTP_404_NOT_FOUND: {"description": "Problem not found"},
+    },
+)
+def create_testcase_bulk(
+    category_path_id: str,
+    problem_path_id: str,
+    file: UploadFile,
+    user=Depends(get_current_active_user),
+    db=Depends(database.get_db),
+) -> problem_schema.TestcaseBulkCreateResponse:
+    """
+    zip または tar のアーカイブからテストケースをまとめて作成する。
+    `01.in` / `01.out` の形式と `in/01.txt` / `out/01.txt` の形式に対応し、
+    同じ名前のテストケースは上書きする。
+    🚨**管理者ログインが必須**
+    """
+    if user.username != ADMIN_USERNAME:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, detail="Permission denied"
+        )
+
+    problem = problem_crud.get_problem_by_path_id(db, category_path_id, problem_path_id)
+    if not problem:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Problem not found"
+        )
+
+    try:
+        created, updated = problem_crud.create_testcase_bulk(
+            db,
+            problem,
+            archive.iter_testcase_files(
+                file.file, TESTCASE_BULK_MAX_BYTES, ARCHIVE_MEMBER_MAX_BYTES
+            ),
+        )
+    except archive.ArchiveError as e:
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    return problem_schema.TestcaseBulkCreateResponse(
+        status="success",
+        message="Testcases uploaded successfully",
+        created=[problem_schema.TestcaseSummary(**testcase) for testcase in created],
+        updated=[problem_schema.TestcaseSummary(**testcase) for testcase in updated],
+    )
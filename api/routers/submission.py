@@ -1,12 +1,29 @@
-from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status
+import asyncio
+import hmac
+import uuid
+from typing import Literal
+
+from fastapi import (
+    APIRouter,
+    Body,
+    Depends,
+    HTTPException,
+    Response,
+    status,
+)
+from fastapi.responses import FileResponse
 
 from api import database
+from api.core import metrics, run_lane, scheduler, tracing
+from api.core.config import JUDGE_PRIORITY_MAX_TESTCASES, JUDGE_RUN_WAIT_TIMEOUT
 from api.core.security import get_current_active_user
-from api.crud import problem as problem_crud
 from api.crud import submission as submission_crud
-from api.crud import user as user_crud
+from api.crud.aio import problem as async_problem_crud
+from api.crud.aio import submission as async_submission_crud
+from api.crud.aio import user as async_user_crud
 from api.models import user as user_model
 from api.schemas import submission as problem_schema
+from api.utils import run_output
 
 router = APIRouter()
 
@@ -20,17 +37,17 @@ router = APIRouter()
         status.HTTP_404_NOT_FOUND: {"description": "Problem not found"},
     },
 )
-def submission_list(
+async def submission_list(
     category_path_id: str,
     problem_path_id: str,
     user: user_model.User = Depends(get_current_active_user),
-    db=Depends(database.get_db),
+    db=Depends(database.get_async_read_db),
 ) -> list[problem_schema.SubmissionSummary]:
     """\
     当ユーザーが出した提出一覧を返す。
     ❗**一般ユーザーログインが必須**
     """
-    submissions = submission_crud.get_submission_summary_list(
+    submissions = await async_submission_crud.get_submission_summary_list(
         db, category_path_id, problem_path_id, user
     )
 
@@ -56,32 +73,39 @@ def submission_list(
         status.HTTP_400_BAD_REQUEST: {"description": "Invalid language"},
     },
 )
-def submit(
+async def submit(
     category_path_id: str,
     problem_path_id: str,
     submission: problem_schema.SubmissionCreate,
-    background_tasks: BackgroundTasks,
     user: user_model.User = Depends(get_current_active_user),
-    db=Depends(database.get_db),
+    db=Depends(database.get_async_db),
+    session_factory=Depends(database.get_sessionmaker),
 ) -> problem_schema.Submission:
     """\
     問題に対してコードを提出する。
     ❗**一般ユーザーログインが必須**
     """
-    submission_crud.get_current_submission(db, user)
-    current_submission = submission_crud.get_current_submission(db, user)
-
-    # if current_submission and submission_crud.is_judging(db, current_submission):
-    #     raise HTTPException(
-    #         status_code=status.HTTP_400_BAD_REQUEST,
-    #         detail="Submission is being judged",
-    #     )
-
-    db_submission = submission_crud.create_submission(
+    db_submission = await async_submission_crud.create_submission(
         db, submission, category_path_id, problem_path_id, user
     )
 
-    background_tasks.add_task(submission_crud.judge_submission, db, db_submission)
+    # ジャッジは同期版の crud で、スケジューラーのスレッドの上で行う。
+    # テストケースの少ない問題は優先して実行する
+    testcases = len(
+        await async_problem_crud.get_testcase_id_list(db, db_submission.problem_id)
+    )
+    metrics.judge_queue_depth.inc()
+    scheduler.get_scheduler().submit(
+        db_submission.id,
+        user.id,
+        db_submission.problem_id,
+        submission_crud.judge_submission_by_id,
+        session_factory,
+        db_submission.id,
+        tracing.current(),
+        cost=testcases,
+        priority=testcases <= JUDGE_PRIORITY_MAX_TESTCASES,
+    )
 
     return problem_schema.SubmissionCreateResponse(
         id=db_submission.id,
@@ -99,8 +123,8 @@ def submit(
         status.HTTP_404_NOT_FOUND: {"description": "Submission not found"},
     },
 )
-def submission(
-    db=Depends(database.get_db),
+async def submission(
+    db=Depends(database.get_async_read_db),
     submission_id: str = None,
     user: user_model.User = Depends(get_current_active_user),
 ) -> problem_schema.Submission:
@@ -108,12 +132,16 @@ def submission(
     提出の詳細を返す。
     ❗**一般ユーザーログインが必須**
     """
-    submission = submission_crud.get_submission(db, submission_id)
+    submission = await async_submission_crud.get_submission(db, submission_id)
     if not submission:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Submission not found"
         )
-    curr_user = user_crud.get_user(db, submission.user_id)
+    curr_user = await async_user_crud.get_user(db, submission.user_id)
+    details = await async_submission_crud.get_submission_detail_list(db, submission)
+    testcase_names = await async_problem_crud.get_testcase_names(
+        db, [detail.testcase_id for detail in details]
+    )
 
     return problem_schema.Submission(
         id=submission.id,
@@ -121,20 +149,73 @@ def submission(
         username=curr_user.username,
         language=submission.language,
         code=submission.code,
-        statuses=submission_crud.summarize_status(db, submission),
+        statuses=submission_crud.tally_status(
+            await async_problem_crud.get_testcase_id_list(db, submission.problem_id),
+            details,
+        ),
         details=[
             problem_schema.SubmissionDetail(
                 id=detail.id,
-                testcase_name=problem_crud.get_testcase(db, detail.testcase_id).name,
+                testcase_name=testcase_names[detail.testcase_id],
                 status=detail.status,
                 time=detail.time,
                 memory=detail.memory,
             )
-            for detail in submission_crud.get_submission_detail_list(db, submission)
+            for detail in details
         ],
     )
 
 
+@router.get(
+    "/submission/{submission_id}/queue",
+    tags=["submission"],
+    response_model=problem_schema.QueueStatus,
+    responses={
+        status.HTTP_401_UNAUTHORIZED: {"description": "Unauthorized"},
+        status.HTTP_404_NOT_FOUND: {"description": "Submission not found"},
+    },
+)
+async def submission_queue(
+    submission_id: uuid.UUID,
+    db=Depends(database.get_async_read_db),
+    user: user_model.User = Depends(get_current_active_user),
+) -> problem_schema.QueueStatus:
+    """\
+    提出のジャッジの待ち順と、始まるまでの見込みの時間を返す。
+    待ち行列はサーバーのプロセスごとにあるので、他のプロセスで受け付けた提出は unknown になる。
+    ❗**一般ユーザーログインが必須**
+    """
+    job = scheduler.get_scheduler().status(submission_id)
+    if job is not None:
+        return problem_schema.QueueStatus(
+            state=job.state,
+            position=job.position,
+            estimated_wait=job.estimated_wait,
+        )
+
+    submission = await async_submission_crud.get_submission(db, submission_id)
+    if not submission:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Submission not found"
+        )
+    statuses = await async_submission_crud.summarize_status(db, submission)
+    return problem_schema.QueueStatus(
+        state="unknown" if statuses.get("WJ") else "finished"
+    )
+
+
+def _submit_run(user: user_model.User, runcode: problem_schema.RunCode):
+    run_id = database.generate_id()
+    try:
+        return run_lane.get_run_lane().submit(
+            user.id, submission_crud.run_submission, runcode, run_id, run_id=run_id
+        )
+    except run_lane.RunLimitExceeded as e:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail=str(e)
+        )
+
+
 @router.post(
     "/run",
     tags=["submission"],
@@ -142,19 +223,163 @@ def submission(
     responses={
         status.HTTP_401_UNAUTHORIZED: {"description": "Unauthorized"},
         status.HTTP_400_BAD_REQUEST: {"description": "Invalid language"},
+        status.HTTP_429_TOO_MANY_REQUESTS: {"description": "Too many runs"},
+        status.HTTP_504_GATEWAY_TIMEOUT: {"description": "Run did not finish"},
     },
 )
-def run_code(
+async def run_code(
     runcode: problem_schema.RunCode,
     user: user_model.User = Depends(get_current_active_user),
 ) -> problem_schema.RunCodeResponse:
     """\
     コードを実行する。
+    JUDGE_RUN_WAIT_TIMEOUT 秒で終わらなければ 504 を返す（結果は GET /run/{run_id} で取り出せる）。
     ❗**一般ユーザーログインが必須**
     """
-    stdout, stderr = submission_crud.run_submission(runcode)
+    # 提出のジャッジとは別のレーンで実行し、待つ間もスレッドプールのスレッドを使わない
+    run = _submit_run(user, runcode)
+    try:
+        stdout, stderr = await asyncio.wait_for(
+            asyncio.shield(asyncio.wrap_future(run.future)), JUDGE_RUN_WAIT_TIMEOUT
+        )
+    except asyncio.TimeoutError:
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail=f"Run did not finish in time (id: {run.id})",
+        )
 
     return problem_schema.RunCodeResponse(
-        stdout=stdout,
-        stderr=stderr,
+        id=run.id,
+        stdout=stdout.text,
+        stderr=stderr.text,
+        stdout_truncated=stdout.truncated,
+        stderr_truncated=stderr.truncated,
+    )
+
+
+@router.post(
+    "/run/async",
+    tags=["submission"],
+    response_model=problem_schema.RunCreateResponse,
+    responses={
+        status.HTTP_401_UNAUTHORIZED: {"description": "Unauthorized"},
+        status.HTTP_400_BAD_REQUEST: {"description": "Invalid language"},
+        status.HTTP_429_TOO_MANY_REQUESTS: {"description": "Too many runs"},
+    },
+)
+def run_code_async(
+    runcode: problem_schema.RunCode,
+    user: user_model.User = Depends(get_current_active_user),
+) -> problem_schema.RunCreateResponse:
+    """\
+    コードの実行を始め、結果を待たずに run_id を返す。結果は GET /run/{run_id} で取り出す。
+    ❗**一般ユーザーログインが必須**
+    """
+    if runcode.language not in submission_crud.language_dict:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid language",
+        )
+
+    return problem_schema.RunCreateResponse(id=_submit_run(user, runcode).id)
+
+
+@router.get(
+    "/run/{run_id}",
+    tags=["submission"],
+    response_model=problem_schema.RunStatus,
+    responses={
+        status.HTTP_401_UNAUTHORIZED: {"description": "Unauthorized"},
+        status.HTTP_404_NOT_FOUND: {"description": "Run not found"},
+    },
+)
+def run_status(
+    run_id: uuid.UUID,
+    user: user_model.User = Depends(get_current_active_user),
+) -> problem_schema.RunStatus:
+    """\
+    POST /run/async で始めた実行の状態を返す。終わっていれば stdout と stderr も返す。
+    ❗**一般ユーザーログインが必須**
+    """
+    run = run_lane.get_run_lane().get(run_id)
+    if run is None or run.user_id != user.id:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Run not found"
+        )
+
+    if run.state != "finished":
+        return problem_schema.RunStatus(id=run.id, state=run.state)
+    if run.future.exception() is not None:
+        return problem_schema.RunStatus(
+            id=run.id, state=run.state, stdout="", stderr="[Error] Internal Error"
+        )
+
+    stdout, stderr = run.future.result()
+    return problem_schema.RunStatus(
+        id=run.id,
+        state=run.state,
+        stdout=stdout.text,
+        stderr=stderr.text,
+        stdout_truncated=stdout.truncated,
+        stderr_truncated=stderr.truncated,
     )
+
+
+@router.get(
+    "/run/{run_id}/output/{stream}",
+    tags=["submission"],
+    response_class=FileResponse,
+    responses={
+        status.HTTP_401_UNAUTHORIZED: {"description": "Unauthorized"},
+        status.HTTP_404_NOT_FOUND: {"description": "Output not found"},
+    },
+)
+def download_run_output(
+    run_id: uuid.UUID,
+    stream: Literal["stdout", "stderr"],
+    user: user_model.User = Depends(get_current_active_user),
+) -> FileResponse:
+    """\
+    切り詰められた実行結果（stdout_truncated / stderr_truncated）の全体をダウンロードする。
+    出力はファイルから少しずつ送るので、大きくてもサーバーのメモリには載せない。
+    ❗**一般ユーザーログインが必須**
+    """
+    run = run_lane.get_run_lane().get(run_id)
+    path = run_output.get_store().find(run_id, stream)
+    if run is None or run.user_id != user.id or path is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Output not found"
+        )
+
+    return FileResponse(
+        path,
+        media_type="text/plain; charset=utf-8",
+        filename=f"{run_id}.{stream}.txt",
+    )
+
+
+@router.api_route(
+    "/judge0/callback/{submission_id}/{testcase_id}",
+    methods=["PUT", "POST"],
+    status_code=status.HTTP_204_NO_CONTENT,
+    include_in_schema=False,
+)
+def judge0_callback(
+    submission_id: uuid.UUID,
+    testcase_id: uuid.UUID,
+    signature: str,
+    result: dict = Body(...),
+    db=Depends(database.get_db),
+) -> Response:
+    """\
+    Judge0 からテストケースの結果を受け取る（JUDGE_CALLBACK_URL を設定したとき）。
+    URL の署名が合わなければ 403 を返す。
+    """
+    expected = submission_crud.callback_signature(submission_id, testcase_id)
+    if not hmac.compare_digest(signature, expected):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, detail="Invalid signature"
+        )
+
+    submission_crud.receive_judgement(db, submission_id, testcase_id, result)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
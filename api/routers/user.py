@@ -16,7 +16,7 @@ from api.core.security import (
     get_current_user,
     oauth2_scheme,
 )
-from api.crud import user as user_crud
+from api.crud.aio import user as user_crud
 from api.models import user as user_model
 from api.schemas import user as user_schema
 
@@ -32,14 +32,14 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
     response_model=list[user_schema.User],
     responses={status.HTTP_401_UNAUTHORIZED: {"description": "Unauthorized"}},
 )
-def user_list(
-    user=Depends(get_current_active_user), db=Depends(database.get_db)
+async def user_list(
+    user=Depends(get_current_active_user), db=Depends(database.get_async_read_db)
 ) -> list[user_schema.User]:
     """
     現在登録しているユーザーの一覧を取得する。
     ❗**一般ユーザーログインが必須**
     """
-    return user_crud.get_user_list(db)
+    return await user_crud.get_user_list(db)
 
 
 # ユーザー情報を返す
@@ -48,14 +48,16 @@ def user_list(
     tags=["user"],
     response_model=user_schema.UserFoundMessage,
 )
-def user_detail(
-    username: str, db=Depends(database.get_db), user=Depends(get_current_active_user)
+async def user_detail(
+    username: str,
+    db=Depends(database.get_async_read_db),
+    user=Depends(get_current_active_user),
 ) -> user_schema.UserFoundMessage:
     """
     ユーザーの詳細情報を取得する。
     ❗**一般ユーザーログインが必須**
     """
-    got_user = user_crud.get_user_by_username(db, username)
+    got_user = await user_crud.get_user_by_username(db, username)
 
     return user_schema.UserFoundMessage(
         status="success",
@@ -70,7 +72,7 @@ def user_detail(
     tags=["user"],
     response_model=user_schema.UserFoundMessage,
 )
-def my_user_detail(
+async def my_user_detail(
     user: user_model.User = Depends(get_current_active_user),
 ) -> user_schema.UserFoundMessage:
     """
@@ -90,21 +92,21 @@ def my_user_detail(
     tags=["user"],
     response_model=user_schema.IsAuthenticated,
 )
-def is_authenticated(
-    request: Request, db=Depends(database.get_db)
+async def is_authenticated(
+    request: Request, db=Depends(database.get_async_db)
 ) -> user_schema.IsAuthenticated:
     """
     ユーザーが認証済みかどうかを返す。
     """
     try:
         # トークンを取得
-        token = oauth2_scheme(request, db)
+        token = await oauth2_scheme(request, db)
 
         # トークンからユーザーを取得
         current_user = get_current_user(token)
 
         # アクティブなユーザーか確認
-        user = get_current_active_user(current_user, db)
+        user = await get_current_active_user(current_user, db)
         if not user:
             return user_schema.IsAuthenticated(is_authenticated=False)
     except ValueError:
@@ -125,13 +127,13 @@ def is_authenticated(
     response_model=user_schema.UserCreateResponse,
     responses={status.HTTP_400_BAD_REQUEST: {"description": "User already exists"}},
 )
-def signup(
-    model: user_schema.UserCreate, db=Depends(database.get_db)
+async def signup(
+    model: user_schema.UserCreate, db=Depends(database.get_async_db)
 ) -> user_schema.UserCreateResponse:
     """
     新規のユーザーを登録する。
     """
-    created = user_crud.create_user(db, user=model)
+    created = await user_crud.create_user(db, user=model)
 
     return user_schema.UserCreateResponse(
         status="success",
@@ -149,15 +151,15 @@ def signup(
         status.HTTP_401_UNAUTHORIZED: {"description": "Incorrect username or password"}
     },
 )
-def login_for_access_token(
+async def login_for_access_token(
     response: Response,
     form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
-    db=Depends(database.get_db),
+    db=Depends(database.get_async_db),
 ) -> user_schema.Message:
     """
     ユーザー名とパスワードを受け取り、セッションIDを生成する。
     """
-    user = authenticate_user(db, form_data.username, form_data.password)
+    user = await authenticate_user(db, form_data.username, form_data.password)
 
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
 
@@ -165,7 +167,7 @@ def login_for_access_token(
         data={"sub": user.username}, expires_delta=access_token_expires
     )
 
-    session_id = create_session(db, access_token)
+    session_id = await create_session(db, access_token)
 
     response.set_cookie(
         key="session",
@@ -180,15 +182,15 @@ def login_for_access_token(
 
 
 @router.post("/logout", tags=["user"], response_model=user_schema.Message)
-def logout(
-    request: Request, response: Response, db=Depends(database.get_db)
+async def logout(
+    request: Request, response: Response, db=Depends(database.get_async_db)
 ) -> user_schema.Message:
     """
     ログアウトする。
     """
     session_id = request.cookies.get("session")
     if session_id:
-        delete_session(db, session_id)
+        await delete_session(db, session_id)
 
     response.delete_cookie("session")
     return user_schema.Message(status="success", message="Logout successful")
@@ -0,0 +1,18 @@
+from pydantic import BaseModel, Field
+
+
+class PoolStatus(BaseModel):
+    name: str = Field(..., example="primary", description="Engine Name")
+    size: int = Field(..., example=20, description="Pool Size")
+    checked_in: int = Field(..., example=18, description="Idle Connections")
+    checked_out: int = Field(..., example=2, description="Connections In Use")
+    overflow: int = Field(..., example=0, description="Overflow Connections")
+    max_overflow: int = Field(..., example=10, description="Max Overflow")
+    checkouts: int = Field(..., example=1024, description="Total Checkouts")
+    timeouts: int = Field(..., example=0, description="Checkout Timeouts")
+    wait_seconds_total: float = Field(
+        ..., example=0.52, description="Total Checkout Latency (sec)"
+    )
+    wait_seconds_max: float = Field(
+        ..., example=0.03, description="Max Checkout Latency (sec)"
+    )
@@ -118,3 +118,55 @@ class TestcaseCreateResponse(BaseModel):
         ..., example="Testcase created successfully", description="Message"
     )
     testcase: Testcase | None = Field(default=None, description="Testcase information")
+
+
+class TestcaseSummary(BaseModel):
+    id: uuid.UUID = Field(..., description="Testcase ID")
+    name: str = Field(..., example="00_testcase_01.txt", description="Testcase Name")
+    input_size: int = Field(..., example=3, description="Input Size (bytes)")
+    output_size: int = Field(..., example=3, description="Output Size (bytes)")
+
+
+class TestcaseBulkCreateResponse(BaseModel):
+    status: Literal["success", "failed"] = Field(
+        ..., example="success", description="Status"
+    )
+    message: str = Field(
+        ..., example="Testcases uploaded successfully", description="Message"
+    )
+    created: list[TestcaseSummary] = Field(..., description="Created testcases")
+    updated: list[TestcaseSummary] = Field(..., description="Updated testcases")
+
+
+class CategoryArchive(BaseModel):
+    """カテゴリーのアーカイブの category.json"""
+
+    format: int = Field(..., example=1, description="Archive Format Version")
+    path_id: str = Field(..., max_length=30, description="Category Path ID")
+    title: str = Field(..., max_length=50, description="Category Title")
+    description: str | None = Field(default=None, description="Category Description")
+
+
+class ProblemArchive(BaseModel):
+    """カテゴリーのアーカイブの problems/<path_id>/problem.json"""
+
+    path_id: str = Field(..., max_length=30, description="Problem Path ID")
+    title: str = Field(..., max_length=50, description="Problem Title")
+    statement: str = Field(..., description="Problem Statement")
+    level: int = Field(default=1, description="Level")
+    time_limit: float | None = Field(default=2.0, description="Time Limit")
+    memory_limit: int | None = Field(default=256, description="Memory Limit")
+
+
+class CategoryImportResponse(BaseModel):
+    status: Literal["success", "failed"] = Field(
+        ..., example="success", description="Status"
+    )
+    message: str = Field(
+        ..., example="Category imported successfully", description="Message"
+    )
+    category: Category = Field(..., description="Category information")
+    problems_created: int = Field(..., example=3, description="Created problems")
+    problems_updated: int = Field(..., example=0, description="Updated problems")
+    testcases_created: int = Field(..., example=30, description="Created testcases")
+    testcases_updated: int = Field(..., example=0, description="Updated testcases")
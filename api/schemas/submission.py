@@ -57,5 +57,43 @@ class RunCode(BaseModel):
 
 
 class RunCodeResponse(BaseModel):
+    id: uuid.UUID | None = Field(None, description="Run ID")
     stdout: str = Field(..., example="Hello, World!", description="Output(stdout)")
     stderr: str = Field(..., example="", description="Error Output(stderr)")
+    stdout_truncated: bool = Field(
+        False, description="Whether stdout is truncated (see /run/{id}/output/stdout)"
+    )
+    stderr_truncated: bool = Field(
+        False, description="Whether stderr is truncated (see /run/{id}/output/stderr)"
+    )
+
+
+class RunCreateResponse(BaseModel):
+    id: uuid.UUID = Field(..., description="Run ID")
+
+
+class RunStatus(BaseModel):
+    id: uuid.UUID = Field(..., description="Run ID")
+    state: Literal["queued", "running", "finished"] = Field(
+        ..., example="finished", description="State"
+    )
+    stdout: str | None = Field(
+        None, example="Hello, World!", description="Output(stdout)"
+    )
+    stderr: str | None = Field(None, example="", description="Error Output(stderr)")
+    stdout_truncated: bool = Field(False, description="Whether stdout is truncated")
+    stderr_truncated: bool = Field(False, description="Whether stderr is truncated")
+
+
+class QueueStatus(BaseModel):
+    state: Literal["queued", "running", "finished", "unknown"] = Field(
+        ...,
+        example="queued",
+        description="queued: 待ち / running: ジャッジ中 / finished: 終了 / unknown: このサーバーのキューに無いがジャッジは終わっていない",
+    )
+    position: int | None = Field(
+        None, example=3, description="先にジャッジされる提出の数"
+    )
+    estimated_wait: float | None = Field(
+        None, example=4.5, description="ジャッジが始まるまでの見込みの秒数"
+    )
@@ -0,0 +1,97 @@
+import tarfile
+import zipfile
+from collections.abc import Iterator
+from pathlib import PurePosixPath
+from typing import BinaryIO, Literal
+
+INPUT_SUFFIXES = {".in", ".input"}
+OUTPUT_SUFFIXES = {".out", ".output", ".ans"}
+INPUT_DIRS = {"in", "input"}
+OUTPUT_DIRS = {"out", "output"}
+
+
+class ArchiveError(ValueError):
+    pass
+
+
+class SizeLimit:
+    """展開後のサイズを数え、合計か1ファイルが上限を超えたら ArchiveError を送出する。"""
+
+    def __init__(self, max_bytes: int, max_member_bytes: int | None = None):
+        self.max_bytes = max_bytes
+        self.max_member_bytes = max_member_bytes
+        self.total = 0
+
+    def check(self, name: str, size: int):
+        if self.max_member_bytes is not None and size > self.max_member_bytes:
+            raise ArchiveError(
+                f"File is too large: {name} (over {self.max_member_bytes} bytes)"
+            )
+        self.total += size
+        if self.total > self.max_bytes:
+            raise ArchiveError(f"Archive is too large (over {self.max_bytes} bytes)")
+
+
+def classify(path: str) -> tuple[str, Literal["input", "output"]] | None:
+    """
+    アーカイブ内のパスから、テストケース名と入力・出力のどちらかを判定する。
+
+    - 01.in / 01.out のように拡張子で分ける形式
+    - in/01.txt / out/01.txt のようにディレクトリで分ける形式
+
+    のどちらにも対応する。どちらでもないファイルは None を返す。
+    """
+    path = PurePosixPath(path)
+    if any(part.startswith(".") or part == "__MACOSX" for part in path.parts):
+        return None
+
+    if path.suffix in INPUT_SUFFIXES:
+        return path.stem, "input"
+    if path.suffix in OUTPUT_SUFFIXES:
+        return path.stem, "output"
+
+    parents = {part.lower() for part in path.parts[:-1]}
+    if parents & INPUT_DIRS:
+        return path.name, "input"
+    if parents & OUTPUT_DIRS:
+        return path.name, "output"
+
+    return None
+
+
+def iter_testcase_files(
+    fileobj: BinaryIO, max_bytes: int, max_member_bytes: int | None = None
+) -> Iterator[tuple[str, Literal["input", "output"], bytes]]:
+    """
+    zip または tar（gzip などの圧縮も可）のアーカイブから、
+    (テストケース名, "input" / "output", 内容) を1ファイルずつ返す。
+
+    tar は先頭から順に読むだけなので、アーカイブ全体をメモリに載せない。
+    zip は末尾の目次を読むためにシークできるファイルが必要になる。
+    展開後の合計が max_bytes を、1ファイルが max_member_bytes を超えたら ArchiveError を送出する。
+    """
+    limit = SizeLimit(max_bytes, max_member_bytes)
+
+    if zipfile.is_zipfile(fileobj):
+        fileobj.seek(0)
+        try:
+            with zipfile.ZipFile(fileobj) as archive:
+                for info in archive.infolist():
+                    if info.is_dir() or (found := classify(info.filename)) is None:
+                        continue
+                    limit.check(info.filename, info.file_size)
+                    yield (*found, archive.read(info))
+        except zipfile.BadZipFile as e:
+            raise ArchiveError(f"Invalid archive: {e}") from e
+        return
+
+    fileobj.seek(0)
+    try:
+        with tarfile.open(fileobj=fileobj, mode="r|*") as archive:
+            for member in archive:
+                if not member.isfile() or (found := classify(member.name)) is None:
+                    continue
+                limit.check(member.name, member.size)
+                yield (*found, archive.extractfile(member).read())
+    except tarfile.TarError as e:
+        raise ArchiveError(f"Invalid archive: {e}") from e
@@ -0,0 +1,135 @@
+import gzip
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+
+from api.core.config import TESTCASE_BLOB_CODEC, TESTCASE_BLOB_DIR, TESTCASE_BLOB_STORE
+from api.models import problem as problem_model
+
+try:
+    import zstandard
+except ImportError:  # zstandard が無い環境では gzip を使う
+    zstandard = None
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def default_codec() -> str:
+    if TESTCASE_BLOB_CODEC == "zstd" and zstandard is None:
+        return "gzip"
+    return TESTCASE_BLOB_CODEC
+
+
+def compress(data: bytes, codec: str) -> bytes:
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=10).compress(data)
+    elif codec == "gzip":
+        return gzip.compress(data, compresslevel=6)
+    else:
+        return data
+
+
+def decompress(data: bytes, codec: str) -> bytes:
+    if codec == "zstd":
+        return zstandard.ZstdDecompressor().decompress(data)
+    elif codec == "gzip":
+        return gzip.decompress(data)
+    else:
+        return data
+
+
+class DatabaseBlobStore:
+    """testcase_blobs テーブルに保存する。コミットは呼び出し側で行う。"""
+
+    def put(self, db: Session, data: bytes) -> str:
+        digest = content_hash(data)
+
+        exists = db.execute(
+            select(problem_model.TestcaseBlob.hash).where(
+                problem_model.TestcaseBlob.hash == digest
+            )
+        ).first()
+        if exists:
+            return digest
+
+        codec = default_codec()
+        stmt = insert(problem_model.TestcaseBlob).values(
+            hash=digest, codec=codec, size=len(data), data=compress(data, codec)
+        )
+        # 同時に同じ内容が登録されても失敗しないようにする
+        dialect = db.get_bind().dialect.name
+        if dialect == "mysql":
+            stmt = stmt.prefix_with("IGNORE")
+        elif dialect == "sqlite":
+            stmt = stmt.prefix_with("OR IGNORE")
+
+        db.execute(stmt)
+        return digest
+
+    def get(self, db: Session, digest: str) -> bytes:
+        row = db.execute(
+            select(
+                problem_model.TestcaseBlob.codec, problem_model.TestcaseBlob.data
+            ).where(problem_model.TestcaseBlob.hash == digest)
+        ).first()
+        if row is None:
+            raise KeyError(digest)
+
+        return decompress(row.data, row.codec)
+
+
+class FileBlobStore:
+    """
+    ディレクトリに1ファイルずつ保存する。
+    ファイル名は <ハッシュの先頭2文字>/<ハッシュ>.<圧縮形式>。
+    """
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+
+    def _path(self, digest: str, codec: str) -> Path:
+        return self.root / digest[:2] / f"{digest}.{codec}"
+
+    def _find(self, digest: str) -> tuple[Path, str] | None:
+        for codec in ("zstd", "gzip", "raw"):
+            path = self._path(digest, codec)
+            if path.exists():
+                return path, codec
+        return None
+
+    def put(self, db: Session, data: bytes) -> str:
+        digest = content_hash(data)
+        if self._find(digest):
+            return digest
+
+        codec = default_codec()
+        path = self._path(digest, codec)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        # 書き込み途中のファイルを読まれないよう、一時ファイルに書いてから置き換える
+        fd, tmp = tempfile.mkstemp(dir=path.parent)
+        with os.fdopen(fd, "wb") as f:
+            f.write(compress(data, codec))
+        os.replace(tmp, path)
+
+        return digest
+
+    def get(self, db: Session, digest: str) -> bytes:
+        found = self._find(digest)
+        if found is None:
+            raise KeyError(digest)
+
+        path, codec = found
+        return decompress(path.read_bytes(), codec)
+
+
+def get_store() -> DatabaseBlobStore | FileBlobStore:
+    if TESTCASE_BLOB_STORE == "fs":
+        return FileBlobStore(TESTCASE_BLOB_DIR)
+    return DatabaseBlobStore()
@@ -0,0 +1,269 @@
+"""
+Judge0 の API のクライアント。
+
+結果の受け取り方を明示的に選ぶ。
+
+- 1件だけ実行するとき（/run）は、Judge0 が wait=true を受け付けるならそれを使う
+- 複数のテストケースは、バッチで提出し、トークンをまとめて指数バックオフ（ジッター付き）で
+  ポーリングする
+
+どちらも期限（deadline）を過ぎたら待つのをやめる。
+"""
+
+import base64
+import logging
+import random
+from time import monotonic, sleep
+from typing import Callable, Iterable, Iterator
+
+import requests
+from cachetools import TTLCache, cached
+from requests.adapters import HTTPAdapter
+
+from api.core import tracing
+from api.core.config import (
+    JUDGE_DEADLINE_MARGIN,
+    JUDGE_HTTP_POOL_SIZE,
+    JUDGE_POLL_INITIAL_INTERVAL,
+    JUDGE_POLL_MAX_INTERVAL,
+    JUDGE_READ_TIMEOUT,
+    JUDGE_WAIT,
+)
+
+logger = logging.getLogger(__name__)
+
+# 結果がまだ出ていないステータス（In Queue, Processing）
+PENDING_STATUSES = {1, 2}
+
+# /config_info が取れないときに仮定する設定（wait=true は使わない）
+DEFAULT_CONFIG = {
+    "enable_wait_result": False,
+    "enable_batched_submissions": True,
+    "max_submission_batch_size": 20,
+}
+
+# ジャッジに使う項目（stdout などの大きな項目は取らない）
+JUDGE_FIELDS = "token,status,time,memory"
+# 実行結果を返すときに使う項目
+RUN_FIELDS = "token,status,stdout,stderr,compile_output,message,time,memory,exit_code"
+
+CONNECT_TIMEOUT = 5.0
+
+
+class Judge0Timeout(TimeoutError):
+    """期限までに結果が出なかった。"""
+
+
+def build_request(
+    language_id: int,
+    source_code: bytes,
+    stdin: bytes = b"",
+    expected_output: bytes = b"",
+    cpu_time_limit: float | None = None,
+    memory_limit: int | None = None,
+    max_file_size: int | None = None,
+    callback_url: str | None = None,
+) -> dict:
+    """提出の本文を作る。source_code などは base64 で送る。"""
+    request = {
+        "language_id": language_id,
+        "source_code": base64.b64encode(source_code).decode("ascii"),
+    }
+    if stdin:
+        request["stdin"] = base64.b64encode(stdin).decode("ascii")
+    if expected_output:
+        request["expected_output"] = base64.b64encode(expected_output).decode("ascii")
+    for key, value in (
+        ("cpu_time_limit", cpu_time_limit),
+        ("memory_limit", memory_limit),
+        ("max_file_size", max_file_size),
+        ("callback_url", callback_url),
+    ):
+        if value is not None:
+            request[key] = value
+    return request
+
+
+def deadline_for(time_limit: float, testcases: int = 1) -> float:
+    """結果を待つ期限（monotonic() の値）。全テストケースが順に実行されても間に合うようにする。"""
+    return monotonic() + time_limit * testcases + JUDGE_DEADLINE_MARGIN
+
+
+def is_finished(result: dict | None) -> bool:
+    return bool(result) and result.get("status", {}).get("id") not in PENDING_STATUSES
+
+
+def chunks(items: list, size: int) -> Iterator[list]:
+    for i in range(0, len(items), size):
+        yield items[i : i + size]
+
+
+@cached(TTLCache(maxsize=16, ttl=300))
+def _config_info(url: str) -> dict:
+    try:
+        response = requests.get(f"{url}/config_info", timeout=CONNECT_TIMEOUT)
+        response.raise_for_status()
+        return {**DEFAULT_CONFIG, **response.json()}
+    except (requests.RequestException, ValueError) as e:
+        logger.warning("Judge0 config_info is unavailable, using defaults: %s", e)
+        return DEFAULT_CONFIG
+
+
+def _create_session() -> requests.Session:
+    """接続を使い回す（keep-alive）セッション。同時に使うスレッドの数だけ接続を取っておく。"""
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=JUDGE_HTTP_POOL_SIZE, pool_maxsize=JUDGE_HTTP_POOL_SIZE
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+class Judge0Client:
+    def __init__(self, url: str, session: requests.Session | None = None):
+        self.url = url.rstrip("/")
+        self.session = session or _create_session()
+
+    @property
+    def config(self) -> dict:
+        return _config_info(self.url)
+
+    @property
+    def batch_size(self) -> int:
+        if not self.config["enable_batched_submissions"]:
+            return 1
+        return max(int(self.config["max_submission_batch_size"]), 1)
+
+    def supports_wait(self) -> bool:
+        if JUDGE_WAIT == "auto":
+            return bool(self.config["enable_wait_result"])
+        return JUDGE_WAIT == "true"
+
+    def _timeout(self, deadline: float | None) -> tuple[float, float]:
+        """期限があれば期限まで、無ければ JUDGE_READ_TIMEOUT 秒だけ応答を待つ。"""
+        if deadline is None:
+            return (CONNECT_TIMEOUT, JUDGE_READ_TIMEOUT)
+        return (CONNECT_TIMEOUT, max(deadline - monotonic(), 1.0))
+
+    def submit(
+        self,
+        request: dict,
+        wait: bool = False,
+        fields: str = RUN_FIELDS,
+        deadline: float | None = None,
+    ) -> dict:
+        response = self.session.post(
+            f"{self.url}/submissions/",
+            params={
+                "base64_encoded": "true",
+                "wait": str(wait).lower(),
+                "fields": fields,
+            },
+            json=request,
+            timeout=self._timeout(deadline),
+        )
+        response.raise_for_status()
+        return response.json()
+
+    def submit_batch(self, requests_: list[dict]) -> list[str | None]:
+        """まとめて提出し、トークンを返す。受け付けられなかった提出は None。"""
+        if self.batch_size == 1:
+            return [self.submit(request)["token"] for request in requests_]
+
+        response = self.session.post(
+            f"{self.url}/submissions/batch",
+            params={"base64_encoded": "true"},
+            json={"submissions": requests_},
+            timeout=self._timeout(None),
+        )
+        response.raise_for_status()
+        return [item.get("token") for item in response.json()]
+
+    def get_batch(
+        self,
+        tokens: list[str],
+        fields: str = JUDGE_FIELDS,
+        deadline: float | None = None,
+    ) -> list[dict]:
+        params = {"base64_encoded": "true", "fields": fields}
+        if self.batch_size == 1:
+            results = []
+            for token in tokens:
+                response = self.session.get(
+                    f"{self.url}/submissions/{token}",
+                    params=params,
+                    timeout=self._timeout(deadline),
+                )
+                response.raise_for_status()
+                results.append(response.json())
+            return results
+
+        response = self.session.get(
+            f"{self.url}/submissions/batch",
+            params={**params, "tokens": ",".join(tokens)},
+            timeout=self._timeout(deadline),
+        )
+        response.raise_for_status()
+        return response.json()["submissions"]
+
+    def poll(
+        self,
+        tokens: Iterable[str],
+        deadline: float,
+        on_result: Callable[[str, dict], None] | None = None,
+        fields: str = JUDGE_FIELDS,
+        on_round: Callable[[], None] | None = None,
+    ) -> dict[str, dict]:
+        """
+        結果が出るまでトークンをまとめてポーリングする。
+        間隔は JUDGE_POLL_INITIAL_INTERVAL から倍々に伸ばし（最大 JUDGE_POLL_MAX_INTERVAL）、
+        同時に待っている処理が揃って問い合わせないようにジッターを加える。
+        期限までに出た結果を返す。on_result は結果が出るたびに、on_round は問い合わせるたびに呼ぶ。
+        """
+        pending = list(dict.fromkeys(tokens))
+        results = {}
+        interval = JUDGE_POLL_INITIAL_INTERVAL
+
+        while pending:
+            remaining = deadline - monotonic()
+            if remaining <= 0:
+                break
+            sleep(min(interval / 2 + random.uniform(0, interval / 2), remaining))
+
+            with tracing.span("judge0.poll", kind="client", tokens=len(pending)):
+                for chunk in chunks(pending, self.batch_size):
+                    try:
+                        items = self.get_batch(chunk, fields, deadline)
+                    except (requests.RequestException, KeyError, ValueError) as e:
+                        # 一時的な失敗とみなして、次の回に問い合わせ直す
+                        logger.warning("Failed to poll Judge0: %s", e)
+                        continue
+
+                    for token, item in zip(chunk, items):
+                        if is_finished(item):
+                            results[token] = item
+                            if on_result:
+                                on_result(token, item)
+
+            pending = [token for token in pending if token not in results]
+            interval = min(interval * 2, JUDGE_POLL_MAX_INTERVAL)
+            if on_round:
+                on_round()
+
+        return results
+
+    def run(self, request: dict, deadline: float, fields: str = RUN_FIELDS) -> dict:
+        """1件実行して結果を返す。wait=true が使えればそれで待つ。"""
+        if self.supports_wait():
+            result = self.submit(request, wait=True, fields=fields, deadline=deadline)
+            if is_finished(result):
+                return result
+            token = result["token"]
+        else:
+            token = self.submit(request, fields="token", deadline=deadline)["token"]
+
+        results = self.poll([token], deadline, fields=fields)
+        if token not in results:
+            raise Judge0Timeout(f"Judge0 did not return the result of {token}")
+        return results[token]
@@ -0,0 +1,246 @@
+"""
+複数の Judge0 にジャッジを振り分ける。
+
+- 重み付きの最小未処理数（実行中のテストケース数 ÷ 重み が最も小さい Judge0 を選ぶ）
+- サーキットブレーカー（続けて失敗した Judge0 にはしばらく振り分けない。IE も失敗に数える）
+- ヘルスチェック（応答しない Judge0 を外す）
+- フェイルオーバー（提出に失敗したら、次の Judge0 で提出し直す）
+"""
+
+import logging
+import threading
+from functools import cache
+from time import monotonic, sleep
+from typing import Callable
+
+import requests
+
+from api.core import metrics
+from api.core.config import (
+    JUDGE_CIRCUIT_FAILURES,
+    JUDGE_CIRCUIT_RESET_SECONDS,
+    JUDGE_HEALTH_CHECK_INTERVAL,
+)
+from api.utils.judge0 import Judge0Client
+
+logger = logging.getLogger(__name__)
+
+# Judge0 側の不具合を表すステータス（Internal Error, Exec Format Error）
+FAILURE_STATUSES = {13, 14}
+
+HEALTH_CHECK_TIMEOUT = 2.0
+
+
+class NoJudgeBackend(Exception):
+    """振り分けられる Judge0 が無い。"""
+
+
+class Backend:
+    def __init__(self, url: str, weight: float = 1.0):
+        self.url = url
+        self.weight = weight
+        self.client = Judge0Client(url)
+        self.outstanding = 0
+        self.failures = 0
+        self.opened_at: float | None = None
+        self.healthy = True
+
+    def __repr__(self) -> str:
+        return f"Backend({self.url!r}, weight={self.weight})"
+
+    @property
+    def available(self) -> bool:
+        """振り分けてよいか。遮断してから一定時間経てば、試しに振り分ける（half-open）。"""
+        if not self.healthy:
+            return False
+        return (
+            self.opened_at is None
+            or monotonic() - self.opened_at >= JUDGE_CIRCUIT_RESET_SECONDS
+        )
+
+    @property
+    def load(self) -> float:
+        return (self.outstanding + 1) / self.weight
+
+
+def parse_urls(value: str) -> list[tuple[str, float]]:
+    """ "http://a:2358=2,http://b:2358" を [("http://a:2358", 2.0), ("http://b:2358", 1.0)] にする。"""
+    backends = []
+    for item in value.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        url, _, weight = item.rpartition("=")
+        try:
+            backends.append((url, float(weight)))
+        except ValueError:
+            backends.append((item, 1.0))
+    return backends
+
+
+class JudgeDispatcher:
+    def __init__(self, urls: list[tuple[str, float]]):
+        if not urls:
+            raise ValueError("No Judge0 backend is configured")
+        self.backends = [Backend(url, weight) for url, weight in urls]
+        self._lock = threading.Lock()
+        for backend in self.backends:
+            self._update_metrics(backend)
+
+    @property
+    def batch_size(self) -> int:
+        """どの Judge0 にも一度に提出できる件数。"""
+        return min(backend.client.batch_size for backend in self.backends)
+
+    def candidates(self) -> list[Backend]:
+        """
+        振り分ける順（負荷の小さい順）に並べた、振り分けられる Judge0。
+        どれも振り分けられなければ、断るよりはましなので全てを試す。
+        """
+        with self._lock:
+            backends = [backend for backend in self.backends if backend.available]
+            return sorted(backends or self.backends, key=lambda backend: backend.load)
+
+    def _update_metrics(self, backend: Backend):
+        metrics.judge_backend_outstanding.set(backend.outstanding, backend=backend.url)
+        metrics.judge_backend_available.set(int(backend.available), backend=backend.url)
+
+    def acquire(self, backend: Backend, count: int = 1):
+        with self._lock:
+            backend.outstanding += count
+            self._update_metrics(backend)
+
+    def release(self, backend: Backend, count: int = 1):
+        with self._lock:
+            backend.outstanding = max(backend.outstanding - count, 0)
+            self._update_metrics(backend)
+
+    def record_success(self, backend: Backend):
+        with self._lock:
+            backend.failures = 0
+            if backend.opened_at is not None:
+                logger.info("Judge0 %s recovered", backend.url)
+            backend.opened_at = None
+            self._update_metrics(backend)
+
+    def record_failure(self, backend: Backend):
+        with self._lock:
+            backend.failures += 1
+            # half-open で試した提出が失敗したときも、もう一度遮断する
+            if backend.failures >= JUDGE_CIRCUIT_FAILURES or backend.opened_at:
+                if backend.opened_at is None:
+                    logger.warning("Judge0 %s is failing, stop routing", backend.url)
+                backend.opened_at = monotonic()
+            self._update_metrics(backend)
+
+    def record_result(self, backend: Backend, result: dict):
+        if result.get("status", {}).get("id") in FAILURE_STATUSES:
+            self.record_failure(backend)
+        else:
+            self.record_success(backend)
+
+    def run(self, request: dict, deadline: float) -> dict:
+        """
+        1件実行する。接続できないか IE が返れば、次の Judge0 で実行し直す。
+        どの Judge0 でも IE なら、最後の結果を返す。
+        """
+        result, error = None, None
+        for backend in self.candidates():
+            self.acquire(backend)
+            try:
+                result = backend.client.run(request, deadline)
+            except requests.RequestException as e:
+                logger.warning("Judge0 %s failed: %s", backend.url, e)
+                self.record_failure(backend)
+                error = e
+                continue
+            finally:
+                self.release(backend)
+
+            self.record_result(backend, result)
+            if result["status"]["id"] not in FAILURE_STATUSES:
+                return result
+
+        if result is not None:
+            return result
+        raise NoJudgeBackend("No Judge0 backend is available") from error
+
+    def submit_batch(self, requests_: list[dict]) -> tuple[Backend, list[str | None]]:
+        """
+        まとめて提出し、提出した Judge0 とトークンを返す。失敗したら次の Judge0 に提出し直す。
+        受け付けられた件数だけ、その Judge0 の実行中の数に数える（poll か release で戻す）。
+        """
+        error = None
+        for backend in self.candidates():
+            try:
+                tokens = backend.client.submit_batch(requests_)
+            except requests.RequestException as e:
+                logger.warning("Judge0 %s failed: %s", backend.url, e)
+                self.record_failure(backend)
+                error = e
+                continue
+
+            self.record_success(backend)
+            self.acquire(backend, sum(1 for token in tokens if token))
+            return backend, tokens
+        raise NoJudgeBackend("No Judge0 backend is available") from error
+
+    def poll(
+        self,
+        backend: Backend,
+        tokens: list[str],
+        deadline: float,
+        on_result: Callable[[str, dict], None] | None = None,
+        on_round: Callable[[], None] | None = None,
+    ) -> dict[str, dict]:
+        """submit_batch で提出した Judge0 から結果を集める。"""
+
+        def record(token: str, result: dict):
+            self.release(backend)
+            self.record_result(backend, result)
+            if on_result:
+                on_result(token, result)
+
+        results = backend.client.poll(tokens, deadline, record, on_round=on_round)
+        # 期限までに結果が出なかった分も、実行中からは外す
+        self.release(backend, len(tokens) - len(results))
+        return results
+
+    def check_health(self):
+        for backend in self.backends:
+            try:
+                response = requests.get(
+                    f"{backend.client.url}/about", timeout=HEALTH_CHECK_TIMEOUT
+                )
+                healthy = response.status_code < 500
+            except requests.RequestException:
+                healthy = False
+
+            with self._lock:
+                if backend.healthy != healthy:
+                    logger.warning(
+                        "Judge0 %s is %s", backend.url, "up" if healthy else "down"
+                    )
+                backend.healthy = healthy
+                self._update_metrics(backend)
+
+    def start_health_checks(self, interval: float = JUDGE_HEALTH_CHECK_INTERVAL):
+        def run():
+            while True:
+                sleep(interval)
+                try:
+                    self.check_health()
+                except Exception:
+                    logger.exception("Judge0 health check failed")
+
+        threading.Thread(target=run, daemon=True).start()
+
+
+@cache
+def get_dispatcher(urls: str) -> JudgeDispatcher:
+    """設定（JUDGE_API_URLS）ごとに1つの JudgeDispatcher を共有する。"""
+    dispatcher = JudgeDispatcher(parse_urls(urls))
+    # 1台なら振り分け先を変えられないので、ヘルスチェックはしない
+    if len(dispatcher.backends) > 1 and JUDGE_HEALTH_CHECK_INTERVAL > 0:
+        dispatcher.start_health_checks()
+    return dispatcher
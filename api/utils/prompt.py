@@ -0,0 +1,352 @@
+import dataclasses
+import datetime
+import hashlib
+import logging
+import threading
+from dataclasses import dataclass
+
+import google.generativeai as genai
+from cachetools import LRUCache, TTLCache, cached
+from google.generativeai import caching
+
+from api.core import metrics
+from api.core.config import (
+    GEMINI_CONTEXT_CACHE,
+    GEMINI_CONTEXT_CACHE_MIN_TOKENS,
+    GEMINI_CONTEXT_CACHE_MODEL,
+    GEMINI_CONTEXT_CACHE_STATEMENT_TOKEN_BUDGET,
+    GEMINI_CONTEXT_CACHE_TTL_MINUTES,
+    GEMINI_INPUT_TOKEN_LIMIT,
+    PROMPT_PREAMBLE_CACHE_SIZE,
+    PROMPT_STATEMENT_TOKEN_BUDGET,
+    PROMPT_TOKEN_BUDGET,
+)
+from api.models import problem as problem_model
+from api.models import submission as submission_model
+
+logger = logging.getLogger(__name__)
+
+# レビュー本文のうち、コード以外（言語・ステータス・定型文）に確保しておくトークン数
+REVIEW_OVERHEAD_TOKENS = 200
+
+if PROMPT_STATEMENT_TOKEN_BUDGET + REVIEW_OVERHEAD_TOKENS >= PROMPT_TOKEN_BUDGET:
+    # 問題文だけで予算を使い切ると、長い問題ではコードが全て省略される
+    logger.warning(
+        "PROMPT_STATEMENT_TOKEN_BUDGET (%d) leaves no room for code in "
+        "PROMPT_TOKEN_BUDGET (%d)",
+        PROMPT_STATEMENT_TOKEN_BUDGET,
+        PROMPT_TOKEN_BUDGET,
+    )
+if GEMINI_CONTEXT_CACHE and (
+    GEMINI_CONTEXT_CACHE_STATEMENT_TOKEN_BUDGET < GEMINI_CONTEXT_CACHE_MIN_TOKENS
+):
+    # キャッシュに置く前置きが最小トークン数に届かないので、キャッシュは作られない
+    logger.warning(
+        "GEMINI_CONTEXT_CACHE_STATEMENT_TOKEN_BUDGET (%d) is below "
+        "GEMINI_CONTEXT_CACHE_MIN_TOKENS (%d); no context cache will be created",
+        GEMINI_CONTEXT_CACHE_STATEMENT_TOKEN_BUDGET,
+        GEMINI_CONTEXT_CACHE_MIN_TOKENS,
+    )
+
+# プロバイダ側のキャッシュが消える前に作り直すよう、TTL のこの割合で名前を忘れる
+CONTEXT_CACHE_REFRESH_RATIO = 0.9
+
+OMITTED_MARKER = "... (中略: {lines} 行 / 約 {tokens} トークン) ..."
+
+
+@dataclass(frozen=True)
+class Preamble:
+    """問題ごとに前計算してキャッシュしておくプロンプトの前置き部分"""
+
+    text: str
+    tokens: int
+    trimmed: bool
+    cached_content: str | None = None
+
+
+@dataclass(frozen=True)
+class ReviewPrompt:
+    """
+    1回のレビュー依頼で送るプロンプトとそのトークン数。
+    cached_preamble があれば、preamble の代わりにコンテキストキャッシュの前置きを使う。
+    """
+
+    preamble: Preamble
+    text: str
+    tokens: int
+    trimmed: bool
+    cached_preamble: Preamble | None = None
+
+    @property
+    def total_tokens(self) -> int:
+        return self.preamble.tokens + self.tokens
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    トークン数を概算する。
+    ASCII は約4文字で1トークン、それ以外（日本語など）は1文字1トークンとみなす。
+    """
+    ascii_count = sum(1 for c in text if c.isascii())
+    return (ascii_count + 3) // 4 + (len(text) - ascii_count)
+
+
+def trim_text(text: str, max_tokens: int) -> tuple[str, bool]:
+    """
+    テキストをトークン予算内に収める。
+    先頭と末尾を残し、間を省略マーカーに置き換える。
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return text, False
+
+    lines = text.splitlines(keepends=True)
+    head_budget = max_tokens * 2 // 3
+    tail_budget = max_tokens - head_budget
+
+    head: list[str] = []
+    used = 0
+    for line in lines:
+        cost = estimate_tokens(line)
+        if used + cost > head_budget:
+            break
+        head.append(line)
+        used += cost
+
+    tail: list[str] = []
+    used = 0
+    for line in reversed(lines[len(head) :]):
+        cost = estimate_tokens(line)
+        if used + cost > tail_budget:
+            break
+        tail.append(line)
+        used += cost
+    tail.reverse()
+
+    if not head and not tail:
+        # 1行が巨大な場合は文字単位で切り詰める
+        head = [text[:head_budget]]
+        tail = [text[len(text) - tail_budget :]]
+        omitted = [text[head_budget : len(text) - tail_budget]]
+    else:
+        omitted = lines[len(head) : len(lines) - len(tail)]
+
+    marker = OMITTED_MARKER.format(
+        lines=len(omitted), tokens=estimate_tokens("".join(omitted))
+    )
+    body = "".join(head)
+    if body and not body.endswith("\n"):
+        body += "\n"
+
+    return body + marker + "\n" + "".join(tail), True
+
+
+def preamble_text(title: str, statement: str) -> str:
+    text = rf"""
+これから流れるチャットは、以下の問題に対する解答として作成されたコードです。あなたの役割は、これらのコードを講師としてレビューすることです。
+ただし、以下の留意事項を守ってください。
+
+- 異常系の処理については言及不要です。
+- 正解ではない場合、ヒントを与えるのみに留めてください。
+- 正解の場合、良い点と改善点、アドバイスを行ってください。
+- 「中略」と書かれた箇所は、長すぎるため省略された部分です。
+
+問題:
+\`\`\`
+# {title}
+{statement}
+\`\`\`
+"""
+    return text
+
+
+def review_text(language: str, status_text: str, code: str) -> str:
+    text = rf"""
+次のコードをレビューしてください。
+
+言語: {language}
+ステータス: {status_text}
+コード:
+\`\`\`
+{code}
+\`\`\`
+"""
+    return text
+
+
+def _preamble_key(problem: problem_model.Problem) -> tuple[str, str]:
+    digest = hashlib.sha256(
+        f"{problem.title}\0{problem.statement}".encode()
+    ).hexdigest()
+    return (str(problem.id), digest)
+
+
+@cached(
+    cache=LRUCache(maxsize=PROMPT_PREAMBLE_CACHE_SIZE),
+    key=lambda problem, statement_budget: (*_preamble_key(problem), statement_budget),
+    lock=threading.Lock(),
+)
+def _build_preamble(problem: problem_model.Problem, statement_budget: int) -> Preamble:
+    statement, trimmed = trim_text(problem.statement, statement_budget)
+    text = preamble_text(problem.title, statement)
+    return Preamble(text=text, tokens=estimate_tokens(text), trimmed=trimmed)
+
+
+def get_preamble(problem: problem_model.Problem) -> Preamble:
+    """
+    毎回送る問題の前置きプロンプトを取得する（問題文は PROMPT_STATEMENT_TOKEN_BUDGET まで）。
+    問題IDと問題文のハッシュをキーにキャッシュするので、問題が更新されると作り直される。
+    """
+    return _build_preamble(problem, PROMPT_STATEMENT_TOKEN_BUDGET)
+
+
+def get_cached_preamble(problem: problem_model.Problem) -> Preamble | None:
+    """
+    コンテキストキャッシュに置いた前置きを取得する
+    （問題文は GEMINI_CONTEXT_CACHE_STATEMENT_TOKEN_BUDGET まで）。
+    前置きが GEMINI_CONTEXT_CACHE_MIN_TOKENS に満たないか、キャッシュを作れなければ None。
+    コンテキストキャッシュは期限があるので、前置きとは別に持つ。
+    """
+    if not GEMINI_CONTEXT_CACHE:
+        return None
+
+    preamble = _build_preamble(problem, GEMINI_CONTEXT_CACHE_STATEMENT_TOKEN_BUDGET)
+    if preamble.tokens < GEMINI_CONTEXT_CACHE_MIN_TOKENS:
+        return None
+
+    cached_content = _get_cached_content(problem, preamble)
+    if cached_content is None:
+        return None
+    return dataclasses.replace(preamble, cached_content=cached_content)
+
+
+# 問題ごとのコンテキストキャッシュの名前。プロバイダ側の TTL より早く期限切れにする
+_cached_contents: TTLCache[tuple[str, str], str] = TTLCache(
+    maxsize=PROMPT_PREAMBLE_CACHE_SIZE,
+    ttl=GEMINI_CONTEXT_CACHE_TTL_MINUTES * 60 * CONTEXT_CACHE_REFRESH_RATIO,
+)
+_cached_contents_lock = threading.Lock()
+
+
+def _get_cached_content(
+    problem: problem_model.Problem, preamble: Preamble
+) -> str | None:
+    key = _preamble_key(problem)
+    with _cached_contents_lock:
+        if key in _cached_contents:
+            return _cached_contents[key] or None
+
+    # 作れなかったときも空の名前を覚えておき、期限まではレビューのたびに作り直さない
+    name = _create_cached_content(problem, preamble.text)
+    with _cached_contents_lock:
+        _cached_contents[key] = name or ""
+    return name
+
+
+def forget_cached_content(name: str):
+    """使えなかったコンテキストキャッシュを忘れ、次の呼び出しで作り直す。"""
+    with _cached_contents_lock:
+        for key, value in list(_cached_contents.items()):
+            if value == name:
+                del _cached_contents[key]
+
+
+def _create_cached_content(problem: problem_model.Problem, text: str) -> str | None:
+    """プロバイダ側のコンテキストキャッシュを作成する。失敗したら None を返す。"""
+    try:
+        cache = caching.CachedContent.create(
+            model=GEMINI_CONTEXT_CACHE_MODEL,
+            display_name=f"problem-{problem.id}",
+            contents=[{"role": "user", "parts": [text]}],
+            ttl=datetime.timedelta(minutes=GEMINI_CONTEXT_CACHE_TTL_MINUTES),
+        )
+    except Exception as e:
+        logger.warning("Failed to create context cache for %s: %s", problem.id, e)
+        return None
+
+    return cache.name
+
+
+def build_review_prompt(
+    problem: problem_model.Problem,
+    submission: submission_model.Submission,
+    status_text: str,
+) -> ReviewPrompt:
+    """
+    レビュー依頼のプロンプトを組み立てる。
+    毎回送る前置きとあわせて PROMPT_TOKEN_BUDGET に収まるようにコードを切り詰める。
+    コードの予算はキャッシュの前置きの長さに左右されない。キャッシュの前置きとコードが
+    GEMINI_INPUT_TOKEN_LIMIT に収まらなければ、キャッシュは使わない。
+    """
+    preamble = get_preamble(problem)
+
+    code_budget = max(PROMPT_TOKEN_BUDGET - preamble.tokens - REVIEW_OVERHEAD_TOKENS, 0)
+    code, trimmed = trim_text(submission.code, code_budget)
+    text = review_text(submission.language, status_text, code)
+    tokens = estimate_tokens(text)
+
+    cached_preamble = get_cached_preamble(problem)
+    if (
+        cached_preamble is not None
+        and cached_preamble.tokens + tokens > GEMINI_INPUT_TOKEN_LIMIT
+    ):
+        cached_preamble = None
+
+    return ReviewPrompt(
+        preamble=preamble,
+        text=text,
+        tokens=tokens,
+        trimmed=trimmed,
+        cached_preamble=cached_preamble,
+    )
+
+
+def start_chat(
+    model: genai.GenerativeModel, review_prompt: ReviewPrompt
+) -> genai.ChatSession:
+    """
+    前置きを送った状態のチャットを開始する。
+    コンテキストキャッシュがあればそれを使い、前置きの再送を省く。
+    使えなければ、毎回送る前置きで始める。
+    """
+    cached_preamble = review_prompt.cached_preamble
+    if cached_preamble is not None:
+        try:
+            cached_model = genai.GenerativeModel.from_cached_content(
+                cached_content=cached_preamble.cached_content
+            )
+            return cached_model.start_chat()
+        except Exception as e:
+            logger.warning("Context cache is unavailable, falling back: %s", e)
+            forget_cached_content(cached_preamble.cached_content)
+
+    return model.start_chat(
+        history=[{"role": "user", "parts": review_prompt.preamble.text}]
+    )
+
+
+def log_usage(
+    submission: submission_model.Submission, prompt: ReviewPrompt, response=None
+):
+    """
+    リクエストごとのプロンプトのトークン数を記録する。
+    レスポンスがあれば、プロバイダが返した実際の値もあわせて記録する。
+    """
+    usage = getattr(response, "usage_metadata", None)
+    for kind in ("prompt", "cached_content", "candidates"):
+        count = getattr(usage, f"{kind}_token_count", None)
+        if count:
+            metrics.gemini_tokens_total.inc(count, kind=kind)
+
+    logger.info(
+        "review prompt: submission=%s estimated=%d (preamble=%d, review=%d) "
+        "actual=%s cached=%s context_cache=%s trimmed_statement=%s trimmed_code=%s",
+        submission.id,
+        prompt.total_tokens,
+        prompt.preamble.tokens,
+        prompt.tokens,
+        getattr(usage, "prompt_token_count", None),
+        getattr(usage, "cached_content_token_count", None),
+        prompt.cached_preamble.cached_content if prompt.cached_preamble else None,
+        prompt.preamble.trimmed,
+        prompt.trimmed,
+    )
@@ -0,0 +1,94 @@
+import codecs
+import os
+import tempfile
+import time
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Literal
+
+from api.core.config import JUDGE_RUN_RESULT_TTL, RUN_OUTPUT_DIR
+
+Stream = Literal["stdout", "stderr"]
+
+
+@dataclass(frozen=True)
+class Output:
+    text: str
+    size: int  # 元の出力のバイト数
+    truncated: bool
+
+
+def truncate(data: bytes | None, max_bytes: int) -> Output:
+    """
+    先頭の max_bytes バイトだけを文字列にする。切り詰めたときは、末尾に省いたバイト数を書き足す。
+    UTF-8 の文字の途中で切れた分は捨て、不正なバイトは置き換える。
+    """
+    data = data or b""
+    if len(data) <= max_bytes:
+        return Output(data.decode(errors="replace"), len(data), False)
+
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    text = decoder.decode(data[:max_bytes], final=False)
+    if text and not text.endswith("\n"):
+        text += "\n"
+    text += f"[Truncated] {len(data) - max_bytes} bytes omitted\n"
+    return Output(text, len(data), True)
+
+
+class RunOutputStore:
+    """
+    /run の出力の全体を一時的に置いておくディレクトリ。
+
+    ファイル名は <run_id>.stdout / .stderr。保存するたびに、ttl 秒より古いファイルを消す。
+    """
+
+    def __init__(self, root: str, ttl: float):
+        self.root = Path(root)
+        self.ttl = ttl
+
+    def path(self, run_id: uuid.UUID, stream: Stream) -> Path:
+        return self.root / f"{run_id.hex}.{stream}"
+
+    def save(self, run_id: uuid.UUID, stream: Stream, data: bytes):
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.purge()
+        # 書き込み途中のファイルを読まないよう、一時ファイルから置き換える
+        fd, tmp = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, self.path(run_id, stream))
+        except OSError:
+            # ディスクが一杯などで書けなかった一時ファイルを残さない
+            Path(tmp).unlink(missing_ok=True)
+            raise
+
+    def find(self, run_id: uuid.UUID, stream: Stream) -> Path | None:
+        """保存した出力のパス。無いか期限が切れていれば None。"""
+        path = self.path(run_id, stream)
+        try:
+            if time.time() - path.stat().st_mtime <= self.ttl:
+                return path
+        except FileNotFoundError:
+            pass
+        return None
+
+    def purge(self):
+        expires = time.time() - self.ttl
+        for path in self.root.glob("*.*"):
+            try:
+                if path.stat().st_mtime < expires:
+                    path.unlink(missing_ok=True)
+            except FileNotFoundError:
+                continue
+
+
+_store = None
+
+
+def get_store() -> RunOutputStore:
+    global _store
+    if _store is None:
+        _store = RunOutputStore(RUN_OUTPUT_DIR, JUDGE_RUN_RESULT_TTL)
+    return _store
@@ -0,0 +1,129 @@
+import mmap
+import os
+import tempfile
+import threading
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+from sqlalchemy.orm import Session
+
+from api.core.config import TESTCASE_CACHE_DIR, TESTCASE_CACHE_MAX_BYTES
+from api.models import problem as problem_model
+from api.utils import blob
+
+
+class TestcaseCache:
+    """
+    ジャッジするワーカーのローカルディスクに、展開済みのテストケースを置いておくキャッシュ。
+
+    ファイル名は <テストケースID>-<内容のハッシュ>.in / .out。
+    内容が変わればハッシュも変わるので、古いファイルを読むことはない。
+    容量が max_bytes を超えたら、最後に使った時刻が古いものから消す。
+    """
+
+    __test__ = False
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._total = None
+
+    def _path(self, testcase_id: uuid.UUID, digest: str, suffix: str) -> Path:
+        return self.root / f"{testcase_id.hex}-{digest}.{suffix}"
+
+    def _fill(self, db: Session, path: Path, digest: str):
+        data = blob.get_store().get(db, digest)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+        # 他のワーカーが書き込み途中のファイルを読まないよう、一時ファイルから置き換える
+        fd, tmp = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+        with self._lock:
+            if self._total is not None:
+                self._total += len(data)
+        self.evict()
+
+    def _map(self, db: Session, path: Path, digest: str, size: int):
+        if size == 0:
+            # 空のファイルはメモリマップできない
+            return b""
+
+        if not path.exists():
+            self._fill(db, path, digest)
+        else:
+            # 最後に使った時刻として更新日時を使う
+            os.utime(path)
+
+        with open(path, "rb") as f:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    @contextmanager
+    def open(self, db: Session, testcase: problem_model.Testcase):
+        """
+        テストケースの入力と出力をメモリマップして返す。
+        返す値は bytes と同じように扱えるので、コピーせずにそのままジャッジに渡せる。
+        with を抜けるとマップは閉じる。
+        """
+        opened = []
+        try:
+            for digest, size, suffix in (
+                (testcase.input_hash, testcase.input_size, "in"),
+                (testcase.output_hash, testcase.output_size, "out"),
+            ):
+                path = self._path(testcase.id, digest, suffix)
+                opened.append(self._map(db, path, digest, size))
+            yield tuple(opened)
+        finally:
+            for data in opened:
+                if isinstance(data, mmap.mmap):
+                    data.close()
+
+    def invalidate(self, testcase_id: uuid.UUID):
+        """テストケースを更新したときに、そのテストケースのファイルを消す。"""
+        for path in self.root.glob(f"{testcase_id.hex}-*"):
+            path.unlink(missing_ok=True)
+        with self._lock:
+            self._total = None
+
+    def _files(self) -> list[tuple[Path, os.stat_result]]:
+        files = []
+        for path in self.root.glob("*-*.*"):
+            if path.suffix not in (".in", ".out"):
+                continue
+            try:
+                files.append((path, path.stat()))
+            except FileNotFoundError:
+                continue
+        return files
+
+    def evict(self):
+        with self._lock:
+            if self._total is not None and self._total <= self.max_bytes:
+                return
+
+            # 他のワーカーも同じディレクトリを使うので、あふれたときは数え直す
+            files = self._files()
+            total = sum(stat.st_size for _, stat in files)
+
+            for path, stat in sorted(files, key=lambda file: file[1].st_mtime):
+                if total <= self.max_bytes:
+                    break
+                path.unlink(missing_ok=True)
+                total -= stat.st_size
+
+            self._total = total
+
+
+_cache = None
+
+
+def get_cache() -> TestcaseCache:
+    global _cache
+    if _cache is None:
+        _cache = TestcaseCache(TESTCASE_CACHE_DIR, TESTCASE_CACHE_MAX_BYTES)
+    return _cache
@@ -0,0 +1,41 @@
+import os
+import threading
+import time
+import uuid
+
+_lock = threading.Lock()
+_last_ms = 0
+_counter = 0
+
+
+def uuid7() -> uuid.UUID:
+    """
+    時刻順に並ぶ UUID (version 7, RFC 9562) を生成する。
+    先頭48ビットがミリ秒単位のUNIX時刻なので、新しい行はインデックスの末尾に追加される。
+    同じミリ秒の間は12ビットのカウンタを進め、生成順に並ぶようにする。
+    """
+    global _last_ms, _counter
+
+    with _lock:
+        ms = time.time_ns() // 1_000_000
+        if ms > _last_ms:
+            _last_ms = ms
+            _counter = int.from_bytes(os.urandom(2), "big") & 0x7FF
+        else:
+            _counter += 1
+            if _counter > 0xFFF:
+                # カウンタが溢れたら、時刻を1ミリ秒進めたことにする
+                _last_ms += 1
+                _counter = 0
+            ms = _last_ms
+        counter = _counter
+
+    rand_b = int.from_bytes(os.urandom(8), "big") & ((1 << 62) - 1)
+
+    value = (ms & ((1 << 48) - 1)) << 80
+    value |= 0x7 << 76
+    value |= counter << 64
+    value |= 0b10 << 62
+    value |= rand_b
+
+    return uuid.UUID(int=value)
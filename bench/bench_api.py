@@ -0,0 +1,428 @@
+"""
+API の性能を測るベンチマーク。
+
+データを投入したデータベースと Judge0 のエミュレーター（bench/judge0_emulator.py）を使って API サーバーを起動し、
+主要なエンドポイントのシナリオを並行に実行して、スループット・レイテンシの
+パーセンタイル（p50 / p95 / p99）・1リクエストあたりの SQL の件数を報告する。
+SQL の件数はサーバーが返す Server-Timing ヘッダから読む。
+
+ベースラインと比べて p95 が許容幅を超えて遅くなったり SQL が増えたりしていれば、
+終了コード 1 で終わる。
+
+    $ python3 -m bench.bench_api --submissions 100000 --save-baseline bench/baseline.json
+    $ python3 -m bench.bench_api --submissions 100000 --baseline bench/baseline.json
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+
+import httpx
+from sqlalchemy import create_engine, select
+
+from api import migrations
+from api.models import submission as submission_model
+from bench import seed as seed_module
+from bench.judge0_emulator import Judge0Emulator, parse_verdicts
+
+SERVER_TIMING_PATTERN = re.compile(r'db;desc="(\d+) queries"')
+
+# ログインした状態でリクエストを送るユーザーの数
+SESSION_USERS = 20
+
+
+@dataclass
+class Result:
+    latencies: list[float] = field(default_factory=list)  # 秒
+    queries: list[int] = field(default_factory=list)
+    errors: int = 0
+    elapsed: float = 0.0
+
+    def summary(self) -> dict:
+        latencies = sorted(self.latencies)
+        if len(latencies) >= 2:
+            cuts = statistics.quantiles(latencies, n=100, method="inclusive")
+            p50, p95, p99 = cuts[49], cuts[94], cuts[98]
+        else:
+            p50 = p95 = p99 = latencies[0] if latencies else 0.0
+        return {
+            "requests": len(latencies),
+            "errors": self.errors,
+            "throughput": len(latencies) / self.elapsed if self.elapsed else 0.0,
+            "p50_ms": p50 * 1000,
+            "p95_ms": p95 * 1000,
+            "p99_ms": p99 * 1000,
+            "queries": statistics.mean(self.queries) if self.queries else None,
+        }
+
+
+class Context:
+    """シナリオが共有する、ログイン済みのクライアントと参照するデータ。"""
+
+    def __init__(self, client: httpx.AsyncClient, dataset: seed_module.Dataset):
+        self.client = client
+        self.dataset = dataset
+        self.sessions: dict[str, str] = {}
+        self.submission_ids: list[str] = []
+        self.rng = random.Random(0)
+
+    async def login(self, username: str) -> str:
+        response = await self.client.post(
+            "/token",
+            data={"username": username, "password": seed_module.PASSWORD},
+        )
+        response.raise_for_status()
+        # Cookie は Secure 属性付きなので、http の接続先には明示的に送る
+        return response.cookies["session"]
+
+    async def login_all(self):
+        # ログイン（bcrypt）の時間を他のシナリオに含めないよう、先に済ませておく
+        for username in self.dataset.usernames[:SESSION_USERS]:
+            self.sessions[username] = await self.login(username)
+
+    async def session(self) -> dict[str, str]:
+        username = self.rng.choice(list(self.sessions))
+        return {"Cookie": f"session={self.sessions[username]}"}
+
+    def problem(self) -> tuple[str, str]:
+        return self.rng.choice(self.dataset.problems)
+
+
+async def problem_list(ctx: Context) -> list[httpx.Response]:
+    category, _ = ctx.problem()
+    return [
+        await ctx.client.get(f"/problem_list/{category}", headers=await ctx.session())
+    ]
+
+
+async def submission_list(ctx: Context) -> list[httpx.Response]:
+    category, problem = ctx.problem()
+    return [
+        await ctx.client.get(
+            f"/problem/{category}/{problem}/submissions",
+            headers=await ctx.session(),
+        )
+    ]
+
+
+async def submission_detail(ctx: Context) -> list[httpx.Response]:
+    submission_id = ctx.rng.choice(ctx.submission_ids)
+    return [
+        await ctx.client.get(
+            f"/submission/{submission_id}", headers=await ctx.session()
+        )
+    ]
+
+
+async def token(ctx: Context) -> list[httpx.Response]:
+    return [
+        await ctx.client.post(
+            "/token",
+            data={
+                "username": ctx.rng.choice(ctx.dataset.usernames),
+                "password": seed_module.PASSWORD,
+            },
+        )
+    ]
+
+
+async def submit_pipeline(ctx: Context) -> list[httpx.Response]:
+    """提出してから、全テストケースのジャッジが終わるまで。"""
+    category, problem = ctx.problem()
+    headers = await ctx.session()
+    response = await ctx.client.post(
+        f"/problem/{category}/{problem}/submit",
+        json={"language": "Python", "code": seed_module.CODE},
+        headers=headers,
+    )
+    if response.status_code != 200:
+        return [response]
+
+    responses = [response]
+    submission_id = response.json()["id"]
+    for _ in range(600):
+        response = await ctx.client.get(f"/submission/{submission_id}", headers=headers)
+        responses.append(response)
+        if response.status_code != 200 or not response.json()["statuses"].get("WJ"):
+            break
+        await asyncio.sleep(0.05)
+    return responses
+
+
+SCENARIOS = {
+    "problem_list": problem_list,
+    "submission_list": submission_list,
+    "submission_detail": submission_detail,
+    "token": token,
+    "submit_pipeline": submit_pipeline,
+}
+
+
+async def run_scenario(ctx: Context, scenario, requests: int, concurrency: int):
+    result = Result()
+    counter = itertools.count()
+
+    async def worker():
+        while next(counter) < requests:
+            start = time.perf_counter()
+            try:
+                responses = await scenario(ctx)
+            except httpx.HTTPError:
+                result.errors += 1
+                continue
+            elapsed = time.perf_counter() - start
+
+            if any(response.status_code >= 400 for response in responses):
+                result.errors += 1
+                continue
+            result.latencies.append(elapsed)
+            # 最初のリクエスト（ポーリングを除く）の SQL の件数を数える
+            match = SERVER_TIMING_PATTERN.search(
+                responses[0].headers.get("Server-Timing", "")
+            )
+            if match:
+                result.queries.append(int(match.group(1)))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    result.elapsed = time.perf_counter() - start
+    return result
+
+
+async def run(base_url: str, dataset, submission_ids, names, requests, concurrency):
+    limits = httpx.Limits(max_connections=concurrency * 2)
+    async with httpx.AsyncClient(
+        base_url=base_url, timeout=60, limits=limits
+    ) as client:
+        ctx = Context(client, dataset)
+        ctx.submission_ids = submission_ids
+        await ctx.login_all()
+        results = {}
+        for name in names:
+            # ウォームアップ
+            await run_scenario(ctx, SCENARIOS[name], concurrency, concurrency)
+            results[name] = (
+                await run_scenario(ctx, SCENARIOS[name], requests, concurrency)
+            ).summary()
+            print(format_row(name, results[name]))
+        return results
+
+
+def format_row(name: str, summary: dict) -> str:
+    queries = "-" if summary["queries"] is None else f"{summary['queries']:.1f}"
+    return (
+        f"  {name:<18} {summary['throughput']:8.1f} req/s  "
+        f"p50 {summary['p50_ms']:8.2f} ms  p95 {summary['p95_ms']:8.2f} ms  "
+        f"p99 {summary['p99_ms']:8.2f} ms  queries {queries:>5}  "
+        f"errors {summary['errors']}"
+    )
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """ベースラインより悪くなった項目を返す。"""
+    regressions = []
+    for name, summary in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if summary["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            regressions.append(
+                f"{name}: p95 {base['p95_ms']:.2f} ms -> {summary['p95_ms']:.2f} ms"
+            )
+        if (
+            summary["queries"] is not None
+            and base.get("queries") is not None
+            and summary["queries"] > base["queries"] + 0.5
+        ):
+            regressions.append(
+                f"{name}: queries {base['queries']:.1f} -> {summary['queries']:.1f}"
+            )
+        if summary["errors"] > base.get("errors", 0):
+            regressions.append(
+                f"{name}: errors {base.get('errors', 0)} -> {summary['errors']}"
+            )
+    return regressions
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(database_url: str, judge_url: str, workers: int, dataset):
+    port = free_port()
+    env = {
+        **os.environ,
+        # .env があっても、ここで渡す値を使わせる
+        "AIBLECODE_NO_DOTENV_OVERRIDE": "1",
+        "DATABASE_URL": database_url,
+        "JUDGE_API_URL": judge_url,
+        "JUDGE_API_URLS": judge_url,
+        "SQL_PROFILING": "true",
+        "SERVER_TIMING": "true",
+    }
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "api.main:app",
+            "--port",
+            str(port),
+            "--workers",
+            str(workers),
+            "--log-level",
+            "warning",
+        ],
+        env=env,
+    )
+
+    base_url = f"http://127.0.0.1:{port}"
+    for _ in range(100):
+        try:
+            httpx.get(base_url + "/")
+            break
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    else:
+        process.terminate()
+        raise RuntimeError("API server did not start")
+
+    try:
+        check_database(base_url, dataset)
+    except Exception:
+        process.terminate()
+        raise
+    return process, base_url
+
+
+def check_database(base_url: str, dataset):
+    """サーバーが投入したデータベースを使っているか確かめる（別のデータベースを汚さないように）。"""
+    if not dataset.problems:
+        raise RuntimeError("The benchmark database has no problems")
+    category_path_id, problem_path_id = dataset.problems[0]
+    response = httpx.get(f"{base_url}/problem_list/{category_path_id}")
+    served = (
+        {problem["path_id"] for problem in response.json()}
+        if response.status_code == 200
+        else set()
+    )
+    if problem_path_id not in served:
+        raise RuntimeError(
+            "API server is not using the benchmark database "
+            f"({category_path_id}/{problem_path_id} not found)"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--url", help="データベース。省略時は一時ファイルの SQLite を使う"
+    )
+    parser.add_argument(
+        "--no-seed", action="store_true", help="投入済みの --url を使う"
+    )
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--categories", type=int, default=2)
+    parser.add_argument("--problems", type=int, default=10)
+    parser.add_argument("--testcases", type=int, default=10)
+    parser.add_argument("--submissions", type=int, default=10000)
+    parser.add_argument("--judge-url", help="省略時はエミュレーターを起動する")
+    parser.add_argument("--judge-latency", type=float, default=0.01)
+    parser.add_argument("--judge-verdicts", type=parse_verdicts, default=None)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument(
+        "--scenario", action="append", choices=SCENARIOS, help="省略時はすべて"
+    )
+    parser.add_argument("--baseline", help="比較するベースラインの JSON")
+    parser.add_argument("--save-baseline", help="結果をベースラインとして保存する")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = args.url or f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        engine = create_engine(url)
+        if args.no_seed:
+            dataset = seed_module.load(engine)
+        else:
+            migrations.upgrade(engine, log=lambda _: None)
+            dataset = seed_module.seed(
+                engine,
+                args.users,
+                args.categories,
+                args.problems,
+                args.testcases,
+                args.submissions,
+            )
+        with engine.connect() as conn:
+            submission_ids = [
+                submission_id.hex
+                for submission_id in conn.scalars(
+                    select(submission_model.Submission.id).limit(1000)
+                )
+            ]
+        engine.dispose()
+
+        emulator = None
+        judge_url = args.judge_url
+        if judge_url is None:
+            emulator = Judge0Emulator(
+                ("127.0.0.1", 0),
+                latency=args.judge_latency,
+                verdicts=args.judge_verdicts,
+            ).start()
+            judge_url = emulator.url
+        process, base_url = start_server(url, judge_url, args.workers, dataset)
+        try:
+            print(
+                f"Running {args.requests} requests per scenario "
+                f"(concurrency {args.concurrency}):"
+            )
+            results = asyncio.run(
+                run(
+                    base_url,
+                    dataset,
+                    submission_ids,
+                    args.scenario or list(SCENARIOS),
+                    args.requests,
+                    args.concurrency,
+                )
+            )
+        finally:
+            process.terminate()
+            process.wait()
+            if emulator:
+                emulator.shutdown()
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved baseline to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print("Regressions:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print("No regressions.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+"""
+提出まわりのインデックスの効果を測るベンチマーク。
+
+データを投入したデータベースに対して、リビジョン 0003 のインデックスが無い状態と
+ある状態で、よく使うクエリの実行計画と実行時間を比べる。
+
+    $ python3 -m bench.bench_indexes --submissions 5000 --testcases 5
+"""
+
+import argparse
+import importlib
+import os
+import random
+import statistics
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, event, insert, text
+from sqlalchemy.orm import sessionmaker
+
+from api import migrations
+from api.crud import problem as problem_crud
+from api.crud import submission as submission_crud
+from api.migrations.context import MigrationContext
+from api.models import problem as problem_model
+from api.models import submission as submission_model
+from api.models import user as user_model
+from api.utils import blob
+
+STATUSES = ["AC", "AC", "AC", "WA", "TLE", "RE"]
+EMPTY_HASH = blob.content_hash(b"")
+
+
+def seed(engine, users: int, problems: int, testcases: int, submissions: int):
+    rng = random.Random(0)
+    user_ids = [uuid.uuid4() for _ in range(users)]
+    category_id = uuid.uuid4()
+    problem_ids = [uuid.uuid4() for _ in range(problems)]
+    testcase_ids = {
+        problem_id: [uuid.uuid4() for _ in range(testcases)]
+        for problem_id in problem_ids
+    }
+
+    with engine.begin() as conn:
+        conn.execute(
+            insert(user_model.User),
+            [
+                {"id": user_id, "username": f"user{i}", "password": b"x"}
+                for i, user_id in enumerate(user_ids)
+            ],
+        )
+        conn.execute(
+            insert(problem_model.Category),
+            [{"id": category_id, "path_id": "bench", "title": "bench"}],
+        )
+        conn.execute(
+            insert(problem_model.Problem),
+            [
+                {
+                    "id": problem_id,
+                    "path_id": f"problem{i:03}",
+                    "category_id": category_id,
+                    "title": f"problem{i}",
+                    "statement": "bench",
+                }
+                for i, problem_id in enumerate(problem_ids)
+            ],
+        )
+        conn.execute(
+            insert(problem_model.Testcase),
+            [
+                {
+                    "id": testcase_id,
+                    "problem_id": problem_id,
+                    "name": f"{j:02}.txt",
+                    "input_hash": EMPTY_HASH,
+                    "input_size": 0,
+                    "output_hash": EMPTY_HASH,
+                    "output_size": 0,
+                }
+                for problem_id, ids in testcase_ids.items()
+                for j, testcase_id in enumerate(ids)
+            ],
+        )
+
+        base = datetime(2024, 4, 1)
+        submission_rows, detail_rows = [], []
+        for i in range(submissions):
+            submission_id = uuid.uuid4()
+            problem_id = rng.choice(problem_ids)
+            submission_rows.append(
+                {
+                    "id": submission_id,
+                    "problem_id": problem_id,
+                    "user_id": rng.choice(user_ids),
+                    "language": "Python",
+                    "code": "print(1)",
+                    "created_at": base + timedelta(seconds=i),
+                }
+            )
+            detail_rows.extend(
+                {
+                    "id": uuid.uuid4(),
+                    "submission_id": submission_id,
+                    "testcase_id": testcase_id,
+                    "status": rng.choice(STATUSES),
+                    "time": 0.01,
+                    "memory": 1000,
+                }
+                for testcase_id in testcase_ids[problem_id]
+            )
+
+        conn.execute(insert(submission_model.Submission), submission_rows)
+        conn.execute(insert(submission_model.SubmissionDetail), detail_rows)
+
+
+def scenarios(db):
+    user = db.query(user_model.User).filter_by(username="user0").first()
+    problem = db.query(problem_model.Problem).filter_by(path_id="problem000").first()
+    submission = submission_crud.get_current_submission(db, user)
+
+    return {
+        "submission_summary_list": lambda: submission_crud.get_submission_summary_list(
+            db, "bench", problem.path_id, user
+        ),
+        "current_submission": lambda: submission_crud.get_current_submission(db, user),
+        "summarize_status": lambda: submission_crud.summarize_status(db, submission),
+        "problem_list_with_ac": lambda: problem_crud.get_problem_list_with_ac_submissions(
+            db, "bench"
+        ),
+    }
+
+
+def apply(engine, revision_function):
+    with engine.connect() as conn:
+        conn = conn.execution_options(isolation_level="AUTOCOMMIT")
+        revision_function(MigrationContext(conn, False))
+
+
+def explain(engine, statement: str, parameters) -> list[str]:
+    prefix = "EXPLAIN QUERY PLAN " if engine.dialect.name == "sqlite" else "EXPLAIN "
+    with engine.connect() as conn:
+        rows = conn.exec_driver_sql(prefix + statement, parameters).fetchall()
+    return [" | ".join(str(value) for value in row) for row in rows]
+
+
+def measure(engine, repeat: int, show_plans: bool) -> dict[str, float]:
+    Session = sessionmaker(bind=engine)
+    results = {}
+
+    with Session() as db:
+        for name, scenario in scenarios(db).items():
+            statements = []
+
+            def capture(conn, cursor, statement, parameters, context, executemany):
+                statements.append((statement, parameters))
+
+            event.listen(engine, "before_cursor_execute", capture)
+            scenario()
+            event.remove(engine, "before_cursor_execute", capture)
+
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                scenario()
+                timings.append((time.perf_counter() - start) * 1000)
+                db.expire_all()
+
+            results[name] = statistics.median(timings)
+            print(f"  {name}: {results[name]:.2f} ms ({len(statements)} queries)")
+
+            if show_plans:
+                seen = set()
+                for statement, parameters in statements:
+                    if statement in seen:
+                        continue
+                    seen.add(statement)
+                    for line in explain(engine, statement, parameters):
+                        print(f"      {line}")
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", help="省略時は一時ファイルの SQLite を使う")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--problems", type=int, default=20)
+    parser.add_argument("--testcases", type=int, default=5)
+    parser.add_argument("--submissions", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--no-plans", action="store_true")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = args.url or f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        engine = create_engine(url)
+        log = lambda _: None  # noqa: E731
+
+        indexes = importlib.import_module(
+            "api.migrations.versions.v0003_submission_indexes"
+        )
+        migrations.upgrade(engine, log=log)
+        apply(engine, indexes.downgrade)
+
+        print(f"Seeding {args.submissions} submissions ...")
+        seed(engine, args.users, args.problems, args.testcases, args.submissions)
+
+        with engine.begin() as conn:
+            conn.execute(text("ANALYZE"))
+        print("Before (without 0003):")
+        before = measure(engine, args.repeat, not args.no_plans)
+
+        apply(engine, indexes.upgrade)
+        with engine.begin() as conn:
+            conn.execute(text("ANALYZE"))
+        print("After (with 0003):")
+        after = measure(engine, args.repeat, not args.no_plans)
+
+        print("Speedup:")
+        for name in before:
+            print(f"  {name}: {before[name] / max(after[name], 1e-9):.1f}x")
+
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+UUID の保存形式（CHAR(32) / BINARY(16)）と生成方式（v4 / v7）の比較ベンチマーク。
+
+submissions_details と同じ形のテーブル（主キー + 外部キー2つ + 複合インデックス）に
+行を追加していき、挿入のスループットとテーブル・インデックスのサイズを測る。
+
+    $ python3 -m bench.bench_uuid --rows 200000
+"""
+
+import argparse
+import os
+import tempfile
+import time
+import uuid
+
+from sqlalchemy import (
+    Column,
+    Float,
+    Index,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    UniqueConstraint,
+    create_engine,
+    insert,
+    text,
+)
+from sqlalchemy_utils import UUIDType
+
+from api.utils.uuid7 import uuid7
+
+GENERATORS = {"uuid4": uuid.uuid4, "uuid7": uuid7}
+
+
+def make_table(binary: bool) -> Table:
+    return Table(
+        "submissions_details",
+        MetaData(),
+        Column("id", UUIDType(binary=binary), primary_key=True),
+        Column("submission_id", UUIDType(binary=binary), nullable=False),
+        Column("testcase_id", UUIDType(binary=binary), nullable=False),
+        Column("status", String(10)),
+        Column("time", Float),
+        Column("memory", Integer),
+        UniqueConstraint("submission_id", "testcase_id", name="uq_submission_testcase"),
+        Index("ix_submission_status", "submission_id", "status"),
+    )
+
+
+def sizes(engine) -> dict[str, int]:
+    with engine.connect() as conn:
+        if engine.dialect.name == "sqlite":
+            rows = conn.execute(
+                text("SELECT name, SUM(pgsize) FROM dbstat GROUP BY name")
+            ).fetchall()
+            return {
+                name: size for name, size in rows if not name.startswith("sqlite_s")
+            }
+
+        conn.execute(text("ANALYZE TABLE submissions_details"))
+        data, index = conn.execute(
+            text(
+                "SELECT data_length, index_length FROM information_schema.tables "
+                "WHERE table_schema = DATABASE() AND table_name = 'submissions_details'"
+            )
+        ).one()
+        return {"data": data, "indexes": index}
+
+
+def run(url: str, binary: bool, generate, rows: int, testcases: int, batch: int):
+    engine = create_engine(url)
+    table = make_table(binary)
+    table.drop(engine, checkfirst=True)
+    table.create(engine)
+
+    testcase_ids = [generate() for _ in range(testcases)]
+
+    start = time.perf_counter()
+    inserted = 0
+    while inserted < rows:
+        values = []
+        while len(values) < batch and inserted + len(values) < rows:
+            # 1回の提出につき、テストケースの数だけ結果が追加される
+            submission_id = generate()
+            values.extend(
+                {
+                    "id": generate(),
+                    "submission_id": submission_id,
+                    "testcase_id": testcase_id,
+                    "status": "AC",
+                    "time": 0.01,
+                    "memory": 1000,
+                }
+                for testcase_id in testcase_ids
+            )
+        with engine.begin() as conn:
+            conn.execute(insert(table), values)
+        inserted += len(values)
+    elapsed = time.perf_counter() - start
+
+    result = (inserted / elapsed, sizes(engine))
+    table.drop(engine)
+    engine.dispose()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", help="省略時は一時ファイルの SQLite を使う")
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--testcases", type=int, default=10)
+    parser.add_argument("--batch", type=int, default=1000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for storage in ("char", "binary"):
+            for name, generate in GENERATORS.items():
+                url = (
+                    args.url or f"sqlite:///{os.path.join(tmp, f'{storage}-{name}.db')}"
+                )
+                throughput, size = run(
+                    url,
+                    storage == "binary",
+                    generate,
+                    args.rows,
+                    args.testcases,
+                    args.batch,
+                )
+                total = sum(size.values())
+                detail = ", ".join(
+                    f"{key}={value / 1024 / 1024:.1f}MiB" for key, value in size.items()
+                )
+                print(
+                    f"{storage:6} {name}: {throughput:,.0f} rows/s, "
+                    f"total={total / 1024 / 1024:.1f}MiB ({detail})"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,441 @@
+"""
+Judge0 の API のエミュレーター。
+
+ジャッジまわりのテストやベンチマークを、本物の Judge0 無しで行うためのもの。
+提出（POST /submissions, GET /submissions/{token}）、バッチ（/submissions/batch）、
+/statuses, /languages, /config_info, /about を実装する。
+
+- 応答の待ち時間（latency と jitter）
+- 判定の分布（verdicts、例: {"AC": 0.9, "WA": 0.1}）
+- 失敗の注入（error_rate の割合で HTTP 503 を返す）
+- Python の提出を実際に子プロセスで実行する（execute）
+- callback_url を指定した提出は、結果をその URL に PUT する
+
+を指定できる。execute が無効か Python 以外の言語では、判定の分布から結果を選ぶ
+（分布を指定しなければ常に Accepted）。
+
+    $ python3 -m bench.judge0_emulator --port 2358 --latency 0.05 --verdicts AC=0.9,WA=0.1
+"""
+
+import argparse
+import base64
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+STATUSES = [
+    {"id": 1, "description": "In Queue"},
+    {"id": 2, "description": "Processing"},
+    {"id": 3, "description": "Accepted"},
+    {"id": 4, "description": "Wrong Answer"},
+    {"id": 5, "description": "Time Limit Exceeded"},
+    {"id": 6, "description": "Compilation Error"},
+    {"id": 7, "description": "Runtime Error (SIGSEGV)"},
+    {"id": 8, "description": "Runtime Error (SIGXFSZ)"},
+    {"id": 9, "description": "Runtime Error (SIGFPE)"},
+    {"id": 10, "description": "Runtime Error (SIGABRT)"},
+    {"id": 11, "description": "Runtime Error (NZEC)"},
+    {"id": 12, "description": "Runtime Error (Other)"},
+    {"id": 13, "description": "Internal Error"},
+    {"id": 14, "description": "Exec Format Error"},
+]
+STATUS_BY_ID = {status["id"]: status for status in STATUSES}
+
+# 判定の分布に使う略号 → ステータスの ID
+VERDICTS = {"AC": 3, "WA": 4, "TLE": 5, "CE": 6, "RE": 11, "IE": 13}
+
+LANGUAGES = [
+    {"id": 62, "name": "Java (OpenJDK 13.0.1)"},
+    {"id": 71, "name": "Python (3.8.1)"},
+    {"id": 105, "name": "C++ (GCC 14.1.0)"},
+]
+PYTHON_LANGUAGE_IDS = {71}
+
+ENCODED_FIELDS = {"source_code", "stdin", "expected_output"}
+ENCODED_RESPONSE_FIELDS = {"stdout", "stderr", "compile_output"}
+
+DEFAULT_CPU_TIME_LIMIT = 5.0
+MAX_BATCH_SIZE = 20
+# 保持しておく結果の件数（古いものから捨てる）
+MAX_RESULTS = 100000
+
+
+class Judge0Emulator(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address: tuple[str, int],
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        verdicts: dict[str, float] | None = None,
+        error_rate: float = 0.0,
+        execute: bool = False,
+        workers: int = 4,
+        seed: int | None = None,
+    ):
+        super().__init__(address, _Handler)
+        self.latency = latency
+        self.jitter = jitter
+        self.verdicts = verdicts or {"AC": 1.0}
+        self.error_rate = error_rate
+        self.execute = execute
+        self.rng = random.Random(seed)
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.submissions: OrderedDict[str, tuple[float, Future]] = OrderedDict()
+        self.lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "Judge0Emulator":
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def shutdown(self):
+        super().shutdown()
+        self.server_close()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def should_fail(self) -> bool:
+        with self.lock:
+            return self.rng.random() < self.error_rate
+
+    def enqueue(
+        self, request: dict, encoded: bool = False
+    ) -> tuple[str, float, Future]:
+        """
+        提出を受け付け、トークン・結果が見えるようになる時刻・結果を返す。
+        callback_url があれば、結果が見えるようになったときにそこへ PUT する。
+        """
+        with self.lock:
+            delay = max(self.latency + self.rng.uniform(-self.jitter, self.jitter), 0)
+            verdict = self.rng.choices(
+                list(self.verdicts), weights=list(self.verdicts.values())
+            )[0]
+
+        token = str(uuid.uuid4())
+        ready_at = time.monotonic() + delay
+        future = self.executor.submit(self.judge, request, verdict)
+        with self.lock:
+            self.submissions[token] = (ready_at, future)
+            while len(self.submissions) > MAX_RESULTS:
+                self.submissions.popitem(last=False)
+
+        callback_url = request.get("callback_url")
+        if callback_url:
+            future.add_done_callback(
+                lambda _: threading.Timer(
+                    max(ready_at - time.monotonic(), 0),
+                    self.send_callback,
+                    (token, callback_url, encoded),
+                ).start()
+            )
+        return token, ready_at, future
+
+    def send_callback(self, token: str, url: str, encoded: bool):
+        result = self.get(token)
+        if result is None:
+            return
+        params = {"base64_encoded": "true" if encoded else "false"}
+        request = urllib.request.Request(
+            url,
+            data=json.dumps(_Handler._encode(result, params)).encode(),
+            headers={"Content-Type": "application/json"},
+            method="PUT",
+        )
+        try:
+            urllib.request.urlopen(request, timeout=10).close()
+        except OSError:
+            pass
+
+    def get(self, token: str) -> dict | None:
+        with self.lock:
+            entry = self.submissions.get(token)
+        if entry is None:
+            return None
+
+        ready_at, future = entry
+        if future.cancelled():
+            return None
+        if time.monotonic() < ready_at or not future.done():
+            return {"token": token, "status": STATUS_BY_ID[2]}
+        return {"token": token, **future.result()}
+
+    def judge(self, request: dict, verdict: str) -> dict:
+        language_id = request.get("language_id")
+        if self.execute and language_id in PYTHON_LANGUAGE_IDS:
+            result = self.run_python(request)
+        else:
+            result = self.fake_result(request, verdict)
+        return {"language_id": language_id, "exit_signal": None, **result}
+
+    def fake_result(self, request: dict, verdict: str) -> dict:
+        status_id = VERDICTS[verdict]
+        expected = request.get("expected_output") or ""
+        return {
+            "status": STATUS_BY_ID[status_id],
+            "stdout": expected if status_id == 3 else "",
+            "stderr": "Error\n" if status_id == 11 else None,
+            "compile_output": "Compilation failed\n" if status_id == 6 else None,
+            "message": "Exited with error status 1" if status_id == 11 else None,
+            "time": "0.01",
+            "memory": 1000,
+            "exit_code": 1 if status_id == 11 else 0,
+        }
+
+    def run_python(self, request: dict) -> dict:
+        time_limit = float(request.get("cpu_time_limit") or DEFAULT_CPU_TIME_LIMIT)
+        max_output = request.get("max_file_size")  # KB
+
+        fd, path = tempfile.mkstemp(suffix=".py")
+        with os.fdopen(fd, "w") as f:
+            f.write(request.get("source_code") or "")
+        start = time.perf_counter()
+        try:
+            process = subprocess.run(
+                [sys.executable, "-I", path],
+                input=(request.get("stdin") or "").encode(),
+                capture_output=True,
+                timeout=time_limit,
+            )
+        except subprocess.TimeoutExpired as e:
+            return {
+                "status": STATUS_BY_ID[5],
+                "stdout": (e.stdout or b"").decode(errors="replace"),
+                "stderr": (e.stderr or b"").decode(errors="replace"),
+                "compile_output": None,
+                "message": "Time limit exceeded",
+                "time": f"{time_limit:.3f}",
+                "memory": 1000,
+                "exit_code": None,
+            }
+        finally:
+            os.remove(path)
+        elapsed = time.perf_counter() - start
+
+        stdout = process.stdout.decode(errors="replace")
+        stderr = process.stderr.decode(errors="replace")
+        expected = request.get("expected_output")
+        if max_output is not None and len(process.stdout) > int(max_output) * 1024:
+            status_id = 8
+            stdout = process.stdout[: int(max_output) * 1024].decode(errors="replace")
+        elif process.returncode != 0:
+            status_id = 11
+        elif expected is not None and stdout.rstrip() != expected.rstrip():
+            status_id = 4
+        else:
+            status_id = 3
+
+        return {
+            "status": STATUS_BY_ID[status_id],
+            "stdout": stdout,
+            "stderr": stderr or None,
+            "compile_output": None,
+            "message": (
+                f"Exited with error status {process.returncode}"
+                if process.returncode
+                else None
+            ),
+            "time": f"{elapsed:.3f}",
+            "memory": 1000,
+            "exit_code": process.returncode,
+        }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: Judge0Emulator
+    # judge0api（requests）の接続を使い回せるようにする
+    protocol_version = "HTTP/1.1"
+    # ヘッダと本文を別々に書くので、Nagle のアルゴリズムによる遅延を避ける
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length", 0))
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _query(self) -> tuple[list[str], dict[str, str]]:
+        url = urlparse(self.path)
+        parts = [part for part in url.path.split("/") if part]
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        return parts, params
+
+    @staticmethod
+    def _decode(request: dict, encoded: bool) -> dict:
+        if not encoded:
+            return request
+        return {
+            key: (
+                base64.b64decode(value).decode(errors="replace")
+                if key in ENCODED_FIELDS and value
+                else value
+            )
+            for key, value in request.items()
+        }
+
+    @staticmethod
+    def _encode(result: dict, params: dict[str, str]) -> dict:
+        fields = params.get("fields")
+        if fields and fields != "*":
+            wanted = set(fields.split(",")) | {"token"}
+            result = {key: value for key, value in result.items() if key in wanted}
+        if params.get("base64_encoded") != "true":
+            return result
+        return {
+            key: (
+                base64.b64encode(value.encode()).decode()
+                if key in ENCODED_RESPONSE_FIELDS and value
+                else value
+            )
+            for key, value in result.items()
+        }
+
+    def do_POST(self):
+        parts, params = self._query()
+        if parts not in (["submissions"], ["submissions", "batch"]):
+            return self._send_json(404, {"error": "Not found"})
+        if self.server.should_fail():
+            return self._send_json(503, {"error": "Service unavailable (injected)"})
+
+        body = self._read_json()
+        encoded = params.get("base64_encoded") == "true"
+
+        if parts == ["submissions", "batch"]:
+            requests = body.get("submissions") or []
+            if len(requests) > MAX_BATCH_SIZE:
+                return self._send_json(
+                    422, {"error": f"number of submissions exceeds {MAX_BATCH_SIZE}"}
+                )
+            tokens = [
+                {
+                    "token": self.server.enqueue(
+                        self._decode(request, encoded), encoded
+                    )[0]
+                }
+                for request in requests
+            ]
+            return self._send_json(201, tokens)
+
+        token, ready_at, future = self.server.enqueue(
+            self._decode(body, encoded), encoded
+        )
+        if params.get("wait") != "true":
+            return self._send_json(201, {"token": token})
+
+        future.result()
+        time.sleep(max(ready_at - time.monotonic(), 0))
+        self._send_json(201, self._encode(self.server.get(token), params))
+
+    def do_GET(self):
+        parts, params = self._query()
+
+        if parts == ["submissions", "batch"]:
+            tokens = [token for token in params.get("tokens", "").split(",") if token]
+            results = [self.server.get(token) for token in tokens]
+            return self._send_json(
+                200,
+                {
+                    "submissions": [
+                        self._encode(result, params) if result else None
+                        for result in results
+                    ]
+                },
+            )
+        if len(parts) == 2 and parts[0] == "submissions":
+            result = self.server.get(parts[1])
+            if result is None:
+                return self._send_json(404, {"error": "Not found"})
+            return self._send_json(200, self._encode(result, params))
+
+        if parts == ["statuses"]:
+            return self._send_json(200, STATUSES)
+        if parts == ["languages"]:
+            return self._send_json(200, LANGUAGES)
+        if len(parts) == 2 and parts[0] == "languages":
+            for language in LANGUAGES:
+                if str(language["id"]) == parts[1]:
+                    return self._send_json(200, language)
+            return self._send_json(404, {"error": "Not found"})
+        if parts == ["config_info"]:
+            return self._send_json(
+                200,
+                {
+                    "enable_wait_result": True,
+                    "enable_batched_submissions": True,
+                    "max_submission_batch_size": MAX_BATCH_SIZE,
+                    "cpu_time_limit": DEFAULT_CPU_TIME_LIMIT,
+                    "max_cpu_time_limit": 15,
+                    "max_file_size": 1024,
+                },
+            )
+        if parts == ["about"]:
+            return self._send_json(200, {"version": "emulator"})
+
+        self._send_json(404, {"error": "Not found"})
+
+
+def parse_verdicts(value: str) -> dict[str, float]:
+    """ "AC=0.9,WA=0.1" の形式を読む。"""
+    verdicts = {}
+    for item in value.split(","):
+        name, _, weight = item.partition("=")
+        name = name.strip().upper()
+        if name not in VERDICTS:
+            raise argparse.ArgumentTypeError(f"Unknown verdict: {name}")
+        verdicts[name] = float(weight or 1)
+    return verdicts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=2358)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--verdicts", type=parse_verdicts, default=None)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--execute", action="store_true")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    emulator = Judge0Emulator(
+        (args.host, args.port),
+        latency=args.latency,
+        jitter=args.jitter,
+        verdicts=args.verdicts,
+        error_rate=args.error_rate,
+        execute=args.execute,
+        workers=args.workers,
+        seed=args.seed,
+    )
+    print(f"Judge0 emulator listening on {emulator.url}")
+    emulator.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+"""
+ベンチマーク用のデータを投入する。
+
+ユーザー・カテゴリー・問題・テストケースと、大量の提出・ジャッジ結果を作る。
+ユーザー名は user0, user1, ...、パスワードはすべて PASSWORD。
+カテゴリーは bench00, bench01, ...、問題は problem000, problem001, ...。
+
+    $ python3 -m bench.seed --url mysql+pymysql://... --submissions 1000000
+"""
+
+import argparse
+import random
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import Session
+
+from api import migrations
+from api.database import generate_id
+from api.models import problem as problem_model
+from api.models import submission as submission_model
+from api.models import user as user_model
+from api.utils import blob
+from api.utils.hash import hash_password
+
+PASSWORD = "password"
+STATUSES = ["AC", "AC", "AC", "WA", "TLE", "RE"]
+LANGUAGES = ["Python", "Python", "C++", "Java"]
+CODE = "a, b = map(int, input().split())\nprint(a + b)\n"
+
+
+@dataclass
+class Dataset:
+    """投入したデータのうち、シナリオから参照するもの。"""
+
+    usernames: list[str] = field(default_factory=list)
+    problems: list[tuple[str, str]] = field(default_factory=list)  # (カテゴリー, 問題)
+
+
+def _insert_batches(engine, table, rows, batch_size: int):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            with engine.begin() as conn:
+                conn.execute(insert(table), batch)
+            batch = []
+    if batch:
+        with engine.begin() as conn:
+            conn.execute(insert(table), batch)
+
+
+def seed(
+    engine,
+    users: int = 100,
+    categories: int = 2,
+    problems: int = 10,
+    testcases: int = 10,
+    submissions: int = 10000,
+    batch_size: int = 5000,
+    log=print,
+) -> Dataset:
+    """
+    problems はカテゴリーごとの問題数、testcases は問題ごとのテストケース数。
+    提出はユーザーと問題を一様に選び、テストケースの数だけジャッジ結果を付ける。
+    """
+    rng = random.Random(0)
+    dataset = Dataset()
+
+    # bcrypt は遅いので、同じハッシュを使い回す
+    password = hash_password(PASSWORD)
+    user_ids = [generate_id() for _ in range(users)]
+    dataset.usernames = [f"user{i}" for i in range(users)]
+    _insert_batches(
+        engine,
+        user_model.User,
+        (
+            {"id": user_id, "username": username, "password": password}
+            for user_id, username in zip(user_ids, dataset.usernames)
+        ),
+        batch_size,
+    )
+
+    with Session(engine) as db:
+        store = blob.get_store()
+        input_hash = store.put(db, b"3 2\n")
+        output_hash = store.put(db, b"5\n")
+        db.commit()
+
+    problem_ids, testcase_ids = [], {}
+    for c in range(categories):
+        category_id = generate_id()
+        category_path_id = f"bench{c:02}"
+        with engine.begin() as conn:
+            conn.execute(
+                insert(problem_model.Category),
+                [{"id": category_id, "path_id": category_path_id, "title": "bench"}],
+            )
+
+        rows = []
+        for p in range(problems):
+            problem_id = generate_id()
+            problem_path_id = f"problem{p:03}"
+            problem_ids.append(problem_id)
+            dataset.problems.append((category_path_id, problem_path_id))
+            rows.append(
+                {
+                    "id": problem_id,
+                    "path_id": problem_path_id,
+                    "category_id": category_id,
+                    "title": f"Problem {p}",
+                    "statement": "2つの整数 A, B が与えられます。A + B を出力してください。",
+                }
+            )
+            testcase_ids[problem_id] = [generate_id() for _ in range(testcases)]
+        with engine.begin() as conn:
+            conn.execute(insert(problem_model.Problem), rows)
+
+    _insert_batches(
+        engine,
+        problem_model.Testcase,
+        (
+            {
+                "id": testcase_id,
+                "problem_id": problem_id,
+                "name": f"{j:02}.txt",
+                "input_hash": input_hash,
+                "input_size": 4,
+                "output_hash": output_hash,
+                "output_size": 2,
+            }
+            for problem_id, ids in testcase_ids.items()
+            for j, testcase_id in enumerate(ids)
+        ),
+        batch_size,
+    )
+    log(
+        f"Seeded {users} users, {categories} categories, "
+        f"{len(problem_ids)} problems, {len(problem_ids) * testcases} testcases"
+    )
+
+    # 提出とジャッジ結果は件数が多いので、まとめて作って順に書き込む
+    start = time.perf_counter()
+    base = datetime(2024, 4, 1)
+    per_batch = max(batch_size // max(testcases, 1), 1)
+    for offset in range(0, submissions, per_batch):
+        submission_rows, detail_rows = [], []
+        for i in range(offset, min(offset + per_batch, submissions)):
+            submission_id = generate_id()
+            problem_id = rng.choice(problem_ids)
+            submission_rows.append(
+                {
+                    "id": submission_id,
+                    "problem_id": problem_id,
+                    "user_id": rng.choice(user_ids),
+                    "language": rng.choice(LANGUAGES),
+                    "code": CODE,
+                    "created_at": base + timedelta(seconds=i),
+                }
+            )
+            detail_rows.extend(
+                {
+                    "id": generate_id(),
+                    "submission_id": submission_id,
+                    "testcase_id": testcase_id,
+                    "status": rng.choice(STATUSES),
+                    "time": 0.01,
+                    "memory": 1000,
+                }
+                for testcase_id in testcase_ids[problem_id]
+            )
+
+        with engine.begin() as conn:
+            conn.execute(insert(submission_model.Submission), submission_rows)
+            conn.execute(insert(submission_model.SubmissionDetail), detail_rows)
+
+        done = min(offset + per_batch, submissions)
+        if done % (per_batch * 20) < per_batch or done == submissions:
+            elapsed = time.perf_counter() - start
+            log(f"  {done}/{submissions} submissions ({done / elapsed:.0f}/s)")
+
+    return dataset
+
+
+def load(engine) -> Dataset:
+    """投入済みのデータベースから Dataset を作り直す。"""
+    dataset = Dataset()
+    with engine.connect() as conn:
+        dataset.usernames = list(
+            conn.scalars(
+                select(user_model.User.username).where(
+                    user_model.User.username.like("user%")
+                )
+            )
+        )
+        dataset.problems = [
+            (category_path_id, problem_path_id)
+            for category_path_id, problem_path_id in conn.execute(
+                select(problem_model.Category.path_id, problem_model.Problem.path_id)
+                .join(
+                    problem_model.Problem,
+                    problem_model.Problem.category_id == problem_model.Category.id,
+                )
+                .where(problem_model.Category.path_id.like("bench%"))
+                .order_by(problem_model.Category.path_id, problem_model.Problem.path_id)
+            )
+        ]
+    return dataset
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", required=True)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--categories", type=int, default=2)
+    parser.add_argument("--problems", type=int, default=10)
+    parser.add_argument("--testcases", type=int, default=10)
+    parser.add_argument("--submissions", type=int, default=10000)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    engine = create_engine(args.url)
+    migrations.upgrade(engine)
+    seed(
+        engine,
+        args.users,
+        args.categories,
+        args.problems,
+        args.testcases,
+        args.submissions,
+        args.batch_size,
+    )
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
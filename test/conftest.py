@@ -0,0 +1,11 @@
+import threading
+
+import pytest
+
+
+@pytest.fixture
+def gate():
+    """set するまでジョブを止めておき、その間にキューを組み立てる。"""
+    event = threading.Event()
+    yield event
+    event.set()
@@ -0,0 +1,105 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import Session
+
+from api.crud import problem as problem_crud
+from api.crud.aio import submission as submission_crud
+from api.database import Base, generate_id
+from api.models import chat, problem, submission, user  # noqa: F401
+
+
+@pytest.fixture
+def path(tmp_path):
+    return tmp_path / "aio.db"
+
+
+@pytest.fixture
+def db(path):
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        yield session
+    engine.dispose()
+
+
+@pytest.fixture
+def db_problem(db):
+    category = problem.Category(path_id="c", title="c")
+    db.add(category)
+    db.flush()
+    db_problem = problem.Problem(
+        path_id="p", category_id=category.id, title="", statement=""
+    )
+    db.add(db_problem)
+    db.flush()
+    for i in range(3):
+        testcase = problem.Testcase(problem_id=db_problem.id, name=f"{i:02}")
+        problem_crud.set_testcase_payload(db, testcase, b"1\n", b"1\n")
+        db.add(testcase)
+    db.commit()
+    return db_problem
+
+
+def summary_list(path, db_user) -> tuple[list, int]:
+    """get_submission_summary_list の結果と、実行した SQL の数を返す。"""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    queries = []
+    event.listen(
+        engine.sync_engine,
+        "before_cursor_execute",
+        lambda conn, cursor, statement, *args: queries.append(statement),
+    )
+
+    async def run():
+        try:
+            async with AsyncSession(engine) as db:
+                return await submission_crud.get_submission_summary_list(
+                    db, "c", "p", db_user
+                )
+        finally:
+            await engine.dispose()
+
+    return asyncio.run(run()), len(queries)
+
+
+def test_summary_list_has_no_n_plus_one(path, db, db_problem):
+    db_user = SimpleNamespace(id=generate_id())
+    testcase_ids = problem_crud.get_testcase_id_list(db, db_problem.id)
+
+    def add_submission(judged: int):
+        db_submission = submission.Submission(
+            problem_id=db_problem.id, user_id=db_user.id, language="Python", code=""
+        )
+        db.add(db_submission)
+        db.flush()
+        for testcase_id in testcase_ids[:judged]:
+            db.add(
+                submission.SubmissionDetail(
+                    submission_id=db_submission.id,
+                    testcase_id=testcase_id,
+                    status="AC",
+                    time=0,
+                    memory=0,
+                )
+            )
+        db.commit()
+
+    add_submission(3)
+    _, queries = summary_list(path, db_user)
+
+    for judged in range(3):
+        add_submission(judged)
+    summaries, more_queries = summary_list(path, db_user)
+
+    # 提出が増えても、SQL の数は変わらない
+    assert more_queries == queries
+    assert sorted(sorted(status.items()) for _, status in summaries) == [
+        [("AC", 1), ("WJ", 2)],
+        [("AC", 2), ("WJ", 1)],
+        [("AC", 3)],
+        [("WJ", 3)],
+    ]
@@ -6,15 +6,25 @@ import pytest
 from dotenv import load_dotenv
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import Session, sessionmaker
 
 from api.crud import problem as problem_crud
-from api.database import Base, get_db
+from api.crud import submission as submission_crud
+from api.database import (
+    Base,
+    get_async_db,
+    get_async_read_db,
+    get_db,
+    get_read_db,
+    get_sessionmaker,
+)
 from api.main import app
 from api.models import problem as problem_model
 from api.models.user import User
 from api.schemas import problem as problem_schema
 from api.utils import hash
+from bench.judge0_emulator import Judge0Emulator
 
 # テスト用SQLiteデータベースを作成
 SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
@@ -22,6 +32,10 @@ engine = create_engine(
     SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
 )
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+async_engine = create_async_engine("sqlite+aiosqlite:///./test.db")
+TestingAsyncSessionLocal = async_sessionmaker(
+    bind=async_engine, autoflush=False, expire_on_commit=False
+)
 
 load_dotenv(verbose=True)
 dotenv_path = os.path.join(os.path.dirname(__file__), "..", ".env")
@@ -41,8 +55,17 @@ def override_get_db():
         db.close()
 
 
+async def override_get_async_db():
+    async with TestingAsyncSessionLocal() as db:
+        yield db
+
+
 # アプリケーションにモックを適用
 app.dependency_overrides[get_db] = override_get_db
+app.dependency_overrides[get_read_db] = override_get_db
+app.dependency_overrides[get_async_db] = override_get_async_db
+app.dependency_overrides[get_async_read_db] = override_get_async_db
+app.dependency_overrides[get_sessionmaker] = lambda: TestingSessionLocal
 
 
 # データベースのセットアップとクライアントの準備
@@ -68,7 +91,18 @@ def setup_database():
     Base.metadata.drop_all(bind=engine)
 
 
-client = TestClient(app)
+# Judge0 の代わりに、Python の提出を実際に実行するエミュレーターを使う
+@pytest.fixture(scope="module", autouse=True)
+def judge0():
+    emulator = Judge0Emulator(("127.0.0.1", 0), execute=True).start()
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setattr(submission_crud, "JUDGE_API_URLS", emulator.url)
+        monkeypatch.setattr(submission_crud, "JUDGE_RUN_API_URLS", emulator.url)
+        yield emulator
+    emulator.shutdown()
+
+
+client = TestClient(app, base_url="https://testserver")
 
 
 def test_read_main():
@@ -419,6 +453,18 @@ def test_create_testcase_not_admin(db_session: Session):
     assert response.status_code == 200
 
 
+def wait_for_submissions(count: int):
+    """count 件の提出のジャッジが全て終わるまで、提出の一覧を取り直す。"""
+    for _ in range(100):
+        response = client.get("/problem/test_category/test_problem/submissions")
+        if len(response.json()) == count and all(
+            "WJ" not in submission["statuses"] for submission in response.json()
+        ):
+            break
+        time.sleep(0.1)
+    return response
+
+
 def test_submit(db_session: Session):
     # カテゴリを作成
     problem_crud.create_category(
@@ -479,11 +525,7 @@ def test_submit(db_session: Session):
     assert response.status_code == 200
     assert response.json().get("message") == "Submission created successfully"
 
-    time.sleep(0.5)
-
-    response = client.get(
-        "/problem/test_category/test_problem/submissions",
-    )
+    response = wait_for_submissions(1)
 
     assert response.status_code == 200
     assert len(response.json()) == 1
@@ -499,15 +541,13 @@ def test_submit(db_session: Session):
     assert response.status_code == 200
     assert response.json().get("message") == "Submission created successfully"
 
-    time.sleep(2.5)
-
-    response = client.get(
-        "/problem/test_category/test_problem/submissions",
-    )
+    response = wait_for_submissions(2)
 
     assert response.status_code == 200
     assert len(response.json()) == 2
-    assert response.json()[1].get("statuses") == {"TLE": 1}
+    # 提出の一覧は新しい順
+    assert response.json()[0].get("statuses") == {"TLE": 1}
+    assert response.json()[1].get("statuses") == {"RE": 1}
 
     response = client.get(
         "/problem_list/test_category",
@@ -533,15 +573,11 @@ def test_submit(db_session: Session):
     assert response.status_code == 200
     assert response.json().get("message") == "Submission created successfully"
 
-    time.sleep(0.5)
-
-    response = client.get(
-        "/problem/test_category/test_problem/submissions",
-    )
+    response = wait_for_submissions(3)
 
     assert response.status_code == 200
     assert len(response.json()) == 3
-    assert response.json()[2].get("statuses") == {"AC": 1}
+    assert response.json()[0].get("statuses") == {"AC": 1}
 
     response = client.get(
         "/problem_list/test_category",
@@ -567,15 +603,11 @@ def test_submit(db_session: Session):
     assert response.status_code == 200
     assert response.json().get("message") == "Submission created successfully"
 
-    time.sleep(0.5)
-
-    response = client.get(
-        "/problem/test_category/test_problem/submissions",
-    )
+    response = wait_for_submissions(4)
 
     assert response.status_code == 200
     assert len(response.json()) == 4
-    assert response.json()[2].get("statuses") == {"AC": 1}
+    assert response.json()[0].get("statuses") == {"AC": 1}
 
     response = client.get(
         "/problem_list/test_category",
@@ -623,3 +655,103 @@ def test_run():
     assert response.status_code == 200
     assert response.json().get("stdout") == ""
     assert "Time Limit Exceeded" in response.json().get("stderr")
+
+
+def test_run_large_output():
+    response = client.post("/token", data={"username": "test", "password": "test"})
+    assert response.status_code == 200
+
+    # 応答には先頭だけを入れ、全体はダウンロードできる
+    response = client.post(
+        "/run",
+        json={"language": "Python", "code": "print('x' * 100000)", "input": ""},
+    )
+    assert response.status_code == 200
+    assert response.json()["stdout_truncated"]
+    assert not response.json()["stderr_truncated"]
+    assert "[Truncated]" in response.json()["stdout"]
+    assert len(response.json()["stdout"]) < 100000
+    run_id = response.json()["id"]
+
+    response = client.get(f"/run/{run_id}/output/stdout")
+    assert response.status_code == 200
+    assert response.content == b"x" * 100000 + b"\n"
+
+    response = client.get(f"/run/{run_id}/output/stderr")
+    assert response.status_code == 404
+    response = client.get(f"/run/{uuid.uuid4()}/output/stdout")
+    assert response.status_code == 404
+
+    # RUN_OUTPUT_LIMIT_BYTES を超えると実行を止める
+    response = client.post(
+        "/run",
+        json={"language": "Python", "code": "print('x' * 5000000)", "input": ""},
+    )
+    assert response.status_code == 200
+    assert response.json()["stdout_truncated"]
+    assert "Output Limit Exceeded" in response.json()["stderr"]
+
+    response = client.post("/logout")
+    assert response.status_code == 200
+
+
+def test_submission_queue():
+    response = client.post("/token", data={"username": "test", "password": "test"})
+    assert response.status_code == 200
+
+    response = client.post(
+        "/problem/test_category/test_problem/submit",
+        json={"language": "Python", "code": "print(6)"},
+    )
+    assert response.status_code == 200
+    submission_id = response.json()["id"]
+
+    response = client.get(f"/submission/{submission_id}/queue")
+    assert response.status_code == 200
+    assert response.json()["state"] in ("queued", "running", "finished")
+
+    time.sleep(0.5)
+    response = client.get(f"/submission/{submission_id}/queue")
+    assert response.json() == {
+        "state": "finished",
+        "position": None,
+        "estimated_wait": None,
+    }
+
+    response = client.get(f"/submission/{uuid.uuid4()}/queue")
+    assert response.status_code == 404
+
+    response = client.post("/logout")
+    assert response.status_code == 200
+
+
+def test_run_async():
+    response = client.post("/token", data={"username": "test", "password": "test"})
+    assert response.status_code == 200
+
+    response = client.post(
+        "/run/async",
+        json={"language": "Python", "code": "print(2 * int(input()))", "input": "3\n"},
+    )
+    assert response.status_code == 200
+    run_id = response.json()["id"]
+
+    for _ in range(100):
+        response = client.get(f"/run/{run_id}")
+        assert response.status_code == 200
+        if response.json()["state"] == "finished":
+            break
+        time.sleep(0.05)
+    assert response.json()["stdout"] == "6\n"
+    assert response.json()["stderr"] == ""
+
+    response = client.post(
+        "/run/async", json={"language": "Brainfuck", "code": "+", "input": ""}
+    )
+    assert response.status_code == 400
+
+    response = client.get(f"/run/{uuid.uuid4()}")
+    assert response.status_code == 404
+
+    response = client.post("/logout")
+    assert response.status_code == 200
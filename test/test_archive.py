@@ -0,0 +1,93 @@
+import io
+import tarfile
+import zipfile
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from api.crud import problem as problem_crud
+from api.database import Base, generate_id
+from api.models import chat, problem, submission, user  # noqa: F401
+from api.utils import archive
+
+FILES = {
+    "sample/01.in": b"1 2\n",
+    "sample/01.out": b"3\n",
+    "in/02.txt": b"5 5\n",
+    "out/02.txt": b"10\n",
+    "README.md": b"ignored",
+    "__MACOSX/._01.in": b"ignored",
+}
+
+
+def make_zip() -> io.BytesIO:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as f:
+        for name, data in FILES.items():
+            f.writestr(name, data)
+    return buffer
+
+
+def make_tar() -> io.BytesIO:
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w:gz") as f:
+        for name, data in FILES.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            f.addfile(info, io.BytesIO(data))
+    return buffer
+
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'archive.db'}")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        yield session
+    engine.dispose()
+
+
+@pytest.mark.parametrize("make", [make_zip, make_tar])
+def test_iter_testcase_files(make):
+    files = sorted(archive.iter_testcase_files(make(), 1024))
+    assert files == [
+        ("01", "input", b"1 2\n"),
+        ("01", "output", b"3\n"),
+        ("02.txt", "input", b"5 5\n"),
+        ("02.txt", "output", b"10\n"),
+    ]
+
+
+def test_iter_testcase_files_errors():
+    with pytest.raises(archive.ArchiveError):
+        list(archive.iter_testcase_files(make_zip(), 10))
+    with pytest.raises(archive.ArchiveError):
+        list(archive.iter_testcase_files(io.BytesIO(b"not an archive"), 1024))
+
+
+def test_create_testcase_bulk(db):
+    db_problem = problem.Problem(
+        id=generate_id(), path_id="p", category_id=generate_id(), title="", statement=""
+    )
+    db.add(db_problem)
+    existing = problem.Testcase(problem_id=db_problem.id, name="01")
+    problem_crud.set_testcase_payload(db, existing, b"old", b"old")
+    db.add(existing)
+    db.commit()
+
+    created, updated = problem_crud.create_testcase_bulk(
+        db, db_problem, archive.iter_testcase_files(make_zip(), 1024)
+    )
+
+    assert [t["name"] for t in created] == ["02.txt"]
+    assert [t["id"] for t in updated] == [existing.id]
+    testcases = problem_crud.get_testcase_list(db, db_problem.id)
+    assert [problem_crud.get_testcase_payload(db, t) for t in testcases] == [
+        (b"1 2\n", b"3\n"),
+        (b"5 5\n", b"10\n"),
+    ]
+
+    with pytest.raises(HTTPException):
+        problem_crud.create_testcase_bulk(db, db_problem, [("03", "input", b"")])
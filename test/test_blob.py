@@ -0,0 +1,50 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from api.database import Base
+from api.models import chat, problem, submission, user  # noqa: F401
+from api.utils import blob
+
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'blob.db'}")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        yield session
+    engine.dispose()
+
+
+@pytest.mark.parametrize("codec", ["zstd", "gzip", "raw"])
+def test_compress_roundtrip(codec):
+    data = b"1 2 3\n" * 10000
+    assert blob.decompress(blob.compress(data, codec), codec) == data
+
+
+def test_database_store_deduplicates(db):
+    store = blob.DatabaseBlobStore()
+    data = b"10\n" * 100000
+
+    digest = store.put(db, data)
+    assert store.put(db, data) == digest
+    db.commit()
+
+    assert db.query(problem.TestcaseBlob).count() == 1
+    stored = db.query(problem.TestcaseBlob).one()
+    assert stored.size == len(data)
+    assert len(stored.data) < len(data)
+    assert store.get(db, digest) == data
+
+
+def test_file_store(tmp_path, db):
+    store = blob.FileBlobStore(str(tmp_path / "blobs"))
+    data = b"hello\n"
+
+    digest = store.put(db, data)
+    assert store.put(db, data) == digest
+    assert len(list((tmp_path / "blobs").rglob("*.*"))) == 1
+    assert store.get(db, digest) == data
+
+    with pytest.raises(KeyError):
+        store.get(db, blob.content_hash(b"missing"))
@@ -0,0 +1,53 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from api.crud import chat as chat_crud
+from api.database import Base, generate_id
+from api.models import chat, problem, submission, user  # noqa: F401
+
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'chat.db'}")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        yield session
+    engine.dispose()
+
+
+@pytest.fixture
+def db_submission(db):
+    db_submission = submission.Submission(
+        problem_id=generate_id(), user_id=generate_id(), language="Python", code=""
+    )
+    db.add(db_submission)
+    db.commit()
+    return db_submission
+
+
+def test_latest_review_pointer(db, db_submission):
+    # chat() が最初に作る空のレビューやユーザーのメッセージは指さない
+    chat_crud.create_chat(db, "ai", "", db_submission)
+    chat_crud.create_chat(db, "user", "question", db_submission)
+    assert db_submission.latest_review_id is None
+
+    review = chat_crud.create_chat(db, "ai", "review", db_submission)
+    assert db_submission.latest_review_id == review.id
+    assert chat_crud.get_ai_chat(db, db_submission).message == "review"
+
+    chat_crud.create_chat(db, "ai", "", db_submission)
+    assert db_submission.latest_review_id == review.id
+
+
+def test_get_ai_chat_falls_back_on_stale_pointer(db, db_submission):
+    review = chat_crud.create_chat(db, "ai", "review", db_submission)
+
+    # 指している行が無ければ、提出のレビューを探し直す
+    db_submission.latest_review_id = generate_id()
+    db.commit()
+    assert chat_crud.get_ai_chat(db, db_submission).id == review.id
+
+    db_submission.latest_review_id = None
+    db.commit()
+    assert chat_crud.get_ai_chat(db, db_submission).id == review.id
@@ -0,0 +1,111 @@
+import socket
+import time
+
+import pytest
+import requests
+
+from api.utils import judge0
+from api.utils.judge0 import Judge0Client, Judge0Timeout
+from bench.judge0_emulator import Judge0Emulator
+
+
+@pytest.fixture
+def emulator():
+    emulator = Judge0Emulator(("127.0.0.1", 0), latency=0.2, seed=0).start()
+    yield emulator
+    emulator.shutdown()
+
+
+def request(source_code: bytes = b"print(1)") -> dict:
+    return judge0.build_request(71, source_code, b"", b"1\n", cpu_time_limit=2.0)
+
+
+def test_build_request():
+    request = judge0.build_request(71, b"print(1)", b"", b"1\n", memory_limit=1024)
+    assert request == {
+        "language_id": 71,
+        "source_code": "cHJpbnQoMSk=",
+        "expected_output": "MQo=",
+        "memory_limit": 1024,
+    }
+
+
+def test_poll_batch_with_backoff(emulator, monkeypatch):
+    monkeypatch.setattr(judge0, "JUDGE_POLL_INITIAL_INTERVAL", 0.05)
+    client = Judge0Client(emulator.url)
+    polls = []
+    get_batch = client.get_batch
+    monkeypatch.setattr(
+        client, "get_batch", lambda *args: polls.append(args) or get_batch(*args)
+    )
+
+    tokens = client.submit_batch([request() for _ in range(5)])
+    assert all(tokens)
+    seen = []
+    rounds = []
+    results = client.poll(
+        tokens,
+        time.monotonic() + 10,
+        lambda token, _: seen.append(token),
+        on_round=lambda: rounds.append(len(seen)),
+    )
+
+    assert sorted(seen) == sorted(tokens)
+    assert {result["status"]["description"] for result in results.values()} == {
+        "Accepted"
+    }
+    # 5件を1回の問い合わせでまとめて取り、間隔を伸ばしながら待つので、回数は少ない
+    assert all(len(tokens_) == 5 for tokens_, *_ in polls)
+    assert len(polls) <= 5
+    # 問い合わせるたびに on_round を呼ぶ
+    assert len(rounds) == len(polls)
+    assert rounds[-1] == 5
+
+
+def test_run_uses_wait(emulator, monkeypatch):
+    client = Judge0Client(emulator.url)
+    monkeypatch.setattr(
+        client, "poll", lambda *args, **kwargs: pytest.fail("should not poll")
+    )
+
+    result = client.run(request(), time.monotonic() + 10)
+    assert result["status"]["description"] == "Accepted"
+
+
+def test_run_polls_without_wait(emulator, monkeypatch):
+    monkeypatch.setattr(judge0, "JUDGE_WAIT", "false")
+    client = Judge0Client(emulator.url)
+
+    result = client.run(request(), time.monotonic() + 10)
+    assert result["status"]["description"] == "Accepted"
+
+
+def test_deadline(emulator, monkeypatch):
+    monkeypatch.setattr(judge0, "JUDGE_WAIT", "false")
+    client = Judge0Client(emulator.url)
+
+    start = time.monotonic()
+    with pytest.raises(Judge0Timeout):
+        client.run(request(), time.monotonic() + 0.05)
+    assert time.monotonic() - start < 1
+
+
+def test_config_fallback():
+    # 接続できない Judge0 では、wait=true を使わずバッチでポーリングする
+    client = Judge0Client("http://127.0.0.1:9")
+    assert not client.supports_wait()
+    assert client.batch_size == judge0.DEFAULT_CONFIG["max_submission_batch_size"]
+
+
+def test_requests_time_out(monkeypatch):
+    # 接続は受け付けるが応答しない Judge0 を待ち続けない
+    monkeypatch.setattr(judge0, "_config_info", lambda url: judge0.DEFAULT_CONFIG)
+    monkeypatch.setattr(judge0, "JUDGE_READ_TIMEOUT", 0.2)
+    with socket.create_server(("127.0.0.1", 0)) as server:
+        client = Judge0Client(f"http://127.0.0.1:{server.getsockname()[1]}")
+        with pytest.raises(requests.Timeout):
+            client.submit_batch([request()])
+
+        start = time.monotonic()
+        assert client.poll(["token"], time.monotonic() + 0.5) == {}
+        assert time.monotonic() - start < 3
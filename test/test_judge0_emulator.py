@@ -0,0 +1,103 @@
+import time
+
+import pytest
+import requests
+
+from api.crud import submission as submission_crud
+from api.utils.judge_dispatcher import JudgeDispatcher, NoJudgeBackend
+from bench.judge0_emulator import Judge0Emulator
+
+
+@pytest.fixture
+def start():
+    emulators = []
+
+    def start(**kwargs) -> Judge0Emulator:
+        emulator = Judge0Emulator(("127.0.0.1", 0), seed=0, **kwargs).start()
+        emulators.append(emulator)
+        return emulator
+
+    yield start
+    for emulator in emulators:
+        emulator.shutdown()
+
+
+def run(emulator, code: str, input_data: str = "", expected: str = ""):
+    dispatcher = JudgeDispatcher([(emulator.url, 1.0)])
+    return submission_crud.submit(dispatcher, "Python", code, input_data, expected)
+
+
+def test_execute_python(start):
+    emulator = start(execute=True)
+
+    result = run(emulator, "print(int(input()) * 2)", "3\n", "6\n")
+    assert result.status["description"] == "Accepted"
+    assert result.stdout == b"6\n"
+
+    result = run(emulator, "print(int(input()) * 2)", "3\n", "7\n")
+    assert result.status["description"] == "Wrong Answer"
+
+    result = run(emulator, "print(1 / 0)")
+    assert submission_crud.map_result_status(result.status["description"]) == "RE"
+    assert b"ZeroDivisionError" in result.stderr
+
+
+def test_verdict_distribution(start):
+    emulator = start(verdicts={"AC": 1, "WA": 1})
+
+    verdicts = {run(emulator, "print(1)").status["description"] for _ in range(20)}
+    assert verdicts == {"Accepted", "Wrong Answer"}
+
+
+def test_latency_and_polling(start):
+    emulator = start(latency=0.2)
+
+    response = requests.post(
+        f"{emulator.url}/submissions/", json={"source_code": "", "language_id": 71}
+    )
+    token = response.json()["token"]
+    response = requests.get(f"{emulator.url}/submissions/{token}")
+    assert response.json()["status"]["description"] == "Processing"
+
+    time.sleep(0.3)
+    response = requests.get(f"{emulator.url}/submissions/{token}")
+    assert response.json()["status"]["description"] == "Accepted"
+
+
+def test_batch(start):
+    emulator = start()
+
+    response = requests.post(
+        f"{emulator.url}/submissions/batch",
+        json={"submissions": [{"language_id": 71}, {"language_id": 62}]},
+    )
+    assert response.status_code == 201
+    tokens = [item["token"] for item in response.json()]
+
+    time.sleep(0.1)
+    response = requests.get(
+        f"{emulator.url}/submissions/batch",
+        params={"tokens": ",".join(tokens), "fields": "status,language_id"},
+    )
+    submissions = response.json()["submissions"]
+    assert [submission["language_id"] for submission in submissions] == [71, 62]
+    assert set(submissions[0]) == {"token", "status", "language_id"}
+
+
+def test_failure_injection(start):
+    emulator = start(error_rate=1.0)
+
+    with pytest.raises(NoJudgeBackend):
+        run(emulator, "print(1)")
+
+
+def test_metadata(start):
+    emulator = start()
+
+    statuses = requests.get(f"{emulator.url}/statuses").json()
+    assert {"id": 3, "description": "Accepted"} in statuses
+    languages = requests.get(f"{emulator.url}/languages").json()
+    assert {language["id"] for language in languages} >= set(
+        submission_crud.language_dict.values()
+    )
+    assert requests.get(f"{emulator.url}/config_info").json()["enable_wait_result"]
@@ -0,0 +1,265 @@
+import json
+import threading
+import time
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import urlparse
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from api import database
+from api import main as api_main
+from api.crud import problem as problem_crud
+from api.crud import submission as submission_crud
+from api.database import Base, generate_id, get_db
+from api.main import app
+from api.models import chat, problem, submission, user  # noqa: F401
+from api.utils.judge_dispatcher import JudgeDispatcher
+from bench.judge0_emulator import Judge0Emulator
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'callback.db'}",
+        connect_args={"check_same_thread": False},
+    )
+    Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def db(engine):
+    with Session(engine) as session:
+        yield session
+
+
+@pytest.fixture
+def client(engine, monkeypatch):
+    def override_get_db():
+        with Session(engine) as session:
+            yield session
+
+    monkeypatch.setattr(app, "dependency_overrides", {get_db: override_get_db})
+    return TestClient(app, base_url="https://testserver")
+
+
+@pytest.fixture
+def db_submission(db):
+    db_problem = problem.Problem(
+        id=generate_id(), path_id="p", category_id=generate_id(), title="", statement=""
+    )
+    db.add(db_problem)
+    for i in range(3):
+        testcase = problem.Testcase(problem_id=db_problem.id, name=f"{i:02}")
+        problem_crud.set_testcase_payload(db, testcase, b"1\n", b"1\n")
+        db.add(testcase)
+
+    db_submission = submission.Submission(
+        problem_id=db_problem.id,
+        user_id=generate_id(),
+        language="Python",
+        code="print(1)",
+    )
+    db.add(db_submission)
+    db.commit()
+    return db_submission
+
+
+@pytest.fixture
+def callbacks():
+    """Judge0 からのコールバックを受け取って溜めるサーバー。"""
+    received = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def do_PUT(self):
+            body = self.rfile.read(int(self.headers["Content-Length"]))
+            received.append((self.path, json.loads(body)))
+            self.send_response(204)
+            self.end_headers()
+
+    server = HTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    server.received = received
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def statuses(db, db_submission) -> dict:
+    db.expire_all()
+    return dict(submission_crud.summarize_status(db, db_submission))
+
+
+def pending(db) -> int:
+    return db.query(submission.PendingJudgement).count()
+
+
+def test_submit_with_callback(db, db_submission, client, callbacks, monkeypatch):
+    host, port = callbacks.server_address
+    monkeypatch.setattr(submission_crud, "JUDGE_CALLBACK_URL", f"http://{host}:{port}")
+    emulator = Judge0Emulator(("127.0.0.1", 0), latency=0.05, seed=0).start()
+    try:
+        testcases = problem_crud.get_testcase_list(db, db_submission.problem_id)
+        with submission_crud.SubmissionDetailWriter(
+            db, db_submission.id, [testcase.id for testcase in testcases]
+        ) as writer:
+            submission_crud.multiple_submit(
+                db,
+                writer,
+                JudgeDispatcher([(emulator.url, 1.0)]),
+                "Python",
+                db_submission.code,
+                testcases,
+            )
+
+        # 結果を待たずに戻り、IE にもしない
+        assert statuses(db, db_submission) == {"WJ": 3}
+        assert pending(db) == 3
+
+        for _ in range(100):
+            if len(callbacks.received) == 3:
+                break
+            time.sleep(0.05)
+    finally:
+        emulator.shutdown()
+
+    for path, body in callbacks.received:
+        response = client.put(path, json=body)
+        assert response.status_code == 204
+    assert statuses(db, db_submission) == {"AC": 3}
+    assert pending(db) == 0
+
+
+def test_callback_rejects_bad_signature(db, db_submission, client):
+    testcase_id = problem_crud.get_testcase_id_list(db, db_submission.problem_id)[0]
+    url = urlparse(submission_crud.callback_url(db_submission.id, testcase_id))
+
+    response = client.put(
+        f"{url.path}?signature={'0' * 64}",
+        json={"status": {"id": 3, "description": "Accepted"}},
+    )
+    assert response.status_code == 403
+
+
+def test_receive_ignores_unknown_and_pending(db, db_submission):
+    testcase_ids = problem_crud.get_testcase_id_list(db, db_submission.problem_id)
+    accepted = {"status": {"id": 3, "description": "Accepted"}, "time": "0.01"}
+    assert not submission_crud.receive_judgement(
+        db, db_submission.id, testcase_ids[0], accepted
+    )
+
+    db.add(
+        submission.PendingJudgement(
+            submission_id=db_submission.id,
+            testcase_id=testcase_ids[0],
+            language="Python",
+            submitted_at=submission_crud._utcnow(),
+            deadline=submission_crud._utcnow() + timedelta(minutes=1),
+        )
+    )
+    db.commit()
+    processing = {"status": {"id": 2, "description": "Processing"}}
+    assert submission_crud.receive_judgement(
+        db, db_submission.id, testcase_ids[0], processing
+    )
+    assert pending(db) == 1
+    assert submission_crud.receive_judgement(
+        db, db_submission.id, testcase_ids[0], accepted
+    )
+    assert pending(db) == 0
+    assert statuses(db, db_submission) == {"AC": 1, "WJ": 2}
+
+
+def test_reap_expired_judgements(db, db_submission):
+    testcase_ids = problem_crud.get_testcase_id_list(db, db_submission.problem_id)
+    now = submission_crud._utcnow()
+    for testcase_id, deadline in zip(
+        testcase_ids, (now - timedelta(seconds=1), now + timedelta(minutes=1))
+    ):
+        db.add(
+            submission.PendingJudgement(
+                submission_id=db_submission.id,
+                testcase_id=testcase_id,
+                language="Python",
+                submitted_at=now,
+                deadline=deadline,
+            )
+        )
+    db.commit()
+
+    assert submission_crud.reap_expired_judgements(db) == 1
+    assert pending(db) == 1
+    assert statuses(db, db_submission) == {"IE": 1, "WJ": 2}
+    assert submission_crud.reap_expired_judgements(db) == 0
+
+
+def test_reaper_starts_with_app(engine, db, db_submission, monkeypatch):
+    # 再起動の前に提出され、結果が届かないまま期限が切れたテストケース
+    now = submission_crud._utcnow()
+    for testcase_id in problem_crud.get_testcase_id_list(db, db_submission.problem_id):
+        db.add(
+            submission.PendingJudgement(
+                submission_id=db_submission.id,
+                testcase_id=testcase_id,
+                language="Python",
+                submitted_at=now - timedelta(minutes=2),
+                deadline=now - timedelta(minutes=1),
+            )
+        )
+    db.commit()
+
+    monkeypatch.setattr(api_main, "JUDGE_CALLBACK_URL", "http://api/api")
+    monkeypatch.setattr(submission_crud, "JUDGE_CALLBACK_REAP_INTERVAL", 0.05)
+    monkeypatch.setattr(database, "SessionLocal", sessionmaker(bind=engine))
+    monkeypatch.setattr(submission_crud, "_reaper", None)
+
+    # 提出が無くても、起動すれば期限切れにする
+    with TestClient(app):
+        for _ in range(100):
+            db.expire_all()
+            if pending(db) == 0:
+                break
+            time.sleep(0.05)
+    assert submission_crud._reaper is None
+
+    assert pending(db) == 0
+    assert statuses(db, db_submission) == {"IE": 3}
+
+
+def test_reap_judgement_already_recorded(db, db_submission):
+    # 結果の記録と期限切れが競合して、詳細が既にあるテストケース
+    testcase_ids = problem_crud.get_testcase_id_list(db, db_submission.problem_id)
+    now = submission_crud._utcnow()
+    db.add(
+        submission.SubmissionDetail(
+            submission_id=db_submission.id,
+            testcase_id=testcase_ids[0],
+            status="AC",
+            time=0.1,
+            memory=100,
+        )
+    )
+    db.add(
+        submission.PendingJudgement(
+            submission_id=db_submission.id,
+            testcase_id=testcase_ids[0],
+            language="Python",
+            submitted_at=now,
+            deadline=now - timedelta(seconds=1),
+        )
+    )
+    db.commit()
+
+    # 詳細の重複で待ちの削除まで巻き戻ると、同じ行を期限切れにし続ける
+    assert submission_crud.reap_expired_judgements(db) == 1
+    assert pending(db) == 0
+    assert submission_crud.reap_expired_judgements(db) == 0
+    assert statuses(db, db_submission) == {"AC": 1, "WJ": 2}
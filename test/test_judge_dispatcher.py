@@ -0,0 +1,112 @@
+import time
+
+import pytest
+
+from api.utils import judge0, judge_dispatcher
+from api.utils.judge_dispatcher import JudgeDispatcher, parse_urls
+from bench.judge0_emulator import Judge0Emulator
+
+# 接続できない Judge0
+DEAD_URL = "http://127.0.0.1:9"
+
+
+@pytest.fixture
+def start():
+    emulators = []
+
+    def start(**kwargs) -> Judge0Emulator:
+        emulator = Judge0Emulator(("127.0.0.1", 0), seed=0, **kwargs).start()
+        emulators.append(emulator)
+        return emulator
+
+    yield start
+    for emulator in emulators:
+        emulator.shutdown()
+
+
+def request() -> dict:
+    return judge0.build_request(71, b"print(1)", b"", b"1\n", cpu_time_limit=2.0)
+
+
+def test_parse_urls():
+    assert parse_urls("http://a:2358=2, http://b:2358,") == [
+        ("http://a:2358", 2.0),
+        ("http://b:2358", 1.0),
+    ]
+
+
+def test_least_outstanding_with_weights():
+    dispatcher = JudgeDispatcher([("http://a", 1.0), ("http://b", 3.0)])
+    a, b = dispatcher.backends
+
+    assert dispatcher.candidates()[0] is b
+    dispatcher.acquire(b, 3)
+    # a: (0 + 1) / 1 = 1, b: (3 + 1) / 3 = 1.33
+    assert dispatcher.candidates()[0] is a
+    dispatcher.release(b, 3)
+    assert dispatcher.candidates()[0] is b
+
+
+def test_failover(start):
+    emulator = start()
+    dispatcher = JudgeDispatcher([(DEAD_URL, 10.0), (emulator.url, 1.0)])
+    dead, alive = dispatcher.backends
+
+    result = dispatcher.run(request(), time.monotonic() + 10)
+    assert result["status"]["description"] == "Accepted"
+    assert dead.failures == 1
+    assert dead.outstanding == alive.outstanding == 0
+
+    backend, tokens = dispatcher.submit_batch([request(), request()])
+    assert backend is alive
+    assert alive.outstanding == 2
+    results = dispatcher.poll(backend, tokens, time.monotonic() + 10)
+    assert len(results) == 2
+    assert alive.outstanding == 0
+
+
+def test_failover_on_internal_error(start):
+    broken = start(verdicts={"IE": 1})
+    healthy = start()
+    dispatcher = JudgeDispatcher([(broken.url, 10.0), (healthy.url, 1.0)])
+
+    result = dispatcher.run(request(), time.monotonic() + 10)
+    assert result["status"]["description"] == "Accepted"
+    assert dispatcher.backends[0].failures == 1
+
+
+def test_circuit_breaker(monkeypatch):
+    monkeypatch.setattr(judge_dispatcher, "JUDGE_CIRCUIT_FAILURES", 2)
+    dispatcher = JudgeDispatcher([("http://a", 1.0), ("http://b", 1.0)])
+    a, b = dispatcher.backends
+
+    dispatcher.record_failure(a)
+    assert a.available
+    dispatcher.record_failure(a)
+    assert not a.available
+    assert dispatcher.candidates() == [b]
+
+    # 一定時間経てば試しに振り分け、失敗すればまた遮断する
+    monkeypatch.setattr(judge_dispatcher, "JUDGE_CIRCUIT_RESET_SECONDS", 0)
+    assert a.available
+    dispatcher.record_failure(a)
+    assert a.opened_at is not None
+    dispatcher.record_success(a)
+    assert a.opened_at is None and a.failures == 0
+
+
+def test_all_backends_unavailable():
+    # どれも遮断されていても、断らずに試す
+    dispatcher = JudgeDispatcher([("http://a", 1.0)])
+    backend = dispatcher.backends[0]
+    backend.healthy = False
+    assert dispatcher.candidates() == [backend]
+
+
+def test_health_check(start):
+    emulator = start()
+    dispatcher = JudgeDispatcher([(DEAD_URL, 1.0), (emulator.url, 1.0)])
+
+    dispatcher.check_health()
+    assert [backend.healthy for backend in dispatcher.backends] == [False, True]
+    assert dispatcher.candidates() == dispatcher.backends[1:]
@@ -0,0 +1,119 @@
+import threading
+
+from fastapi.testclient import TestClient
+
+from api.core import metrics
+from api.main import app
+from api.routers import metrics as metrics_router
+
+
+def test_counter_sums_threads():
+    counter = metrics.Counter("test_total", "Test.", ("kind",))
+
+    def work():
+        for _ in range(1000):
+            counter.inc(kind="a")
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    counter.inc(2.5, kind="b")
+
+    assert counter.values() == {("a",): 4000, ("b",): 2.5}
+    assert counter.render() == [
+        "# HELP test_total Test.",
+        "# TYPE test_total counter",
+        'test_total{kind="a"} 4000',
+        'test_total{kind="b"} 2.5',
+    ]
+
+
+def test_gauge():
+    gauge = metrics.Gauge("test_gauge", "Test.", ("name",))
+    gauge.inc(name="a")
+    gauge.inc(name="a")
+    gauge.dec(name="a")
+    gauge.set(7, name="b")
+
+    assert gauge.values() == {("a",): 1, ("b",): 7}
+
+
+def test_histogram():
+    histogram = metrics.Histogram("test_seconds", "Test.", buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value)
+
+    assert histogram.samples() == [
+        'test_seconds_bucket{le="0.1"} 2',
+        'test_seconds_bucket{le="1"} 3',
+        'test_seconds_bucket{le="+Inf"} 4',
+        "test_seconds_sum 3.65",
+        "test_seconds_count 4",
+    ]
+
+
+def test_label_values_are_escaped():
+    counter = metrics.Counter("test_total", "Test.", ("path",))
+    counter.inc(path='a"b\\c')
+
+    assert counter.samples() == ['test_total{path="a\\"b\\\\c"} 1']
+
+
+def test_metrics_endpoint(monkeypatch):
+    monkeypatch.setattr(app, "dependency_overrides", {})
+    monkeypatch.setattr(metrics_router, "METRICS_TOKEN", "metrics-token")
+    metrics.registry.clear()
+    client = TestClient(app)
+
+    client.get("/")
+    client.get("/no/such/path")
+    response = client.get("/metrics", headers={"Authorization": "Bearer metrics-token"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert 'http_requests_total{method="GET",route="/",status="200"} 1' in (
+        response.text
+    )
+    assert (
+        'http_requests_total{method="GET",route="<unmatched>",status="404"} 1'
+        in response.text
+    )
+    assert 'http_request_duration_seconds_count{method="GET",route="/"} 1' in (
+        response.text
+    )
+    assert "# TYPE judge0_request_duration_seconds histogram" in response.text
+
+
+def test_metrics_access(monkeypatch):
+    monkeypatch.setattr(app, "dependency_overrides", {})
+    client = TestClient(app)
+
+    # 何も設定しなければ誰にも返さない
+    monkeypatch.setattr(metrics_router, "METRICS_TOKEN", None)
+    monkeypatch.setattr(metrics_router, "ALLOWED_NETWORKS", [])
+    assert client.get("/metrics").status_code == 404
+    assert client.get("/metrics/pool").status_code == 404
+
+    monkeypatch.setattr(metrics_router, "METRICS_TOKEN", "metrics-token")
+    assert client.get("/metrics").status_code == 404
+    headers = {"Authorization": "Bearer wrong"}
+    assert client.get("/metrics", headers=headers).status_code == 404
+    headers = {"Authorization": "Bearer metrics-token"}
+    assert client.get("/metrics", headers=headers).status_code == 200
+    assert client.get("/metrics/pool", headers=headers).status_code == 200
+
+
+def test_metrics_allow_ips(monkeypatch, caplog):
+    # 読めない項目は無視して、残りで判定する
+    networks = metrics_router.parse_networks(["10.0.0.0/8", "not-an-ip", "::1"])
+    assert len(networks) == 2
+    assert "not-an-ip" in caplog.text
+    monkeypatch.setattr(metrics_router, "ALLOWED_NETWORKS", networks)
+
+    assert metrics_router._allowed_address("10.1.2.3")
+    assert metrics_router._allowed_address("::1")
+    assert not metrics_router._allowed_address("192.168.0.1")
+    assert not metrics_router._allowed_address("testclient")
+    assert not metrics_router._allowed_address(None)
@@ -0,0 +1,195 @@
+import uuid
+
+import pytest
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from api import migrations
+from api.crud import problem as problem_crud
+from api.database import Base
+from api.models import chat, problem, submission, user  # noqa: F401
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'migrations.db'}")
+    yield engine
+    engine.dispose()
+
+
+def describe(engine) -> dict[str, tuple[set[str], set[str]]]:
+    inspector = inspect(engine)
+    return {
+        table: (
+            {column["name"] for column in inspector.get_columns(table)},
+            {index["name"] for index in inspector.get_indexes(table)}
+            | {c["name"] for c in inspector.get_unique_constraints(table)},
+        )
+        for table in Base.metadata.tables
+    }
+
+
+def test_upgrade_matches_models(engine, tmp_path):
+    # マイグレーションで作ったスキーマと create_all で作ったスキーマが一致する
+    migrations.upgrade(engine, log=lambda _: None)
+
+    expected = create_engine(f"sqlite:///{tmp_path / 'models.db'}")
+    Base.metadata.create_all(expected)
+
+    assert describe(engine) == describe(expected)
+    assert migrations.current(engine) == migrations.head()
+
+
+def test_upgrade_is_idempotent(engine):
+    migrations.upgrade(engine, log=lambda _: None)
+    assert migrations.upgrade(engine, log=lambda _: None) == []
+
+
+def test_downgrade_to_base(engine):
+    migrations.upgrade(engine, log=lambda _: None)
+    migrations.downgrade(engine, "base", log=lambda _: None)
+
+    assert migrations.current(engine) is None
+    assert set(inspect(engine).get_table_names()) == {"schema_migrations"}
+
+
+def test_stamp(engine):
+    Base.metadata.create_all(engine)
+    migrations.stamp(engine)
+
+    assert migrations.upgrade(engine, log=lambda _: None) == []
+
+
+def test_detail_unique_constraint(engine):
+    migrations.upgrade(engine, "0002", log=lambda _: None)
+    submission_id, testcase_id = uuid.uuid4().hex, uuid.uuid4().hex
+    insert = text(
+        "INSERT INTO submissions_details "
+        "(id, submission_id, testcase_id, status, time, memory) "
+        "VALUES (:id, :s, :t, :status, 0, 0)"
+    )
+    first, second = sorted(uuid.uuid4().hex for _ in range(2))
+    with engine.begin() as conn:
+        for detail_id, status in ((second, "WA"), (first, "AC")):
+            conn.execute(
+                insert,
+                {
+                    "id": detail_id,
+                    "s": submission_id,
+                    "t": testcase_id,
+                    "status": status,
+                },
+            )
+
+    # 制約を張る前に、重複した結果は id の小さい1行にまとめる
+    migrations.upgrade(engine, "0003", log=lambda _: None)
+    with engine.connect() as conn:
+        rows = conn.execute(text("SELECT id, status FROM submissions_details")).all()
+    assert rows == [(first, "AC")]
+
+    with pytest.raises(IntegrityError), engine.begin() as conn:
+        conn.execute(
+            insert,
+            {
+                "id": uuid.uuid4().hex,
+                "s": submission_id,
+                "t": testcase_id,
+                "status": "WA",
+            },
+        )
+
+
+def test_uuid_storage_conversion(engine):
+    migrations.upgrade(engine, "0003", log=lambda _: None)
+    user_id = uuid.uuid4()
+    with engine.begin() as conn:
+        conn.execute(
+            text("INSERT INTO users VALUES (:id, 'u', x'00', 1)"), {"id": user_id.hex}
+        )
+
+    def stored():
+        with engine.connect() as conn:
+            return conn.execute(text("SELECT id FROM users")).scalar()
+
+    with pytest.raises(RuntimeError):
+        migrations.convert_uuid_storage(engine, "binary")
+
+    # リビジョンは実行時の UUID_STORAGE によらず CHAR(32) にする
+    migrations.upgrade(engine, log=lambda _: None)
+    assert stored() == user_id.hex
+
+    # 形式を変えるときは、最新まで適用してから書き換える
+    migrations.convert_uuid_storage(engine, "binary")
+    assert stored() == user_id.bytes
+
+    migrations.convert_uuid_storage(engine, "char")
+    assert stored() == user_id.hex
+
+
+def test_testcase_payloads_move_to_blobs(engine):
+    migrations.upgrade(engine, "0004", log=lambda _: None)
+    category_id, problem_id, testcase_id = (uuid.uuid4().hex for _ in range(3))
+    with engine.begin() as conn:
+        conn.execute(
+            text("INSERT INTO categories VALUES (:id, 'c', 'c', '')"),
+            {"id": category_id},
+        )
+        conn.execute(
+            text("INSERT INTO problems VALUES (:id, 'p', :c, 't', 's', 1, 2, 256)"),
+            {"id": problem_id, "c": category_id},
+        )
+        conn.execute(
+            text("INSERT INTO testcases VALUES (:id, :p, '01', '3 2\n', '6\n')"),
+            {"id": testcase_id, "p": problem_id},
+        )
+
+    migrations.upgrade(engine, log=lambda _: None)
+
+    with Session(engine) as db:
+        testcase = db.query(problem.Testcase).one()
+        assert testcase.input_size == 4
+        assert problem_crud.get_testcase_payload(db, testcase) == (b"3 2\n", b"6\n")
+
+
+def test_latest_review_backfill(engine):
+    migrations.upgrade(engine, "0001", log=lambda _: None)
+    submission_id = uuid.uuid4().hex
+    review_id, empty_id, user_chat_id = (uuid.uuid4().hex for _ in range(3))
+    with engine.begin() as conn:
+        conn.execute(
+            text(
+                "INSERT INTO submissions VALUES "
+                "(:id, :p, :u, 'Python', '', '2024-01-01 00:00:00')"
+            ),
+            {"id": submission_id, "p": uuid.uuid4().hex, "u": uuid.uuid4().hex},
+        )
+        # 最新のレビューを指す（後から作った空のレビューやユーザーのメッセージは飛ばす）
+        for chat_id, is_ai, message, created_at in (
+            (review_id, 1, "review", "2024-01-01 00:00:01"),
+            (empty_id, 1, "", "2024-01-01 00:00:02"),
+            (user_chat_id, 0, "question", "2024-01-01 00:00:03"),
+        ):
+            conn.execute(
+                text("INSERT INTO chats VALUES (:id, :s, :is_ai, :message, :at)"),
+                {
+                    "id": chat_id,
+                    "s": submission_id,
+                    "is_ai": is_ai,
+                    "message": message,
+                    "at": created_at,
+                },
+            )
+
+    def latest_review_id():
+        with engine.connect() as conn:
+            return conn.execute(
+                text("SELECT latest_review_id FROM submissions")
+            ).scalar()
+
+    migrations.upgrade(engine, "0002", log=lambda _: None)
+    assert latest_review_id() == review_id
+
+    # もう一度適用しても何もしない
+    assert migrations.upgrade(engine, "0002", log=lambda _: None) == []
+    assert latest_review_id() == review_id
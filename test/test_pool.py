@@ -0,0 +1,62 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, exc, text
+
+from api.core import pool
+from api.main import app
+from api.routers import metrics as metrics_router
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}",
+        poolclass=pool.InstrumentedQueuePool,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=0.1,
+    )
+    yield engine
+    engine.dispose()
+
+
+def test_checkouts_are_counted(engine):
+    for _ in range(3):
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+
+    assert engine.pool.stats.checkouts == 3
+    assert engine.pool.stats.timeouts == 0
+    assert engine.pool.stats.wait_seconds_max >= 0
+
+
+def test_timeouts_are_counted(engine):
+    with engine.connect():
+        with pytest.raises(exc.TimeoutError):
+            engine.connect()
+
+    assert engine.pool.stats.timeouts == 1
+    assert engine.pool.stats.wait_seconds_total >= 0.1
+
+
+def test_stats_survive_dispose(engine):
+    with engine.connect():
+        pass
+    engine.dispose()
+
+    assert engine.pool.stats.checkouts == 1
+
+
+def test_pool_status_endpoint(engine, monkeypatch):
+    monkeypatch.setattr(pool, "_engines", {"test": engine})
+    monkeypatch.setattr(metrics_router, "METRICS_TOKEN", "metrics-token")
+    client = TestClient(app, headers={"Authorization": "Bearer metrics-token"})
+    with engine.connect():
+        response = client.get("/metrics/pool")
+
+    assert response.status_code == 200
+    (status,) = response.json()
+    assert status["name"] == "test"
+    assert status["size"] == 1
+    assert status["checked_out"] == 1
+    assert status["checkouts"] == 1
@@ -0,0 +1,162 @@
+import io
+import tarfile
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from api.crud import problem as problem_crud
+from api.crud import problem_set as problem_set_crud
+from api.database import Base
+from api.models import chat, problem, submission, user  # noqa: F401
+from api.schemas import problem as problem_schema
+from api.utils import archive
+
+
+def make_session(path):
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    return Session(engine)
+
+
+@pytest.fixture
+def source(tmp_path):
+    with make_session(tmp_path / "source.db") as db:
+        problem_crud.create_category(
+            db,
+            problem_schema.CategoryCreate(
+                path_id="01_basic", title="基本", description=""
+            ),
+        )
+        for path_id in ("problem_a", "problem_b"):
+            problem_crud.create_problem(
+                db,
+                problem_schema.ProblemCreate(
+                    path_id=path_id,
+                    title=path_id,
+                    statement="$N$ を2倍してください。",
+                    category_path_id="01_basic",
+                    level=1,
+                    time_limit=2.0,
+                    memory_limit=256,
+                ),
+            )
+            for i in range(3):
+                problem_crud.create_testcase(
+                    db,
+                    problem_schema.TestcaseCreate(
+                        category_path_id="01_basic",
+                        problem_path_id=path_id,
+                        name=f"{i:02}.txt",
+                        input=f"{i}\n",
+                        output=f"{i * 2}\n",
+                    ),
+                )
+        yield db
+
+
+def test_export_import_roundtrip(source, tmp_path):
+    buffer = io.BytesIO()
+    problem_set_crud.export_category(source, "01_basic", buffer)
+
+    with make_session(tmp_path / "target.db") as db:
+        buffer.seek(0)
+        result = problem_set_crud.import_category(db, buffer)
+        assert result["problems_created"] == 2
+        assert result["testcases_created"] == 6
+
+        problem_b = problem_crud.get_problem_by_path_id(db, "01_basic", "problem_b")
+        assert problem_b.statement == "$N$ を2倍してください。"
+        testcases = problem_crud.get_testcase_list(db, problem_b.id)
+        assert [t.name for t in testcases] == ["00.txt", "01.txt", "02.txt"]
+        assert problem_crud.get_testcase_payload(db, testcases[2]) == (b"2\n", b"4\n")
+
+        # 2回目は上書きになる
+        buffer.seek(0)
+        result = problem_set_crud.import_category(db, buffer)
+        assert result["problems_updated"] == 2
+        assert result["testcases_updated"] == 6
+        assert db.query(problem.Testcase).count() == 6
+
+
+def test_import_rejects_invalid_archive(tmp_path):
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w:gz") as tar:
+        info = tarfile.TarInfo("problems/a/problem.json")
+        info.size = 2
+        tar.addfile(info, io.BytesIO(b"{}"))
+
+    with make_session(tmp_path / "target.db") as db:
+        buffer.seek(0)
+        with pytest.raises(archive.ArchiveError):
+            problem_set_crud.import_category(db, buffer)
+        with pytest.raises(archive.ArchiveError):
+            problem_set_crud.import_category(db, io.BytesIO(b"garbage"))
+
+
+def make_archive(files: dict[str, bytes]) -> io.BytesIO:
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w:gz") as tar:
+        for name, data in files.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+    buffer.seek(0)
+    return buffer
+
+
+CATEGORY_JSON = b'{"format": 1, "path_id": "01_basic", "title": "basic"}'
+PROBLEM_JSON = b'{"path_id": "a", "title": "a", "statement": "s"}'
+
+
+@pytest.mark.parametrize(
+    "files",
+    [
+        # category.json に必要な項目が無い・オブジェクトではない
+        {"category.json": b'{"format": 1, "path_id": "01_basic"}'},
+        {"category.json": b"[]"},
+        # problem.json に必要な項目が無い・オブジェクトではない・ディレクトリと違う
+        {
+            "category.json": CATEGORY_JSON,
+            "problems/a/problem.json": b'{"path_id": "a", "title": "a"}',
+        },
+        {"category.json": CATEGORY_JSON, "problems/a/problem.json": b'"a"'},
+        {"category.json": CATEGORY_JSON, "problems/b/problem.json": PROBLEM_JSON},
+        # テストケースを保存した後で失敗する
+        {
+            "category.json": CATEGORY_JSON,
+            "problems/a/problem.json": PROBLEM_JSON,
+            "problems/a/testcases/01.in": b"1\n",
+            "problems/a/testcases/01.out": b"2\n",
+            "problems/b/problem.json": b"{}",
+        },
+    ],
+)
+def test_import_rejects_invalid_metadata(tmp_path, files):
+    with make_session(tmp_path / "target.db") as db:
+        with pytest.raises(archive.ArchiveError):
+            problem_set_crud.import_category(db, make_archive(files))
+
+        # 途中まで登録したものは残らない
+        assert db.query(problem.Category).count() == 0
+        assert db.query(problem.Problem).count() == 0
+        assert db.query(problem.TestcaseBlob).count() == 0
+
+
+def test_import_rejects_large_files(tmp_path):
+    files = {
+        "category.json": CATEGORY_JSON,
+        "problems/a/problem.json": PROBLEM_JSON,
+        "problems/a/testcases/01.in": b"1" * 100,
+        "problems/a/testcases/01.out": b"1" * 100,
+    }
+    with make_session(tmp_path / "target.db") as db:
+        with pytest.raises(archive.ArchiveError, match="File is too large"):
+            problem_set_crud.import_category(
+                db, make_archive(files), max_member_bytes=99
+            )
+        with pytest.raises(archive.ArchiveError, match="Archive is too large"):
+            problem_set_crud.import_category(db, make_archive(files), max_bytes=250)
+
+        result = problem_set_crud.import_category(db, make_archive(files))
+        assert result["testcases_created"] == 1
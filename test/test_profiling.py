@@ -0,0 +1,84 @@
+import logging
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from api import database, main
+from api.core import profiling
+from api.database import Base
+from api.main import app
+from api.models import chat, problem, submission, user  # noqa: F401
+
+
+@pytest.fixture
+def engine(tmp_path):
+    profiling.install()
+    engine = create_engine(f"sqlite:///{tmp_path / 'profiling.db'}")
+    yield engine
+    engine.dispose()
+
+
+def test_queries_are_counted(engine):
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+        with profiling.track("test") as stats:
+            conn.execute(text("SELECT 1"))
+            conn.execute(text("SELECT 2"))
+        conn.execute(text("SELECT 3"))
+
+    assert stats.count == 2
+    assert stats.seconds > 0
+    assert stats.statements == {"SELECT 1": 1, "SELECT 2": 1}
+    assert stats.server_timing().startswith('db;desc="2 queries";dur=')
+
+
+def test_repeated_statements_are_reported(engine, caplog):
+    caplog.set_level(logging.WARNING, logger=profiling.__name__)
+    with engine.connect() as conn:
+        with profiling.track("/loop") as stats:
+            for i in range(4):
+                conn.execute(text("SELECT :i"), {"i": i})
+
+    assert stats.repeated(threshold=3) == {"SELECT ?": 4}
+    assert "possible N+1" not in caplog.text
+
+    with engine.connect() as conn:
+        with profiling.track("/loop"):
+            for i in range(profiling.SQL_N_PLUS_ONE_THRESHOLD + 1):
+                conn.execute(text("SELECT :i"), {"i": i})
+
+    assert "possible N+1: route=/loop executed 11 times: SELECT ?" in caplog.text
+
+
+def test_slow_queries_are_logged(engine, caplog, monkeypatch):
+    monkeypatch.setattr(profiling, "SQL_SLOW_QUERY_SECONDS", 0)
+    caplog.set_level(logging.WARNING, logger=profiling.__name__)
+    with engine.connect() as conn:
+        with profiling.track("/slow"):
+            conn.execute(text("SELECT 42"))
+
+    assert "slow query: route=/slow" in caplog.text
+    assert "SELECT 42" in caplog.text
+
+
+def test_server_timing_header(tmp_path, monkeypatch):
+    url = f"sqlite:///{tmp_path / 'server_timing.db'}"
+    Base.metadata.create_all(create_engine(url))
+    async_engine = create_async_engine(database.to_async_url(url))
+    Session = async_sessionmaker(bind=async_engine, expire_on_commit=False)
+
+    async def get_db():
+        async with Session() as db:
+            yield db
+
+    monkeypatch.setattr(
+        app, "dependency_overrides", {database.get_async_read_db: get_db}
+    )
+    monkeypatch.setattr(main, "SERVER_TIMING", True)
+
+    response = TestClient(app).get("/category_list")
+
+    assert response.status_code == 200
+    assert response.headers["Server-Timing"].startswith('db;desc="1 queries";dur=')
@@ -0,0 +1,144 @@
+import uuid
+from types import SimpleNamespace
+
+from cachetools import TTLCache
+
+from api.utils import prompt
+
+
+def make_problem(statement: str = "A * B を出力してください。"):
+    return SimpleNamespace(id=uuid.uuid4(), title="テスト問題", statement=statement)
+
+
+def test_trim_text_keeps_short_text():
+    text = "print(1)\n"
+    assert prompt.trim_text(text, 100) == (text, False)
+
+
+def test_trim_text_fits_budget():
+    text = "".join(f"print({i})\n" for i in range(5000))
+
+    trimmed, is_trimmed = prompt.trim_text(text, 300)
+
+    assert is_trimmed
+    assert prompt.estimate_tokens(trimmed) <= 300 + 50
+    assert trimmed.startswith("print(0)\n")
+    assert trimmed.endswith("print(4999)\n")
+    assert "中略" in trimmed
+
+
+def test_preamble_is_cached_per_statement():
+    problem = make_problem()
+
+    first = prompt.get_preamble(problem)
+    assert prompt.get_preamble(problem) is first
+
+    # 問題文が変わったら作り直される
+    problem.statement = "A + B を出力してください。"
+    assert prompt.get_preamble(problem) is not first
+
+
+def test_context_cache_is_recreated(monkeypatch):
+    created = []
+
+    def create(problem, text):
+        created.append(text)
+        return f"cachedContents/{len(created)}"
+
+    now = [0.0]
+    monkeypatch.setattr(prompt, "GEMINI_CONTEXT_CACHE", True)
+    monkeypatch.setattr(prompt, "GEMINI_CONTEXT_CACHE_MIN_TOKENS", 0)
+    monkeypatch.setattr(prompt, "_create_cached_content", create)
+    monkeypatch.setattr(
+        prompt, "_cached_contents", TTLCache(maxsize=8, ttl=60, timer=lambda: now[0])
+    )
+    problem = make_problem()
+
+    assert prompt.get_cached_preamble(problem).cached_content == "cachedContents/1"
+    assert prompt.get_cached_preamble(problem).cached_content == "cachedContents/1"
+
+    # プロバイダ側で消える前に作り直す
+    now[0] = 61
+    assert prompt.get_cached_preamble(problem).cached_content == "cachedContents/2"
+
+    # 使えなかったキャッシュは忘れ、次は作り直す
+    prompt.forget_cached_content("cachedContents/2")
+    assert prompt.get_cached_preamble(problem).cached_content == "cachedContents/3"
+
+
+def test_context_cache_failure_is_remembered(monkeypatch):
+    created = []
+    monkeypatch.setattr(prompt, "GEMINI_CONTEXT_CACHE", True)
+    monkeypatch.setattr(prompt, "GEMINI_CONTEXT_CACHE_MIN_TOKENS", 0)
+    monkeypatch.setattr(
+        prompt, "_create_cached_content", lambda *args: created.append(args)
+    )
+    monkeypatch.setattr(prompt, "_cached_contents", TTLCache(maxsize=8, ttl=60))
+    problem = make_problem()
+
+    # 作れなかったキャッシュは、期限まで作り直さない
+    assert prompt.get_cached_preamble(problem) is None
+    assert prompt.get_cached_preamble(problem) is None
+    assert len(created) == 1
+
+
+def test_build_review_prompt_respects_budget(monkeypatch):
+    monkeypatch.setattr(prompt, "GEMINI_CONTEXT_CACHE", False)
+    problem = make_problem("問題文" * 10000)
+    submission = SimpleNamespace(
+        id=uuid.uuid4(), language="Python", code="x = 1\n" * 100000
+    )
+
+    review = prompt.build_review_prompt(problem, submission, "正解")
+
+    assert review.preamble.trimmed
+    assert review.trimmed
+    assert review.total_tokens <= prompt.PROMPT_TOKEN_BUDGET
+
+
+def test_cached_preamble_does_not_shrink_code(monkeypatch):
+    monkeypatch.setattr(prompt, "GEMINI_CONTEXT_CACHE", True)
+    monkeypatch.setattr(
+        prompt, "_create_cached_content", lambda problem, text: "cachedContents/1"
+    )
+    monkeypatch.setattr(prompt, "_cached_contents", TTLCache(maxsize=8, ttl=60))
+    problem = make_problem("問題文" * 10000)
+    submission = SimpleNamespace(id=uuid.uuid4(), language="Python", code="x = 1\n")
+
+    review = prompt.build_review_prompt(problem, submission, "正解")
+
+    # キャッシュには毎回送る前置きより長い問題文を置き、コードは切り詰めない
+    assert review.cached_preamble.cached_content == "cachedContents/1"
+    assert review.cached_preamble.tokens >= prompt.GEMINI_CONTEXT_CACHE_MIN_TOKENS
+    assert review.cached_preamble.tokens > review.preamble.tokens
+    assert not review.trimmed
+    assert "x = 1" in review.text
+
+    # キャッシュの前置きとコードが入力の上限を超えるなら、キャッシュは使わない
+    monkeypatch.setattr(
+        prompt, "GEMINI_INPUT_TOKEN_LIMIT", review.cached_preamble.tokens
+    )
+    assert (
+        prompt.build_review_prompt(problem, submission, "正解").cached_preamble is None
+    )
+
+
+def test_start_chat_falls_back_to_preamble(monkeypatch):
+    def from_cached_content(cached_content):
+        raise RuntimeError("cache expired")
+
+    monkeypatch.setattr(
+        prompt.genai.GenerativeModel, "from_cached_content", from_cached_content
+    )
+    forgotten = []
+    monkeypatch.setattr(prompt, "forget_cached_content", forgotten.append)
+    model = SimpleNamespace(start_chat=lambda history: history)
+    preamble = prompt.Preamble(text="short", tokens=1, trimmed=True)
+    cached_preamble = prompt.Preamble(
+        text="long", tokens=2, trimmed=False, cached_content="cachedContents/1"
+    )
+    review = prompt.ReviewPrompt(preamble, "", 0, False, cached_preamble)
+
+    # キャッシュが使えなければ、毎回送る（短い）前置きで始める
+    assert prompt.start_chat(model, review) == [{"role": "user", "parts": "short"}]
+    assert forgotten == ["cachedContents/1"]
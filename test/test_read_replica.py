@@ -0,0 +1,77 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from api import database
+from api.crud import problem as problem_crud
+from api.database import Base
+from api.main import app
+from api.models import chat, problem, submission, user  # noqa: F401
+from api.schemas import problem as problem_schema
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    # プライマリとレプリカを別々の SQLite で用意する（レプリケーションはしない）
+    engines = {}
+    for name in ("primary", "replica"):
+        engines[name] = create_engine(
+            f"sqlite:///{tmp_path / name}.db",
+            connect_args={"check_same_thread": False},
+        )
+        Base.metadata.create_all(engines[name])
+        with Session(engines[name]) as db:
+            problem_crud.create_category(
+                db,
+                problem_schema.CategoryCreate(path_id=name, title=name, description=""),
+            )
+
+    monkeypatch.setattr(database, "engine", engines["primary"])
+    monkeypatch.setattr(database, "read_engine", engines["replica"])
+    monkeypatch.setattr(database, "SessionLocal", sessionmaker(bind=engines["primary"]))
+    monkeypatch.setattr(
+        database, "ReadSessionLocal", sessionmaker(bind=engines["replica"])
+    )
+    for name, attribute in (
+        ("primary", "AsyncSessionLocal"),
+        ("replica", "AsyncReadSessionLocal"),
+    ):
+        async_engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / name}.db")
+        monkeypatch.setattr(
+            database,
+            attribute,
+            async_sessionmaker(bind=async_engine, expire_on_commit=False),
+        )
+
+    # 他のテストが設定した依存関係の差し替えを外す
+    monkeypatch.setattr(app, "dependency_overrides", {})
+
+    yield TestClient(app, base_url="https://testserver")
+
+    for engine in engines.values():
+        engine.dispose()
+
+
+def category_list(client) -> list[str]:
+    return [category["path_id"] for category in client.get("/category_list").json()]
+
+
+def test_reads_go_to_replica_until_write(client):
+    assert category_list(client) == ["replica"]
+
+    response = client.post("/signup", json={"username": "alice", "password": "pw"})
+    assert response.status_code == 200
+    assert database.PRIMARY_COOKIE in response.cookies
+
+    # 書き込んだ直後は自分の書き込みが見えるようにプライマリから読む
+    assert category_list(client) == ["primary"]
+
+    client.cookies.delete(database.PRIMARY_COOKIE)
+    assert category_list(client) == ["replica"]
+
+
+def test_forged_cookie_is_ignored(client):
+    client.cookies.set(database.PRIMARY_COOKIE, "9999999999")
+    assert category_list(client) == ["replica"]
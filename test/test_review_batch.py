@@ -0,0 +1,179 @@
+import threading
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from api import review_batch
+from api.crud import chat as chat_crud
+from api.crud import problem as problem_crud
+from api.database import Base, generate_id
+from api.models import chat, problem, submission, user  # noqa: F401
+
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'review.db'}",
+        connect_args={"check_same_thread": False},
+    )
+    Base.metadata.create_all(engine)
+    monkeypatch.setattr(review_batch, "SessionLocal", sessionmaker(bind=engine))
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def db(engine):
+    with Session(engine) as session:
+        yield session
+
+
+@pytest.fixture
+def reviews(monkeypatch):
+    # Gemini の代わりに、送られたレビュー依頼を記録して定型文を返す
+    sent = []
+
+    def send_message(text):
+        sent.append(text)
+        return SimpleNamespace(text="レビュー", usage_metadata=None)
+
+    monkeypatch.setattr(
+        chat_crud,
+        "model",
+        SimpleNamespace(
+            start_chat=lambda history: SimpleNamespace(send_message=send_message)
+        ),
+    )
+    return sent
+
+
+def create_submission(db, db_problem, status: str | None) -> submission.Submission:
+    """status が None なら、ジャッジ中の提出を作る。"""
+    db_submission = submission.Submission(
+        problem_id=db_problem.id, user_id=generate_id(), language="Python", code="1"
+    )
+    db.add(db_submission)
+    db.flush()
+    if status is not None:
+        for testcase_id in problem_crud.get_testcase_id_list(db, db_problem.id):
+            db.add(
+                submission.SubmissionDetail(
+                    submission_id=db_submission.id,
+                    testcase_id=testcase_id,
+                    status=status,
+                    time=0,
+                    memory=0,
+                )
+            )
+    db.commit()
+    return db_submission
+
+
+@pytest.fixture
+def db_problem(db):
+    db_problem = problem.Problem(
+        id=generate_id(), path_id="p", category_id=generate_id(), title="", statement=""
+    )
+    db.add(db_problem)
+    for i in range(2):
+        testcase = problem.Testcase(problem_id=db_problem.id, name=f"{i:02}")
+        problem_crud.set_testcase_payload(db, testcase, b"1\n", b"1\n")
+        db.add(testcase)
+    db.commit()
+    return db_problem
+
+
+def test_get_unreviewed_submission_list(db, db_problem):
+    judged = create_submission(db, db_problem, "AC")
+    create_submission(db, db_problem, None)
+    reviewed = create_submission(db, db_problem, "WA")
+    chat_crud.create_chat(db, "ai", "レビュー", reviewed)
+    # 空の AI のメッセージ（生成に失敗したもの）はレビューとみなさない
+    failed = create_submission(db, db_problem, "WA")
+    chat_crud.create_chat(db, "ai", "", failed)
+
+    unreviewed = chat_crud.get_unreviewed_submission_list(db, 10)
+    assert {s.id for s in unreviewed} == {judged.id, failed.id}
+    assert len(chat_crud.get_unreviewed_submission_list(db, 1)) == 1
+
+
+def test_run_batch(db, db_problem, reviews):
+    submission_ids = [create_submission(db, db_problem, "AC").id for _ in range(3)]
+    create_submission(db, db_problem, None)
+
+    assert review_batch.run_batch(limit=10, concurrency=2) == (3, 0)
+    assert len(reviews) == 3
+    db.expire_all()
+    for submission_id in submission_ids:
+        db_submission = db.get(submission.Submission, submission_id)
+        assert chat_crud.get_ai_chat(db, db_submission).message == "レビュー"
+
+    # レビュー済みの提出は選ばない
+    assert review_batch.run_batch(limit=10, concurrency=2) == (0, 0)
+    assert len(reviews) == 3
+
+
+def test_run_batch_counts_failures(db, db_problem, monkeypatch):
+    create_submission(db, db_problem, "AC")
+
+    def start_chat(history):
+        raise RuntimeError("Gemini is down")
+
+    monkeypatch.setattr(chat_crud, "model", SimpleNamespace(start_chat=start_chat))
+    assert review_batch.run_batch(limit=10, concurrency=2) == (0, 1)
+
+
+def test_is_idle(db, db_problem):
+    assert review_batch.is_idle(60)
+    create_submission(db, db_problem, "AC")
+    assert not review_batch.is_idle(60)
+    assert review_batch.is_idle(0)
+
+
+def test_run_loop_stops(engine, db, db_problem, reviews, monkeypatch):
+    for _ in range(5):
+        create_submission(db, db_problem, "AC")
+    stop = threading.Event()
+    batches = []
+    run_batch = review_batch.run_batch
+
+    def record(limit, concurrency):
+        batches.append(run_batch(limit, concurrency))
+        if batches[-1][0] < limit:
+            stop.set()
+        return batches[-1]
+
+    monkeypatch.setattr(review_batch, "run_batch", record)
+    monkeypatch.setattr(review_batch, "is_idle", lambda idle_seconds: True)
+
+    # limit 件を取りきれたら待たずに続ける（待てば 60 秒かかる）
+    thread = threading.Thread(
+        target=review_batch.run_loop, args=(2, 2, 60, 0, stop), daemon=True
+    )
+    thread.start()
+    thread.join(timeout=10)
+
+    assert not thread.is_alive()
+    assert batches == [(2, 0), (2, 0), (1, 0)]
+    assert len(reviews) == 5
+
+
+def test_run_loop_waits_while_busy(monkeypatch):
+    stop = threading.Event()
+    checks = []
+
+    def is_idle(idle_seconds):
+        checks.append(idle_seconds)
+        if len(checks) == 3:
+            stop.set()
+        return False
+
+    monkeypatch.setattr(review_batch, "is_idle", is_idle)
+    monkeypatch.setattr(
+        review_batch, "run_batch", lambda *args: pytest.fail("should not review")
+    )
+
+    review_batch.run_loop(2, 2, 0.01, 30, stop)
+    assert checks == [30, 30, 30]
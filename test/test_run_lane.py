@@ -0,0 +1,66 @@
+import time
+import uuid
+
+import pytest
+
+from api.core.run_lane import RunLane, RunLimitExceeded
+
+USER_A, USER_B = uuid.uuid4(), uuid.uuid4()
+
+
+def test_user_concurrency(gate):
+    lane = RunLane(workers=4, user_concurrency=1)
+
+    run = lane.submit(USER_A, gate.wait)
+    # 同じユーザーの2つ目は待たせずに断り、他のユーザーは実行できる
+    with pytest.raises(RunLimitExceeded):
+        lane.submit(USER_A, lambda: None)
+    lane.submit(USER_B, lambda: None).future.result(timeout=5)
+
+    gate.set()
+    run.future.result(timeout=5)
+    lane.submit(USER_A, lambda: None).future.result(timeout=5)
+
+
+def test_result(gate):
+    lane = RunLane(workers=1, user_concurrency=0)
+
+    first = lane.submit(USER_A, gate.wait)
+    second = lane.submit(USER_A, lambda: ("out", "err"))
+    assert lane.get(second.id).state == "queued"
+
+    gate.set()
+    assert second.future.result(timeout=5) == ("out", "err")
+    assert first.state == second.state == "finished"
+    assert lane.get(uuid.uuid4()) is None
+
+
+def test_failed_run_releases_slot():
+    lane = RunLane(workers=1, user_concurrency=1)
+
+    def fail():
+        raise RuntimeError("boom")
+
+    run = lane.submit(USER_A, fail)
+    with pytest.raises(RuntimeError):
+        run.future.result(timeout=5)
+    lane.submit(USER_A, lambda: None).future.result(timeout=5)
+
+
+def test_queue_limit(gate):
+    lane = RunLane(workers=1, user_concurrency=0, max_queued=1)
+
+    first = lane.submit(USER_A, gate.wait)
+    for _ in range(100):
+        if first.state == "running":
+            break
+        time.sleep(0.01)
+    second = lane.submit(USER_B, lambda: None)
+
+    # 実行を待っている数が上限に達したら、待たせずに断る
+    with pytest.raises(RunLimitExceeded):
+        lane.submit(USER_B, lambda: None)
+
+    gate.set()
+    second.future.result(timeout=5)
+    lane.submit(USER_B, lambda: None).future.result(timeout=5)
@@ -0,0 +1,67 @@
+import os
+import time
+import uuid
+
+from api.crud import submission as submission_crud
+from api.utils import run_output
+from api.utils.run_output import RunOutputStore, truncate
+
+
+def test_truncate_short_output():
+    output = truncate(b"hello\n", 10)
+    assert (output.text, output.size, output.truncated) == ("hello\n", 6, False)
+    assert truncate(None, 10).text == ""
+
+
+def test_truncate_long_output():
+    output = truncate(b"a" * 10, 4)
+    assert output.truncated
+    assert output.size == 10
+    assert output.text == "aaaa\n[Truncated] 6 bytes omitted\n"
+
+
+def test_truncate_does_not_split_characters():
+    # 「あ」は UTF-8 で3バイト。途中で切れた文字は捨てる
+    output = truncate("ああ".encode(), 4)
+    assert output.text.startswith("あ\n[Truncated]")
+    # 不正なバイトは置き換える
+    assert truncate(b"\xff", 10).text == "�"
+
+
+def test_store(tmp_path):
+    store = RunOutputStore(str(tmp_path), ttl=60)
+    run_id = uuid.uuid4()
+    assert store.find(run_id, "stdout") is None
+
+    store.save(run_id, "stdout", b"x" * 1000)
+    assert store.find(run_id, "stdout").read_bytes() == b"x" * 1000
+    assert store.find(run_id, "stderr") is None
+
+
+def test_store_expires(tmp_path):
+    store = RunOutputStore(str(tmp_path), ttl=60)
+    old, new = uuid.uuid4(), uuid.uuid4()
+    store.save(old, "stdout", b"old")
+    expired = time.time() - 120
+    os.utime(store.path(old, "stdout"), (expired, expired))
+    assert store.find(old, "stdout") is None
+
+    # 保存するときに、期限の切れたファイルを消す
+    store.save(new, "stdout", b"new")
+    assert not store.path(old, "stdout").exists()
+    assert store.find(new, "stdout").read_bytes() == b"new"
+
+
+def test_run_output_survives_store_failure(tmp_path, monkeypatch):
+    # 保存先に書けなくても、切り詰めた出力は返す
+    blocked = tmp_path / "blocked"
+    blocked.write_text("")
+    monkeypatch.setattr(
+        run_output, "get_store", lambda: RunOutputStore(str(blocked), ttl=60)
+    )
+    monkeypatch.setattr(submission_crud, "RUN_OUTPUT_MAX_BYTES", 4)
+    monkeypatch.setattr(submission_crud, "RUN_OUTPUT_STORE", True)
+
+    output = submission_crud._run_output(uuid.uuid4(), "stdout", b"a" * 10)
+    assert output.truncated
+    assert output.text.startswith("aaaa\n[Truncated]")
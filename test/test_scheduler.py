@@ -0,0 +1,108 @@
+import threading
+import uuid
+
+import pytest
+
+from api.core.scheduler import JudgeScheduler
+
+USER_A, USER_B = uuid.uuid4(), uuid.uuid4()
+
+
+def run_all(scheduler, jobs, gate) -> list[str]:
+    order = []
+    futures = [scheduler.submit(uuid.uuid4(), USER_A, None, gate.wait, cost=1)]
+    for name, user_id, kwargs in jobs:
+        futures.append(
+            scheduler.submit(uuid.uuid4(), user_id, None, order.append, name, **kwargs)
+        )
+    gate.set()
+    for future in futures:
+        future.result(timeout=5)
+    return order
+
+
+def test_fair_share_across_users(gate):
+    scheduler = JudgeScheduler(workers=1, user_concurrency=1)
+    jobs = [(f"a{i}", USER_A, {}) for i in range(4)] + [("b0", USER_B, {})]
+
+    order = run_all(scheduler, jobs, gate)
+    # 後から来た B の提出は、先に溜まっていた A の提出を全て待たずに実行される
+    assert order.index("b0") <= 1
+
+
+def test_cost(gate):
+    scheduler = JudgeScheduler(workers=1, user_concurrency=1)
+    jobs = [("a0", USER_A, {"cost": 10}), ("b0", USER_B, {"cost": 1})]
+
+    assert run_all(scheduler, jobs, gate) == ["b0", "a0"]
+
+
+def test_priority_lane(gate):
+    scheduler = JudgeScheduler(workers=1, user_concurrency=1)
+    jobs = [("b0", USER_B, {}), ("b1", USER_B, {}), ("run", USER_A, {"priority": True})]
+
+    assert run_all(scheduler, jobs, gate)[0] == "run"
+
+
+def test_user_concurrency(gate):
+    scheduler = JudgeScheduler(workers=4, user_concurrency=1)
+    running, peak, lock = 0, 0, threading.Lock()
+
+    def job():
+        nonlocal running, peak
+        with lock:
+            running += 1
+            peak = max(peak, running)
+        gate.wait()
+        with lock:
+            running -= 1
+
+    futures = [scheduler.submit(uuid.uuid4(), USER_A, None, job) for _ in range(3)]
+    futures.append(scheduler.submit(uuid.uuid4(), USER_B, None, job))
+    threading.Timer(0.2, gate.set).start()
+    for future in futures:
+        future.result(timeout=5)
+    assert peak == 2
+
+
+def test_problem_concurrency(gate):
+    scheduler = JudgeScheduler(workers=4, user_concurrency=0, problem_concurrency=1)
+    problem_id = uuid.uuid4()
+    first = scheduler.submit(uuid.uuid4(), USER_A, problem_id, gate.wait)
+    second_id = uuid.uuid4()
+    second = scheduler.submit(second_id, USER_B, problem_id, lambda: None)
+
+    assert scheduler.status(second_id).state == "queued"
+    gate.set()
+    first.result(timeout=5)
+    second.result(timeout=5)
+
+
+def test_status(gate):
+    scheduler = JudgeScheduler(workers=1, user_concurrency=1)
+    running_id, queued_ids = uuid.uuid4(), [uuid.uuid4() for _ in range(3)]
+    futures = [scheduler.submit(running_id, USER_A, None, gate.wait)]
+    for job_id in queued_ids:
+        futures.append(scheduler.submit(job_id, USER_B, None, lambda: None))
+    while scheduler.status(running_id).state != "running":
+        pass
+
+    status = scheduler.status(queued_ids[2])
+    assert status.state == "queued"
+    assert status.position == 2
+    assert status.estimated_wait == pytest.approx(2 * scheduler.average_duration)
+
+    gate.set()
+    for future in futures:
+        future.result(timeout=5)
+    assert scheduler.status(running_id) is None
+
+
+def test_exception_is_returned():
+    scheduler = JudgeScheduler(workers=1)
+
+    def fail():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        scheduler.submit(uuid.uuid4(), USER_A, None, fail).result(timeout=5)
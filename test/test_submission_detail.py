@@ -0,0 +1,215 @@
+import threading
+import time
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from api.crud import problem as problem_crud
+from api.crud import submission as submission_crud
+from api.database import Base, generate_id
+from api.models import chat, problem, submission, user  # noqa: F401
+from bench.judge0_emulator import Judge0Emulator
+
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'detail.db'}")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        yield session
+    engine.dispose()
+
+
+@pytest.fixture
+def db_submission(db):
+    db_problem = problem.Problem(
+        id=generate_id(), path_id="p", category_id=generate_id(), title="", statement=""
+    )
+    db.add(db_problem)
+    for i in range(3):
+        testcase = problem.Testcase(problem_id=db_problem.id, name=f"{i:02}")
+        problem_crud.set_testcase_payload(db, testcase, b"1\n", b"2\n")
+        db.add(testcase)
+
+    db_submission = submission.Submission(
+        problem_id=db_problem.id, user_id=generate_id(), language="Python", code=""
+    )
+    db.add(db_submission)
+    db.commit()
+    return db_submission
+
+
+def statuses(db, db_submission) -> dict:
+    return dict(submission_crud.summarize_status(db, db_submission))
+
+
+def test_writer_flushes_by_count(db, db_submission):
+    testcase_ids = problem_crud.get_testcase_id_list(db, db_submission.problem_id)
+    writer = submission_crud.SubmissionDetailWriter(
+        db, db_submission.id, testcase_ids, flush_count=2, flush_interval=60
+    )
+
+    writer.add(testcase_ids[0], "AC", 0.1, 100)
+    assert statuses(db, db_submission) == {"WJ": 3}
+    writer.add(testcase_ids[1], "WA", 0.1, 100)
+    assert statuses(db, db_submission) == {"AC": 1, "WA": 1, "WJ": 1}
+
+
+def test_writer_flushes_by_interval(db, db_submission, monkeypatch):
+    testcase_ids = problem_crud.get_testcase_id_list(db, db_submission.problem_id)
+    now = [0.0]
+    monkeypatch.setattr(submission_crud, "monotonic", lambda: now[0])
+    writer = submission_crud.SubmissionDetailWriter(
+        db, db_submission.id, testcase_ids, flush_count=10, flush_interval=1
+    )
+
+    writer.add(testcase_ids[0], "AC", 0.1, 100)
+    writer.flush_if_due()
+    assert statuses(db, db_submission) == {"WJ": 3}
+
+    # 次の結果が来なくても、flush_interval 秒待った結果は書き込む
+    now[0] = 1
+    writer.flush_if_due()
+    assert statuses(db, db_submission) == {"AC": 1, "WJ": 2}
+
+
+def test_writer_flushes_while_polling(tmp_path, monkeypatch):
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'polling.db'}",
+        connect_args={"check_same_thread": False},
+    )
+    Base.metadata.create_all(engine)
+    emulator = Judge0Emulator(("127.0.0.1", 0), execute=True).start()
+    monkeypatch.setattr(submission_crud, "JUDGE_API_URLS", emulator.url)
+
+    with Session(engine) as db:
+        db_problem = problem.Problem(
+            id=generate_id(),
+            path_id="p",
+            category_id=generate_id(),
+            title="",
+            statement="",
+            time_limit=10,
+        )
+        db.add(db_problem)
+        # 1つ目はすぐ、2つ目は3秒後に結果が出る
+        for i, seconds in enumerate((0, 3)):
+            testcase = problem.Testcase(problem_id=db_problem.id, name=f"{i:02}")
+            problem_crud.set_testcase_payload(
+                db, testcase, f"{seconds}\n".encode(), f"{seconds}\n".encode()
+            )
+            db.add(testcase)
+        db_submission = submission.Submission(
+            problem_id=db_problem.id,
+            user_id=generate_id(),
+            language="Python",
+            code="import time\nn = int(input())\ntime.sleep(n)\nprint(n)",
+        )
+        db.add(db_submission)
+        db.commit()
+
+        seen = []
+        done = threading.Event()
+
+        def watch():
+            with Session(engine) as watcher:
+                while not done.is_set():
+                    seen.append(statuses(watcher, db_submission))
+                    time.sleep(0.1)
+
+        thread = threading.Thread(target=watch)
+        thread.start()
+        try:
+            submission_crud.judge_submission(db, db_submission)
+        finally:
+            done.set()
+            thread.join()
+            emulator.shutdown()
+
+        # 2つ目の結果を待つ間に、1つ目の結果が書き込まれている
+        assert {"AC": 1, "WJ": 1} in seen
+        assert statuses(db, db_submission) == {"AC": 2}
+    engine.dispose()
+
+
+def test_writer_records_all_testcases_on_failure(db, db_submission):
+    testcase_ids = problem_crud.get_testcase_id_list(db, db_submission.problem_id)
+
+    with pytest.raises(RuntimeError):
+        with submission_crud.SubmissionDetailWriter(
+            db, db_submission.id, testcase_ids
+        ) as writer:
+            writer.add(testcase_ids[0], "AC", 0.1, 100)
+            raise RuntimeError("judge is down")
+
+    assert statuses(db, db_submission) == {"AC": 1, "IE": 2}
+
+
+def test_writer_skips_recorded_testcases(db, db_submission):
+    testcase_ids = problem_crud.get_testcase_id_list(db, db_submission.problem_id)
+    with submission_crud.SubmissionDetailWriter(
+        db, db_submission.id, testcase_ids[:1]
+    ) as writer:
+        writer.add(testcase_ids[0], "AC", 0.1, 100)
+
+    with submission_crud.SubmissionDetailWriter(
+        db, db_submission.id, testcase_ids
+    ) as writer:
+        writer.add(testcase_ids[0], "WA", 0.1, 100)
+
+    assert statuses(db, db_submission) == {"AC": 1, "IE": 2}
+
+
+def test_writer_drops_duplicates_in_batch(db, db_submission):
+    testcase_ids = problem_crud.get_testcase_id_list(db, db_submission.problem_id)
+    db.add(
+        submission.SubmissionDetail(
+            submission_id=db_submission.id,
+            testcase_id=testcase_ids[0],
+            status="AC",
+            time=0.1,
+            memory=100,
+        )
+    )
+    db.commit()
+
+    # 同じテストケースの結果は一意制約で2行にならない
+    db.add(
+        submission.SubmissionDetail(
+            submission_id=db_submission.id,
+            testcase_id=testcase_ids[0],
+            status="WA",
+            time=0.1,
+            memory=100,
+        )
+    )
+    with pytest.raises(IntegrityError):
+        db.commit()
+    db.rollback()
+
+    # 重複した行だけを捨て、同じバッチの他の行は書き込む
+    writer = submission_crud.SubmissionDetailWriter(
+        db, db_submission.id, testcase_ids, flush_count=2, flush_interval=60
+    )
+    writer.add(testcase_ids[0], "WA", 0.1, 100)
+    writer.add(testcase_ids[1], "WA", 0.1, 100)
+    assert statuses(db, db_submission) == {"AC": 1, "WA": 1, "WJ": 1}
+
+
+def test_judge_submission_without_judge(db, db_submission):
+    # 空のコードは全て WA、ジャッジに繋がらなければ全て IE になる
+    submission_crud.judge_submission(db, db_submission)
+    assert statuses(db, db_submission) == {"WA": 3}
+
+    other = submission.Submission(
+        problem_id=db_submission.problem_id,
+        user_id=db_submission.user_id,
+        language="Python",
+        code="print(2)",
+    )
+    db.add(other)
+    db.commit()
+    submission_crud.judge_submission(db, other)
+    assert statuses(db, other) == {"IE": 3}
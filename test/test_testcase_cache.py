@@ -0,0 +1,63 @@
+import base64
+import time
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from api.crud import problem as problem_crud
+from api.database import Base, generate_id
+from api.models import chat, problem, submission, user  # noqa: F401
+from api.utils.testcase_cache import TestcaseCache
+
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'cache.db'}")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        yield session
+    engine.dispose()
+
+
+def make_testcase(db, input_data: bytes, output_data: bytes) -> problem.Testcase:
+    testcase = problem.Testcase(id=generate_id(), problem_id=generate_id(), name="01")
+    problem_crud.set_testcase_payload(db, testcase, input_data, output_data)
+    db.commit()
+    return testcase
+
+
+def test_open_maps_payload(db, tmp_path):
+    cache = TestcaseCache(str(tmp_path / "cache"), 1024 * 1024)
+    testcase = make_testcase(db, b"1 2\n", b"")
+
+    with cache.open(db, testcase) as (input_data, output_data):
+        assert base64.b64encode(input_data) == base64.b64encode(b"1 2\n")
+        assert output_data == b""
+
+    # 2回目はキャッシュのファイルを使う
+    db.query(problem.TestcaseBlob).delete()
+    with cache.open(db, testcase) as (input_data, _):
+        assert input_data[:] == b"1 2\n"
+
+    cache.invalidate(testcase.id)
+    assert list((tmp_path / "cache").iterdir()) == []
+
+
+def test_evicts_least_recently_used(db, tmp_path):
+    cache = TestcaseCache(str(tmp_path / "cache"), 250)
+    testcases = [make_testcase(db, bytes([i]) * 100, b"x") for i in range(3)]
+
+    for testcase in testcases[:2]:
+        with cache.open(db, testcase):
+            pass
+        time.sleep(0.01)
+    with cache.open(db, testcases[0]):
+        pass
+    time.sleep(0.01)
+    with cache.open(db, testcases[2]):
+        pass
+
+    names = {path.name.split("-")[0] for path in (tmp_path / "cache").glob("*.in")}
+    assert testcases[1].id.hex not in names
+    assert {testcases[0].id.hex, testcases[2].id.hex} <= names
@@ -0,0 +1,131 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from api.core import tracing
+from api.crud import submission as submission_crud
+from api.database import Base
+from api.main import app
+from api.models import chat, problem, submission, user  # noqa: F401
+
+TRACE_ID = "0af7651916cd43dd8448eb211c80319c"
+TRACEPARENT = f"00-{TRACE_ID}-b7ad6b7169203331-01"
+
+
+@pytest.fixture
+def exporter(monkeypatch):
+    exporter = tracing.MemoryExporter()
+    monkeypatch.setattr(tracing, "TRACING_SAMPLE_RATE", 1.0)
+    monkeypatch.setattr(tracing, "exporter", exporter)
+    tracing.install()
+    return exporter
+
+
+def test_disabled_by_default():
+    with tracing.span("request") as span:
+        assert span is tracing.NOOP
+        assert tracing.current() is None
+
+
+def test_nested_spans(exporter):
+    with tracing.span("parent", kind="server") as parent:
+        with tracing.span("child", answer=42) as child:
+            pass
+
+    assert [span.name for span in exporter.spans] == ["child", "parent"]
+    assert child.trace_id == parent.trace_id
+    assert child.parent_id == parent.span_id
+    assert parent.parent_id is None
+    assert child.attributes == {"answer": 42}
+    assert parent.end_ns >= child.end_ns
+
+
+def test_exception_is_recorded(exporter):
+    with pytest.raises(ValueError):
+        with tracing.span("failing"):
+            raise ValueError("boom")
+
+    (span,) = exporter.spans
+    assert span.status == ("error", "boom")
+    assert span.attributes["exception.type"] == "ValueError"
+
+
+def test_traceparent(exporter):
+    with tracing.span("continued", TRACEPARENT) as span:
+        pass
+    assert span.trace_id == TRACE_ID
+    assert span.parent_id == "b7ad6b7169203331"
+
+    # 上流で記録しないと決めたトレースは記録しない
+    with tracing.span("unsampled", f"00-{TRACE_ID}-b7ad6b7169203331-00") as span:
+        with tracing.span("child") as child:
+            pass
+    assert span is tracing.NOOP and child is tracing.NOOP
+
+    # 壊れた traceparent は無視して新しいトレースを始める
+    with tracing.span("broken", "00-xyz-01") as span:
+        pass
+    assert span.trace_id != TRACE_ID and span.parent_id is None
+
+
+def test_sql_spans(exporter, tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'tracing.db'}")
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+        with tracing.span("request") as parent:
+            conn.execute(text("SELECT 2"))
+    engine.dispose()
+
+    sql_span, request_span = exporter.spans
+    assert sql_span.name == "SELECT"
+    assert sql_span.parent_id == parent.span_id
+    assert sql_span.attributes["db.statement"] == "SELECT 2"
+
+
+def test_http_request_span(exporter, monkeypatch):
+    monkeypatch.setattr(app, "dependency_overrides", {})
+
+    TestClient(app).get("/", headers={"traceparent": TRACEPARENT})
+
+    (span,) = [span for span in exporter.spans if span.kind == "server"]
+    assert span.name == "GET /"
+    assert span.trace_id == TRACE_ID
+    assert span.attributes["http.route"] == "/"
+    assert span.attributes["http.status_code"] == 200
+
+
+def test_background_judge_continues_trace(exporter, tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'judge.db'}")
+    Base.metadata.create_all(engine)
+
+    with tracing.span("POST /submit") as request_span:
+        parent = tracing.current()
+    # リクエストが終わった後に、受け取ったスパンの子としてジャッジする
+    submission_crud.judge_submission_by_id(sessionmaker(bind=engine), "0" * 32, parent)
+    engine.dispose()
+
+    (judge_span,) = [span for span in exporter.spans if span.name == "judge.submission"]
+    assert judge_span.trace_id == request_span.trace_id
+    assert judge_span.parent_id == request_span.span_id
+    assert any(span.parent_id == judge_span.span_id for span in exporter.spans)
+
+
+def test_otlp_payload():
+    span = tracing.Span("GET /", TRACE_ID, None, "server", {"http.status_code": 200})
+    span.end_ns = span.start_ns + 1000
+    otlp = tracing.OtlpExporter.__new__(tracing.OtlpExporter)
+    otlp.service_name = "test"
+
+    payload = otlp.payload([span])
+
+    resource_spans = payload["resourceSpans"][0]
+    assert resource_spans["resource"]["attributes"] == [
+        {"key": "service.name", "value": {"stringValue": "test"}}
+    ]
+    (exported,) = resource_spans["scopeSpans"][0]["spans"]
+    assert exported["traceId"] == TRACE_ID
+    assert exported["kind"] == 2
+    assert exported["attributes"] == [
+        {"key": "http.status_code", "value": {"intValue": "200"}}
+    ]
@@ -0,0 +1,39 @@
+import time
+import uuid
+
+from api import database
+from api.utils import uuid7 as uuid7_module
+from api.utils.uuid7 import uuid7
+
+
+def test_version_and_variant():
+    value = uuid7()
+    assert value.version == 7
+    assert value.variant == uuid.RFC_4122
+
+    # 先頭48ビットはミリ秒単位の UNIX 時刻
+    ms = value.int >> 80
+    assert abs(ms - time.time_ns() // 1_000_000) < 1000
+
+
+def test_ids_are_ordered():
+    ids = [uuid7() for _ in range(10000)]
+    assert ids == sorted(ids)
+    assert len(set(ids)) == len(ids)
+    assert [i.bytes for i in ids] == sorted(i.bytes for i in ids)
+
+
+def test_counter_overflow_keeps_order(monkeypatch):
+    # 同じミリ秒にカウンタ（12ビット）より多く生成しても、順序を保つ
+    now = time.time_ns()
+    monkeypatch.setattr(uuid7_module.time, "time_ns", lambda: now)
+    ids = [uuid7() for _ in range(5000)]
+    assert ids == sorted(ids)
+    assert all(i.version == 7 for i in ids)
+
+
+def test_generate_id(monkeypatch):
+    monkeypatch.setattr(database, "UUID_VERSION", "7")
+    assert database.generate_id().version == 7
+    monkeypatch.setattr(database, "UUID_VERSION", "4")
+    assert database.generate_id().version == 4